@@ -0,0 +1,83 @@
+from pathlib import Path
+
+from django.apps import apps
+from django.core import serializers
+from django.core.management.base import BaseCommand, CommandError
+
+# Exported and imported in this order so foreign keys always point at rows
+# that are already loaded
+PLATFORM_MODELS = [
+    'accounts.CustomUser',
+    'accounts.RecipientProfile',
+    'notifications.NotificationPreferences',
+    'donations.Organ',
+    'donations.RecipientRequest',
+    'donations.DonationRequest',
+    'donations.OrganMatch',
+    'donations.Connection',
+    'chat.ChatRoom',
+    'chat.Message',
+    'notifications.Announcement',
+    'notifications.Notification',
+    'notifications.NotificationArchive',
+    'activity.ActivityHistory',
+    'activity.ActivityDailyRollup',
+    'activity.ActivityDailyStats',
+]
+
+
+def dump_path(directory, model):
+    return Path(directory) / f'{model._meta.label_lower}.ndjson'
+
+
+def concrete_field_names(model):
+    # Many-to-many fields (user groups and permissions) are not carried over
+    return [field.name for field in model._meta.concrete_fields if not field.primary_key]
+
+
+class Command(BaseCommand):
+    help = 'Streams platform data to one NDJSON file per model for import_platform'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'output',
+            help='Directory the .ndjson files are written to'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Number of rows fetched from the database at a time'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size <= 0:
+            raise CommandError('--batch-size must be positive')
+
+        output = Path(options['output'])
+        output.mkdir(parents=True, exist_ok=True)
+
+        for label in PLATFORM_MODELS:
+            model = apps.get_model(label)
+            # A server-side cursor keeps memory flat however large the table is
+            rows = model._base_manager.order_by('pk').iterator(chunk_size=batch_size)
+            with open(dump_path(output, model), 'w', encoding='utf-8') as stream:
+                counter = CountingIterator(rows)
+                serializers.serialize('jsonl', counter, stream=stream, fields=concrete_field_names(model))
+            self.stdout.write(f'Exported {counter.count} {label} rows')
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully exported platform data to {output}'))
+
+
+class CountingIterator:
+    """Counts the objects passed through to the serializer"""
+
+    def __init__(self, iterable):
+        self.iterable = iterable
+        self.count = 0
+
+    def __iter__(self):
+        for obj in self.iterable:
+            self.count += 1
+            yield obj
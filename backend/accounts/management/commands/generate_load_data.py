@@ -0,0 +1,280 @@
+import random
+import uuid
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from itertools import cycle
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from backend.accounts.models import CustomUser, RecipientProfile
+from backend.chat.models import ChatRoom, Message
+from backend.donations.constants import OrganType, UrgencyLevel
+from backend.donations.models import Organ, RecipientRequest
+
+from .import_platform import keep_timestamps
+
+# Northern Cyprus cities accepted by the profile form, with their coordinates
+CITIES = {
+    'Nicosia (Lefkoşa)': (35.1856, 33.3823),
+    'Kyrenia (Girne)': (35.3417, 33.3192),
+    'Famagusta (Gazimağusa)': (35.1250, 33.9417),
+    'Morphou (Güzelyurt)': (35.1983, 32.9933),
+    'Iskele (Trikomo)': (35.2867, 33.8867),
+    'Lefke': (35.1103, 32.8497),
+    'Lapithos (Lapta)': (35.3333, 33.1667),
+    'Karavas (Alsancak)': (35.3433, 33.1967),
+}
+
+# Population-like blood type weights
+BLOOD_TYPE_WEIGHTS = {
+    'O+': 37, 'A+': 33, 'B+': 9, 'AB+': 3,
+    'O-': 7, 'A-': 7, 'B-': 2, 'AB-': 2,
+}
+
+# Organ types the recipient profile form accepts
+PROFILE_ORGAN_TYPES = ['kidney', 'liver', 'heart', 'lung', 'pancreas', 'intestine']
+
+FIRST_NAMES = ['Ayşe', 'Mehmet', 'Elena', 'Andreas', 'Zeynep', 'Ali', 'Maria', 'Can', 'Deniz', 'Nikos', 'Leyla', 'Emre']
+LAST_NAMES = ['Yilmaz', 'Georgiou', 'Demir', 'Christodoulou', 'Kaya', 'Ioannou', 'Şahin', 'Papadopoulos', 'Aydin']
+
+MESSAGES = [
+    'Hello, I saw your listing and would like to know more.',
+    'Thank you for getting in touch.',
+    'Could you share the latest test results?',
+    'My doctor has confirmed the blood type compatibility.',
+    'When would be a good time to talk with the hospital?',
+    'The transplant coordinator will contact you this week.',
+    'I have uploaded the hospital letter to my profile.',
+    'Is the organ still available?',
+    'Yes, it is still available.',
+    'Thank you, that is good news.',
+]
+
+# Fixed reference point so the same seed always produces the same rows
+BASE_TIME = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+PASSWORD = 'loadtest123'
+
+
+class Command(BaseCommand):
+    help = 'Bulk-creates a deterministic synthetic dataset for load and performance testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--donors', type=int, default=100, help='Number of donor users')
+        parser.add_argument('--recipients', type=int, default=100, help='Number of recipient users, each with an open request')
+        parser.add_argument('--organs', type=int, default=200, help='Number of organ listings')
+        parser.add_argument('--messages', type=int, default=1000, help='Number of chat messages')
+        parser.add_argument(
+            '--rooms',
+            type=int,
+            help='Number of chat rooms the messages are spread over (default: one per 50 messages)'
+        )
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; the same seed gives the same data')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of rows inserted per query')
+
+    def handle(self, *args, **options):
+        for option in ['donors', 'recipients', 'organs', 'messages', 'rooms', 'seed']:
+            # --rooms is None unless given
+            if options[option] is not None and options[option] < 0:
+                raise CommandError(f'--{option} must not be negative')
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size must be positive')
+        if options['organs'] and not options['donors']:
+            raise CommandError('--organs needs at least one donor')
+
+        rooms = options['rooms']
+        if rooms is None:
+            rooms = max(1, options['messages'] // 50) if options['messages'] else 0
+        if options['messages'] and not (rooms and options['organs'] and options['recipients']):
+            raise CommandError('--messages needs at least one organ, recipient and chat room')
+        rooms = min(rooms, options['organs'])
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.prefix = f'load{options["seed"]}-'
+        if CustomUser.objects.filter(email__startswith=self.prefix).exists():
+            raise CommandError(f'Load data for seed {options["seed"]} already exists')
+
+        donor_ids = self.create_users('donor', options['donors'])
+        recipient_ids = self.create_users('recipient', options['recipients'])
+        self.create_recipient_requests(recipient_ids)
+        organ_ids = self.create_organs(donor_ids, options['organs'])
+        room_ids = self.create_chat_rooms(organ_ids, recipient_ids, rooms)
+        self.create_messages(room_ids, options['messages'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully generated {len(donor_ids)} donors, {len(recipient_ids)} recipients, '
+            f'{len(organ_ids)} organs, {len(room_ids)} chat rooms and {options["messages"]} messages'
+        ))
+
+    def insert(self, model, objects):
+        """bulk_create a generator of unsaved rows in batches, keeping their timestamps"""
+        total = 0
+        batch = []
+        with keep_timestamps(model):
+            for obj in objects:
+                batch.append(obj)
+                if len(batch) >= self.batch_size:
+                    total += self.flush(model, batch)
+                    batch = []
+            if batch:
+                total += self.flush(model, batch)
+        return total
+
+    def flush(self, model, batch):
+        with transaction.atomic():
+            model.objects.bulk_create(batch)
+        return len(batch)
+
+    def moment(self, max_days=365):
+        return BASE_TIME - timedelta(seconds=self.rng.randrange(max_days * 86400))
+
+    def create_users(self, user_type, count):
+        # Hashing is the slow part of creating users, so everyone shares one hash
+        password = make_password(PASSWORD, salt=f'{self.prefix}salt')
+
+        def users():
+            for i in range(count):
+                city = self.rng.choice(list(CITIES))
+                latitude, longitude = CITIES[city]
+                joined = self.moment()
+                user = CustomUser(
+                    email=f'{self.prefix}{user_type}{i}@example.org',
+                    password=password,
+                    first_name=self.rng.choice(FIRST_NAMES),
+                    last_name=self.rng.choice(LAST_NAMES),
+                    gender=self.rng.choice(['female', 'male']),
+                    date_of_birth=date(1960, 1, 1) + timedelta(days=self.rng.randrange(45 * 365)),
+                    blood_type=self.rng.choices(list(BLOOD_TYPE_WEIGHTS), weights=list(BLOOD_TYPE_WEIGHTS.values()))[0],
+                    user_type=user_type,
+                    weight=round(self.rng.gauss(75, 12), 1),
+                    height=round(self.rng.gauss(172, 9), 1),
+                    country='CY',
+                    city=city,
+                    latitude=round(latitude + self.rng.uniform(-0.03, 0.03), 6),
+                    longitude=round(longitude + self.rng.uniform(-0.03, 0.03), 6),
+                    phone_number=f'+90533{self.rng.randrange(10 ** 7):07d}',
+                    is_verified=self.rng.random() < 0.8,
+                    created_at=joined,
+                    updated_at=joined,
+                    date_joined=joined,
+                )
+                # bulk_create skips save(), which normally stores this
+                user.profile_complete = user.compute_profile_complete()
+                yield user
+
+        total = self.insert(CustomUser, users())
+        self.stdout.write(f'Created {total} {user_type}s')
+        return self.ids(CustomUser.objects.filter(email__startswith=f'{self.prefix}{user_type}'))
+
+    def create_recipient_requests(self, recipient_ids):
+        urgency_levels = [level.value for level in UrgencyLevel]
+        recipients = CustomUser.objects.filter(id__in=recipient_ids).order_by('id')
+        profiles = []
+        requests = []
+        for recipient in recipients.only('id', 'blood_type', 'city', 'date_joined').iterator(chunk_size=self.batch_size):
+            organ_type = self.rng.choice(PROFILE_ORGAN_TYPES)
+            urgency_level = self.rng.choice(urgency_levels)
+            profiles.append(RecipientProfile(
+                user_id=recipient.id,
+                urgency_level=urgency_level,
+                organ_type=organ_type,
+                updated_at=recipient.date_joined,
+            ))
+            requests.append(RecipientRequest(
+                recipient_id=recipient.id,
+                organ_type=organ_type,
+                blood_type=recipient.blood_type,
+                urgency_level=urgency_level,
+                location=f'{recipient.city}, CY',
+                status='open',
+                date_created=recipient.date_joined,
+                date_updated=recipient.date_joined,
+            ))
+            if len(requests) >= self.batch_size:
+                self.insert(RecipientProfile, profiles)
+                self.insert(RecipientRequest, requests)
+                profiles, requests = [], []
+        self.insert(RecipientProfile, profiles)
+        self.insert(RecipientRequest, requests)
+        self.stdout.write(f'Created {len(recipient_ids)} recipient requests')
+
+    def create_organs(self, donor_ids, count):
+        organ_types = cycle([organ_type.value for organ_type in OrganType])
+        donors = {
+            donor['id']: donor
+            for donor in CustomUser.objects.filter(id__in=donor_ids).values('id', 'city', 'blood_type').iterator()
+        }
+
+        def organs():
+            for i in range(count):
+                donor_id = self.rng.choice(donor_ids)
+                listed = self.moment(180)
+                yield Organ(
+                    donor_id=donor_id,
+                    # Every organ type is represented
+                    organ_name=next(organ_types),
+                    blood_type=donors[donor_id]['blood_type'],
+                    location=f"{donors[donor_id]['city']}, CY",
+                    is_available=self.rng.random() < 0.9,
+                    medical_history='No significant medical history.',
+                    alias=f'Donor-{i:06d}',
+                    date_created=listed,
+                    date_updated=listed,
+                )
+
+        # bulk_create skips Organ.save, so no matching or notifications run here
+        total = self.insert(Organ, organs())
+        self.stdout.write(f'Created {total} organs')
+        return self.ids(Organ.objects.filter(donor_id__in=donor_ids))
+
+    def create_chat_rooms(self, organ_ids, recipient_ids, count):
+        organ_ids = self.rng.sample(organ_ids, count)
+        organ_donors = dict(Organ.objects.filter(id__in=organ_ids).values_list('id', 'donor_id').iterator())
+
+        def rooms():
+            for organ_id in organ_ids:
+                opened = self.moment(90)
+                yield ChatRoom(
+                    donor_id=organ_donors[organ_id],
+                    recipient_id=self.rng.choice(recipient_ids),
+                    organ_id=organ_id,
+                    status=self.rng.choice(['pending', 'active', 'active', 'active']),
+                    created_at=opened,
+                    last_activity=opened,
+                )
+
+        total = self.insert(ChatRoom, rooms())
+        self.stdout.write(f'Created {total} chat rooms')
+        return self.ids(ChatRoom.objects.filter(organ_id__in=organ_ids))
+
+    def create_messages(self, room_ids, count):
+        if not count:
+            return
+        participants = {
+            room['id']: (room['donor_id'], room['recipient_id'])
+            for room in ChatRoom.objects.filter(id__in=room_ids).values('id', 'donor_id', 'recipient_id').iterator()
+        }
+        last_activity = {}
+
+        def messages():
+            for i in range(count):
+                room_id = self.rng.choice(room_ids)
+                sent = BASE_TIME + timedelta(seconds=i * 30 + self.rng.randrange(30))
+                last_activity[room_id] = sent
+                yield Message(
+                    chat_room_id=room_id,
+                    sender_id=self.rng.choice(participants[room_id]),
+                    content=self.rng.choice(MESSAGES),
+                    uid=uuid.UUID(int=self.rng.getrandbits(128), version=4),
+                    timestamp=sent,
+                    is_read=self.rng.random() < 0.7,
+                )
+
+        total = self.insert(Message, messages())
+        rooms = [ChatRoom(id=room_id, last_activity=sent) for room_id, sent in last_activity.items()]
+        ChatRoom.objects.bulk_update(rooms, ['last_activity'], batch_size=self.batch_size)
+        self.stdout.write(f'Created {total} messages')
+
+    def ids(self, queryset):
+        return list(queryset.order_by('id').values_list('id', flat=True))
@@ -0,0 +1,116 @@
+from contextlib import contextmanager
+from itertools import islice
+from pathlib import Path
+
+from django.apps import apps
+from django.core import serializers
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+
+from backend.donations.matching import find_matches
+from backend.donations.models import RecipientRequest
+
+from .export_platform import PLATFORM_MODELS, dump_path
+
+
+@contextmanager
+def keep_timestamps(model):
+    """Stop auto_now/auto_now_add fields from overwriting the exported values"""
+    fields = [
+        (field, field.auto_now, field.auto_now_add)
+        for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    for field, _, _ in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in fields:
+            field.auto_now = auto_now
+            field.auto_now_add = auto_now_add
+
+
+class Command(BaseCommand):
+    help = 'Loads NDJSON files written by export_platform with chunked bulk inserts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'input',
+            help='Directory containing the .ndjson files'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of rows inserted per query'
+        )
+        parser.add_argument(
+            '--skip-matching',
+            action='store_true',
+            help='Do not run the organ matching pass after loading'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size <= 0:
+            raise CommandError('--batch-size must be positive')
+        directory = Path(options['input'])
+        if not directory.is_dir():
+            raise CommandError(f'{directory} is not a directory')
+
+        # bulk_create neither calls save() nor sends signals, so listing
+        # organs and announcements here does not trigger matching or
+        # notification fan-out
+        loaded = []
+        with transaction.atomic():
+            for label in PLATFORM_MODELS:
+                model = apps.get_model(label)
+                path = dump_path(directory, model)
+                if not path.exists():
+                    continue
+                total = self.load(model, path, batch_size)
+                loaded.append(model)
+                self.stdout.write(f'Imported {total} {label} rows')
+
+            # Rows were inserted with explicit ids; move the sequences past them
+            statements = connection.ops.sequence_reset_sql(no_style(), loaded)
+            if statements:
+                with connection.cursor() as cursor:
+                    for sql in statements:
+                        cursor.execute(sql)
+
+        if not options['skip_matching']:
+            self.match_open_requests()
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully imported platform data from {directory}'))
+
+    def load(self, model, path, batch_size):
+        total = 0
+        with open(path, encoding='utf-8') as stream, keep_timestamps(model):
+            # The JSONL deserializer reads the file a line at a time
+            objects = (
+                deserialized.object
+                for deserialized in serializers.deserialize('jsonl', stream, ignorenonexistent=True)
+            )
+            while True:
+                batch = list(islice(objects, batch_size))
+                if not batch:
+                    break
+                model._base_manager.bulk_create(batch)
+                total += len(batch)
+        return total
+
+    def match_open_requests(self):
+        """One matching pass over every open request, without notifications"""
+        matched = 0
+        failed = 0
+        requests = RecipientRequest.objects.filter(status='open').select_related('recipient')
+        for recipient_request in requests.iterator():
+            try:
+                matched += len(find_matches(recipient_request, notify=False))
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f'Matching failed for request {recipient_request.pk}: {e}')
+        self.stdout.write(f'Created {matched} organ matches ({failed} requests failed)')
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.7 on 2026-10-19 08:31
+
+from django.db import migrations, models
+from django.db.models import Q
+
+
+def backfill_profile_complete(apps, schema_editor):
+    """Mirror of CustomUser.compute_profile_complete as a single UPDATE"""
+    CustomUser = apps.get_model('accounts', 'CustomUser')
+    blank = Q()
+    for field in ['first_name', 'last_name', 'gender', 'blood_type', 'country', 'city', 'phone_number']:
+        blank |= Q(**{f'{field}__isnull': True}) | Q(**{field: ''})
+    for field in ['date_of_birth', 'weight', 'height']:
+        blank |= Q(**{f'{field}__isnull': True})
+    blank |= Q(weight=0) | Q(height=0)
+    # Donors also need their coordinates
+    blank |= Q(user_type='donor') & (
+        Q(latitude__isnull=True) | Q(latitude=0) | Q(longitude__isnull=True) | Q(longitude=0)
+    )
+    CustomUser.objects.exclude(blank).update(profile_complete=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='profile_complete',
+            field=models.BooleanField(db_index=True, default=False, editable=False),
+        ),
+        migrations.RunPython(backfill_profile_complete, migrations.RunPython.noop),
+    ]
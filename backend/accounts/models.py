@@ -1,7 +1,10 @@
 from django.db import models
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.db.models.functions import ExtractYear
 from django.core.validators import EmailValidator
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.utils import timezone
+from django.utils.functional import cached_property
 from phonenumber_field.modelfields import PhoneNumberField 
 from django_countries.fields import CountryField
 
@@ -42,6 +45,27 @@ class CustomUserManager(BaseUserManager):
             **extra_fields
         )
 
+def age_expression(prefix=''):
+    """
+    Age in whole years as a database expression, for annotating users or
+    rows related to them, e.g.
+
+        Organ.objects.annotate(donor_age=age_expression('donor__'))
+    """
+    today = timezone.now().date()
+    date_of_birth = f'{prefix}date_of_birth'
+    # One year less when this year's birthday has not come yet
+    birthday_pending = (
+        Q(**{f'{date_of_birth}__month__gt': today.month}) |
+        Q(**{f'{date_of_birth}__month': today.month, f'{date_of_birth}__day__gt': today.day})
+    )
+    return Value(today.year) - ExtractYear(F(date_of_birth)) - Case(
+        When(birthday_pending, then=Value(1)),
+        default=Value(0),
+        output_field=IntegerField()
+    )
+
+
 class CustomUser(AbstractUser):
     USER_TYPES = [
         ('donor', 'Donor'),
@@ -96,6 +120,9 @@ class CustomUser(AbstractUser):
 
     avatar = models.ImageField(upload_to='avatars/', blank=True, null=True)
 
+    # Kept in sync by save() so matching can filter on it without loading users
+    profile_complete = models.BooleanField(default=False, editable=False, db_index=True)
+
     objects = CustomUserManager()
 
     def __str__(self):
@@ -105,7 +132,16 @@ class CustomUser(AbstractUser):
     def fullname(self):
         return f"{self.first_name} {self.last_name}"
 
-    @property
+    def save(self, *args, **kwargs):
+        self.profile_complete = self.compute_profile_complete()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'profile_complete'}
+        # date_of_birth may have changed
+        self.__dict__.pop('age', None)
+        super().save(*args, **kwargs)
+
+    @cached_property
     def age(self):
         today = timezone.now().date()
         return today.year - self.date_of_birth.year - (
@@ -120,8 +156,7 @@ class CustomUser(AbstractUser):
     def is_recipient(self):
         return self.user_type == 'recipient'
 
-    @property
-    def profile_complete(self):
+    def compute_profile_complete(self):
         # Common required fields for all users
         required_fields = [
             self.first_name, self.last_name, self.gender, 
@@ -4,8 +4,40 @@ from django_countries.serializers import CountryFieldMixin
 from django.core.validators import validate_email
 from django.contrib.auth import get_user_model
 from backend.donations.models import RecipientRequest
+from operator import attrgetter
 User = get_user_model() 
 
+
+def file_url(file):
+    """URL of a stored file, or None when it is empty or has no storage URL"""
+    try:
+        return file.url if file else None
+    except ValueError:
+        return None
+
+
+def get_recipient_profile(user):
+    """The user's RecipientProfile if they are a recipient and have one"""
+    if user.user_type != 'recipient':
+        return None
+    try:
+        return user.recipient_profile
+    except RecipientProfile.DoesNotExist:
+        return None
+
+
+def recipient_profile_data(user):
+    """Profile fields of a recipient, all None until the profile is filled in"""
+    if user.user_type != 'recipient':
+        return None
+    profile = get_recipient_profile(user)
+    return {
+        'urgency_level': getattr(profile, 'urgency_level', None),
+        'organ_type': getattr(profile, 'organ_type', None),
+        'hospital_letter': file_url(getattr(profile, 'hospital_letter', None)),
+        'recipient_image': file_url(getattr(profile, 'recipient_image', None))
+    }
+
 class RecipientProfileSerializer(serializers.ModelSerializer):
     class Meta:
         model = RecipientProfile
@@ -106,108 +138,40 @@ class UserProfileSerializer(CountryFieldMixin, serializers.ModelSerializer):
             raise serializers.ValidationError("Please select a valid city in Northern Cyprus")
         return value
 
-    def to_representation(self, instance):
-        """Customize the representation based on user type"""
-        try:
-            # Get the base representation with all fields
-            data = super().to_representation(instance)
-            
-            # Convert PhoneNumber to string
-            if instance.phone_number:
-                data['phone_number'] = str(instance.phone_number)
-            
-            # Define all possible fields that should be in the response
-            all_fields = [
-                'id', 'email', 'first_name', 'last_name', 'user_type',
-                'phone_number', 'blood_type', 'gender', 'date_of_birth',
-                'city', 'country', 'address', 'postal_code',
-                'latitude', 'longitude', 'weight', 'height',
-                'is_active', 'profile_complete'
+    # Keys added after Meta.fields for backward compatibility
+    EXTRA_FIELDS = ['urgency_level', 'organ_type']
+
+    @classmethod
+    def get_representation_plan(cls):
+        """
+        (key, getter) pairs for every output field, built once per class so
+        to_representation is a single pass over the instance.
+        """
+        plan = cls.__dict__.get('_representation_plan')
+        if plan is None:
+            getters = {
+                'fullname': lambda user: f"{user.first_name} {user.last_name}",
+                'phone_number': lambda user: str(user.phone_number) if user.phone_number else None,
+                'country': lambda user: str(user.country) if user.country else None,
+                'avatar': lambda user: file_url(user.avatar),
+                'recipient_profile': recipient_profile_data,
+                'urgency_level': lambda user: getattr(get_recipient_profile(user), 'urgency_level', None),
+                'organ_type': lambda user: getattr(get_recipient_profile(user), 'organ_type', None),
+            }
+            plan = [
+                (field, getters.get(field, attrgetter(field)))
+                for field in cls.Meta.fields + cls.EXTRA_FIELDS
             ]
-            
-            # Ensure all fields are present with their values from the instance
-            for field in all_fields:
-                value = getattr(instance, field, None)
-                if value is not None:
-                    if field == 'phone_number':
-                        data[field] = str(value)
-                    else:
-                        data[field] = value
-                elif field not in data:
-                    data[field] = None
-            
-            # Handle avatar field separately
-            try:
-                if instance.avatar and hasattr(instance.avatar, 'url'):
-                    data['avatar'] = instance.avatar.url
-                else:
-                    data['avatar'] = None
-            except (ValueError, AttributeError):
-                data['avatar'] = None
-            
-            # Ensure location data is consistent
-            if instance.city and instance.country:
-                data['city'] = instance.city
-                data['country'] = str(instance.country)
-                data['address'] = instance.address
-                data['postal_code'] = instance.postal_code
-                data['latitude'] = instance.latitude
-                data['longitude'] = instance.longitude
-            
-            # Add recipient profile data if user is a recipient
-            if instance.user_type == 'recipient':
-                try:
-                    # Always get or create recipient profile
-                    recipient_profile, created = RecipientProfile.objects.get_or_create(
-                        user=instance,
-                        defaults={
-                            'urgency_level': None,
-                            'organ_type': None,
-                            'hospital_letter': None
-                        }
-                    )
-                    
-                    # Always include recipient profile data
-                    data['recipient_profile'] = {
-                        'urgency_level': recipient_profile.urgency_level,
-                        'organ_type': recipient_profile.organ_type,
-                        'hospital_letter': recipient_profile.hospital_letter.url if recipient_profile.hospital_letter else None,
-                        'recipient_image': recipient_profile.recipient_image.url if recipient_profile.recipient_image else None
-                    }
-                    
-                    # Also include these fields at the top level for backward compatibility
-                    data['urgency_level'] = recipient_profile.urgency_level
-                    data['organ_type'] = recipient_profile.organ_type
-                except Exception as e:
-                    print(f"Error handling recipient profile: {str(e)}")
-                    # Provide default values if there's an error
-                    data['recipient_profile'] = {
-                        'urgency_level': None,
-                        'organ_type': None,
-                        'hospital_letter': None,
-                        'recipient_image': None
-                    }
-                    data['urgency_level'] = None
-                    data['organ_type'] = None
-            else:
-                data['recipient_profile'] = None
-                data['urgency_level'] = None
-                data['organ_type'] = None
-            
-            return data
-        except Exception as e:
-            print(f"Error in UserProfileSerializer.to_representation: {str(e)}")
-            # Return a safe default representation with all fields
-            data = super().to_representation(instance)
-            # Handle avatar field in error case
-            try:
-                if instance.avatar and hasattr(instance.avatar, 'url'):
-                    data['avatar'] = instance.avatar.url
-                else:
-                    data['avatar'] = None
-            except (ValueError, AttributeError):
-                data['avatar'] = None
-            return data
+            cls._representation_plan = plan
+        return plan
+
+    def to_representation(self, instance):
+        """
+        Model values as stored, plus the recipient profile for recipients.
+        Nothing is written here; querysets serialized with this should
+        select_related('recipient_profile') on the users.
+        """
+        return {field: getter(instance) for field, getter in self.get_representation_plan()}
 
     def update(self, instance, validated_data):
         try:
@@ -223,6 +187,8 @@ class UserProfileSerializer(CountryFieldMixin, serializers.ModelSerializer):
             # Update recipient profile if user is a recipient
             if instance.user_type == 'recipient':
                 recipient_profile, created = RecipientProfile.objects.get_or_create(user=instance)
+                # Keep the related object cache current for to_representation
+                instance.recipient_profile = recipient_profile
                 
                 # Update recipient profile fields
                 if recipient_profile_data:
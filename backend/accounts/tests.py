@@ -1,8 +1,12 @@
+import tempfile
+from io import StringIO
+from django.core.management import call_command
 from django.test import TestCase
 from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
-from .models import CustomUser
+from .models import CustomUser, RecipientProfile, age_expression
+from .serializers import UserProfileSerializer
 from django.core.files.uploadedfile import SimpleUploadedFile
 import json
 from datetime import date, timedelta
@@ -169,3 +173,128 @@ class RecipientTests(TestCase):
         self.assertEqual(user.email, self.recipient_data['email'])
         self.assertEqual(user.blood_type, self.recipient_data['blood_type'])
         self.assertFalse(user.is_verified)
+
+
+class ProfileFieldsTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email='donor@test.com', first_name='Test', last_name='Donor', gender='male',
+            date_of_birth=date(1990, 1, 1), blood_type='O+', password='testpass123',
+            user_type='donor', phone_number='+905123456789', weight=70, height=175
+        )
+
+    def test_profile_complete_is_stored_on_save(self):
+        """profile_complete is recomputed and persisted whenever the user is saved"""
+        self.assertFalse(CustomUser.objects.get(pk=self.user.pk).profile_complete)
+
+        self.user.latitude = 35.185566
+        self.user.longitude = 33.382276
+        self.user.save(update_fields=['latitude', 'longitude'])
+        self.assertTrue(CustomUser.objects.filter(pk=self.user.pk, profile_complete=True).exists())
+
+    def test_age_expression_matches_age(self):
+        """The database-side age agrees with the Python one around birthdays"""
+        today = date.today()
+        for years, days in [(30, 0), (30, 1), (30, -1)]:
+            try:
+                self.user.date_of_birth = today.replace(year=today.year - years) + timedelta(days=days)
+            except ValueError:
+                # 29 February
+                self.user.date_of_birth = date(today.year - years, 3, 1)
+            self.user.save()
+            user = CustomUser.objects.annotate(computed_age=age_expression()).get(pk=self.user.pk)
+            self.assertEqual(user.computed_age, user.age)
+            self.assertEqual(self.user.age, user.age)
+
+
+class UserProfileSerializerTests(TestCase):
+    def setUp(self):
+        self.recipient = CustomUser.objects.create_user(
+            email='recipient@test.com', first_name='Test', last_name='Recipient', gender='female',
+            date_of_birth=date(1985, 5, 5), blood_type='A+', password='testpass123',
+            user_type='recipient', phone_number='+905123456789'
+        )
+
+    def test_representation_does_not_create_profile(self):
+        """Reading a recipient without a profile leaves the database alone"""
+        data = UserProfileSerializer(self.recipient).data
+        self.assertFalse(RecipientProfile.objects.exists())
+        self.assertEqual(data['fullname'], 'Test Recipient')
+        self.assertEqual(data['phone_number'], '+905123456789')
+        self.assertEqual(data['recipient_profile']['urgency_level'], None)
+        self.assertIsNone(data['organ_type'])
+        self.assertIsNone(data['avatar'])
+
+    def test_select_related_users_serialize_without_queries(self):
+        RecipientProfile.objects.create(user=self.recipient, urgency_level='high', organ_type='kidney')
+        users = list(CustomUser.objects.select_related('recipient_profile'))
+        with self.assertNumQueries(0):
+            data = UserProfileSerializer(users, many=True).data
+        self.assertEqual(data[0]['recipient_profile']['organ_type'], 'kidney')
+        self.assertEqual(data[0]['urgency_level'], 'high')
+
+
+class PlatformTransferTests(TestCase):
+    def create_user(self, email, user_type):
+        return CustomUser.objects.create_user(
+            email=email, first_name='Test', last_name=user_type.title(), gender='male',
+            date_of_birth=date(1990, 1, 1), blood_type='O+', password='testpass123',
+            user_type=user_type, city='Nicosia', phone_number='+905123456789',
+            weight=70, height=175, latitude=35.185566, longitude=33.382276
+        )
+
+    def test_export_import_round_trip(self):
+        """Rows come back with their ids and timestamps, matched once and without notifications"""
+        from backend.donations.models import Organ, OrganMatch, RecipientRequest
+        from backend.notifications.models import Notification
+
+        donor = self.create_user('donor@test.com', 'donor')
+        recipient = self.create_user('recipient@test.com', 'recipient')
+        organ = Organ.objects.create(donor=donor, organ_name='kidney', blood_type='O+', location='Nicosia, CY')
+        RecipientRequest.objects.create(
+            recipient=recipient, organ_type='kidney', blood_type='O+', location='Nicosia, CY'
+        )
+        users = CustomUser.objects.order_by('id').values_list('id', 'created_at', 'profile_complete')
+        exported = list(users)
+
+        with tempfile.TemporaryDirectory() as directory:
+            call_command('export_platform', directory, '--batch-size', '1', stdout=StringIO())
+            CustomUser.objects.all().delete()
+            call_command('import_platform', directory, '--batch-size', '1', stdout=StringIO())
+
+        self.assertEqual(list(users), exported)
+        self.assertEqual(Organ.objects.get().pk, organ.pk)
+        self.assertTrue(CustomUser.objects.get(pk=donor.pk).check_password('testpass123'))
+        self.assertEqual(OrganMatch.objects.count(), 1)
+        self.assertFalse(Notification.objects.exists())
+
+    def test_generate_load_data_is_deterministic(self):
+        from backend.chat.models import ChatRoom, Message
+        from backend.donations.constants import OrganType
+        from backend.donations.models import Organ, RecipientRequest
+
+        def generate():
+            call_command(
+                'generate_load_data', '--donors', '3', '--recipients', '2', '--organs', '12',
+                '--messages', '20', '--rooms', '4', '--seed', '5', '--batch-size', '5', stdout=StringIO()
+            )
+            return list(Message.objects.order_by('id').values_list('uid', 'sender__email', 'content', 'timestamp'))
+
+        first = generate()
+        self.assertEqual(CustomUser.objects.filter(profile_complete=True).count(), 5)
+        self.assertEqual(RecipientRequest.objects.filter(status='open').count(), 2)
+        self.assertEqual(
+            set(Organ.objects.values_list('organ_name', flat=True)),
+            {organ_type.value for organ_type in OrganType}
+        )
+        self.assertEqual(ChatRoom.objects.count(), 4)
+        self.assertEqual(len(first), 20)
+
+        CustomUser.objects.all().delete()
+        self.assertEqual(generate(), first)
+
+    def test_generate_load_data_rejects_negative_counts(self):
+        from django.core.management.base import CommandError
+
+        with self.assertRaisesMessage(CommandError, '--rooms must not be negative'):
+            call_command('generate_load_data', '--rooms', '-1', stdout=StringIO())
@@ -1,9 +1,9 @@
 from django.urls import path
 from .views import (
     RegisterUserView, RegisterDonorView, RegisterRecipientView, 
-    UserProfileView, CustomPasswordResetView
+    UserProfileView, CustomPasswordResetView, LoginView
 )
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from rest_framework_simplejwt.views import TokenRefreshView
 from django.contrib.auth import views as auth_views
 from django.views.decorators.csrf import ensure_csrf_cookie
 from django.http import JsonResponse
@@ -20,7 +20,7 @@ urlpatterns = [
     path('register/', RegisterUserView.as_view(), name='register_user'),
     path('register/donor/', RegisterDonorView.as_view(), name='register_donor'),
     path('register/recipient/', RegisterRecipientView.as_view(), name='register_recipient'),
-    path('login/', TokenObtainPairView.as_view(), name='token_obtain_pair'), 
+    path('login/', LoginView.as_view(), name='token_obtain_pair'), 
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'), 
     path('user/', UserProfileView.as_view(), name='user_profile'),
     path('csrf/', get_csrf_token, name='csrf_token'),  # Simplified CSRF endpoint
@@ -4,8 +4,10 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from .models import CustomUser
 from .serializers import UserSerializer, DonorSerializer, RecipientSerializer, UserProfileSerializer
+from backend.activity.routes import ActivityRoute, record_activity
 from rest_framework.views import APIView
 from django.contrib.auth import views as auth_views
 from django.contrib.auth import get_user_model
@@ -56,6 +58,10 @@ class UserProfileView(APIView):
     """View for getting and updating user profile"""
     permission_classes = [IsAuthenticated]
     serializer_class = UserProfileSerializer
+    activity_routes = {
+        'put': ActivityRoute('profile_edited', 'User updated their profile'),
+        'patch': ActivityRoute('profile_edited', 'User updated their profile'),
+    }
 
     def get(self, request):
         """Get user profile"""
@@ -157,18 +163,29 @@ class UserProfileView(APIView):
             )
 
 class LoginView(TokenObtainPairView):
-    """View for user login"""
+    """View for user login; successful logins are recorded as activity"""
     serializer_class = TokenObtainPairSerializer
 
     def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
         try:
-            response = super().post(request, *args, **kwargs)
-            return response
-        except Exception as e:
-            return Response(
-                {'error': str(e)},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+            serializer.is_valid(raise_exception=True)
+        except TokenError as e:
+            raise InvalidToken(e.args[0])
+
+        # Token requests are unauthenticated, so the activity middleware
+        # never sees a user here
+        ip = request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')[0] or request.META.get('REMOTE_ADDR')
+        record_activity(
+            serializer.user,
+            'login',
+            'User logged in',
+            ip_address=ip,
+            device_info=request.META.get('HTTP_USER_AGENT', 'Unknown Browser')[:255],
+            location=ip,
+            metadata={'method': request.method, 'path': request.path}
+        )
+        return Response(serializer.validated_data, status=status.HTTP_200_OK)
 
 class CustomPasswordResetView(auth_views.PasswordResetView):
     def post(self, request, *args, **kwargs):
@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
-from activity.models import UserActivity
+from backend.activity.models import ActivityHistory
+from backend.activity.writer import activity_writer
 from django.utils import timezone
 
 User = get_user_model()
@@ -18,23 +19,21 @@ class Command(BaseCommand):
 
         # Sample activities
         activities = [
-            'Logged in to the system',
-            'Viewed organ listings',
-            'Created a new organ listing',
-            'Updated profile information',
-            'Sent a message to a donor',
-            'Received a new message',
-            'Updated organ listing status',
-            'Completed a donation request'
+            ('login', 'Logged in to the system'),
+            ('search_performed', 'Viewed organ listings'),
+            ('organ_listed', 'Created a new organ listing'),
+            ('profile_edited', 'Updated profile information'),
+            ('message_sent', 'Sent a message to a donor'),
+            ('organ_marked_unavailable', 'Updated organ listing status'),
+            ('request_accepted', 'Completed a donation request')
         ]
 
-        # Create activities for each user
-        for user in users:
-            for action in activities:
-                UserActivity.objects.create(
-                    user=user,
-                    action=action
-                )
-                self.stdout.write(f'Created activity for {user.username}: {action}')
+        # Create activities for each user; the writer also updates the daily stats
+        for user in users.iterator():
+            activity_writer.write_batch([
+                ActivityHistory(user=user, activity_type=activity_type, description=description)
+                for activity_type, description in activities
+            ])
+            self.stdout.write(f'Created activities for {user.email}')
 
         self.stdout.write(self.style.SUCCESS('Successfully created test activity data')) 
\ No newline at end of file
@@ -0,0 +1,98 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from backend.activity.models import ActivityDailyRollup, ActivityHistory
+
+
+class Command(BaseCommand):
+    help = 'Rolls activity history older than N days up into daily per-user counts and deletes the raw rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.ACTIVITY_RETENTION['RAW_DAYS'],
+            help='Keep raw activity rows for this many days'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.ACTIVITY_RETENTION['BATCH_SIZE'],
+            help='Number of raw rows rolled up and deleted per transaction'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many rows would be rolled up'
+        )
+
+    def handle(self, *args, **options):
+        days = options['days']
+        batch_size = options['batch_size']
+        if days < 0:
+            raise CommandError('--days must not be negative')
+        if batch_size <= 0:
+            raise CommandError('--batch-size must be positive')
+
+        cutoff = timezone.now() - timedelta(days=days)
+        candidates = ActivityHistory.objects.filter(created_at__lt=cutoff)
+
+        if options['dry_run']:
+            self.stdout.write(f'{candidates.count()} activities would be rolled up')
+            return
+
+        total = 0
+        last_id = 0
+        while True:
+            # Walk the primary key so every batch is a bounded range scan
+            batch = list(
+                candidates.filter(id__gt=last_id)
+                .order_by('id')
+                .values('id', 'user_id', 'activity_type', 'created_at')[:batch_size]
+            )
+            if not batch:
+                break
+
+            counts = Counter(
+                (row['user_id'], row['activity_type'], timezone.localdate(row['created_at']))
+                for row in batch
+            )
+            ids = [row['id'] for row in batch]
+            with transaction.atomic():
+                self.add_counts(counts)
+                ActivityHistory.objects.filter(id__in=ids).delete()
+
+            total += len(batch)
+            last_id = ids[-1]
+            self.stdout.write(f'Rolled up {total} activities...')
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully rolled up {total} activities'))
+
+    def add_counts(self, counts):
+        """Add counts keyed by (user_id, activity_type, date) to the rollup table"""
+        existing = {
+            (rollup.user_id, rollup.activity_type, rollup.date): rollup
+            for rollup in ActivityDailyRollup.objects.select_for_update().filter(
+                user_id__in={key[0] for key in counts},
+                activity_type__in={key[1] for key in counts},
+                date__in={key[2] for key in counts},
+            )
+        }
+        updated, created = [], []
+        for key, count in counts.items():
+            rollup = existing.get(key)
+            if rollup is not None:
+                rollup.count += count
+                updated.append(rollup)
+            else:
+                user_id, activity_type, date = key
+                created.append(ActivityDailyRollup(
+                    user_id=user_id, activity_type=activity_type, date=date, count=count
+                ))
+        ActivityDailyRollup.objects.bulk_update(updated, ['count'])
+        ActivityDailyRollup.objects.bulk_create(created)
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.7 on 2026-10-19 08:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activity', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('activity_type', models.CharField(choices=[('login', 'Login'), ('logout', 'Logout'), ('request_sent', 'Request Sent'), ('request_accepted', 'Request Accepted'), ('request_rejected', 'Request Rejected'), ('organ_listed', 'Organ Listed'), ('organ_edited', 'Organ Edited'), ('organ_deleted', 'Organ Deleted'), ('profile_edited', 'Profile Edited'), ('device_login', 'Login from New Device'), ('message_sent', 'Message Sent'), ('search_performed', 'Search Performed'), ('organ_marked_unavailable', 'Organ Marked Unavailable'), ('request_cancelled', 'Request Cancelled')], max_length=50)),
+                ('date', models.DateField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['date', 'activity_type'], name='activity_ac_date_0028d1_idx')],
+                'unique_together': {('user', 'activity_type', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+import re
+
+from django.db import migrations
+
+# Frozen copy of activity.routes.redact_metadata
+MAX_METADATA_FIELDS = 20
+MAX_METADATA_VALUE = 200
+SENSITIVE_FIELD = re.compile(r'pass|token|secret|auth|credential|otp|ssn|document', re.IGNORECASE)
+
+
+def redact(metadata):
+    if not isinstance(metadata, dict):
+        return {}
+    cleaned = {}
+    for key, value in list(metadata.items())[:MAX_METADATA_FIELDS]:
+        key = str(key)[:MAX_METADATA_VALUE]
+        if SENSITIVE_FIELD.search(key):
+            cleaned[key] = '[redacted]'
+        elif value is None or isinstance(value, (bool, int, float)):
+            cleaned[key] = value
+        elif isinstance(value, str):
+            cleaned[key] = value[:MAX_METADATA_VALUE]
+        else:
+            cleaned[key] = f'[{type(value).__name__}]'
+    return cleaned
+
+
+def redact_existing_metadata(apps, schema_editor):
+    """Scrub request bodies, including passwords, stored before metadata was redacted"""
+    ActivityHistory = apps.get_model('activity', 'ActivityHistory')
+    batch = []
+    for activity in ActivityHistory.objects.exclude(metadata=None).only('id', 'metadata').iterator(chunk_size=1000):
+        cleaned = redact(activity.metadata)
+        if cleaned != activity.metadata:
+            activity.metadata = cleaned
+            batch.append(activity)
+        if len(batch) >= 1000:
+            ActivityHistory.objects.bulk_update(batch, ['metadata'])
+            batch = []
+    if batch:
+        ActivityHistory.objects.bulk_update(batch, ['metadata'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activity', '0002_activitydailyrollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(redact_existing_metadata, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.1.7 on 2026-10-19 08:27
+
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_daily_stats(apps, schema_editor):
+    """Seed the stats from raw history and from rows already rolled up and pruned"""
+    ActivityHistory = apps.get_model('activity', 'ActivityHistory')
+    ActivityDailyRollup = apps.get_model('activity', 'ActivityDailyRollup')
+    ActivityDailyStats = apps.get_model('activity', 'ActivityDailyStats')
+
+    counts = Counter()
+    raw = ActivityHistory.objects.annotate(day=TruncDate('created_at')).values('day', 'activity_type').annotate(n=Count('id'))
+    for row in raw:
+        counts[(row['day'], row['activity_type'])] += row['n']
+    rolled_up = ActivityDailyRollup.objects.values('date', 'activity_type').annotate(n=Sum('count'))
+    for row in rolled_up:
+        counts[(row['date'], row['activity_type'])] += row['n']
+
+    ActivityDailyStats.objects.bulk_create(
+        [
+            ActivityDailyStats(date=date, activity_type=activity_type, count=count)
+            for (date, activity_type), count in counts.items()
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activity', '0003_redact_activity_metadata'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('activity_type', models.CharField(choices=[('login', 'Login'), ('logout', 'Logout'), ('request_sent', 'Request Sent'), ('request_accepted', 'Request Accepted'), ('request_rejected', 'Request Rejected'), ('organ_listed', 'Organ Listed'), ('organ_edited', 'Organ Edited'), ('organ_deleted', 'Organ Deleted'), ('profile_edited', 'Profile Edited'), ('device_login', 'Login from New Device'), ('message_sent', 'Message Sent'), ('search_performed', 'Search Performed'), ('organ_marked_unavailable', 'Organ Marked Unavailable'), ('request_cancelled', 'Request Cancelled')], max_length=50)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Activity daily stats',
+                'ordering': ['date'],
+                'unique_together': {('date', 'activity_type')},
+            },
+        ),
+        migrations.RunPython(backfill_daily_stats, migrations.RunPython.noop),
+    ]
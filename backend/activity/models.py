@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import F
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -41,4 +42,51 @@ class ActivityHistory(models.Model):
         ]
 
     def __str__(self):
-        return f"{self.user.username} - {self.get_activity_type_display()} - {self.created_at}"
\ No newline at end of file
+        return f"{self.user.username} - {self.get_activity_type_display()} - {self.created_at}"
+
+class ActivityDailyRollup(models.Model):
+    """
+    Per-user, per-type daily activity counts kept after the raw
+    ActivityHistory rows are pruned by the rollup_activity command.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='activity_rollups')
+    activity_type = models.CharField(max_length=50, choices=ActivityHistory.ACTIVITY_TYPES)
+    date = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-date']
+        unique_together = ['user', 'activity_type', 'date']
+        indexes = [
+            models.Index(fields=['date', 'activity_type']),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.get_activity_type_display()} x{self.count} on {self.date}"
+
+class ActivityDailyStats(models.Model):
+    """
+    Site-wide activity counts per day and type, maintained incrementally by
+    the activity writer so the stats endpoint never scans ActivityHistory.
+    """
+    date = models.DateField()
+    activity_type = models.CharField(max_length=50, choices=ActivityHistory.ACTIVITY_TYPES)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['date']
+        unique_together = ['date', 'activity_type']
+        verbose_name_plural = 'Activity daily stats'
+
+    def __str__(self):
+        return f"{self.get_activity_type_display()} x{self.count} on {self.date}"
+
+    @classmethod
+    def increment(cls, counts):
+        """Add counts keyed by (date, activity_type)"""
+        cls.objects.bulk_create(
+            [cls(date=date, activity_type=activity_type) for date, activity_type in counts],
+            ignore_conflicts=True
+        )
+        for (date, activity_type), count in counts.items():
+            cls.objects.filter(date=date, activity_type=activity_type).update(count=F('count') + count)
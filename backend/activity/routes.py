@@ -0,0 +1,104 @@
+import re
+from collections import namedtuple
+
+from channels.db import database_sync_to_async
+
+from .models import ActivityHistory
+from .writer import activity_writer
+
+# Declared by views in an `activity_routes` dict keyed on the viewset action
+# (or the lower-case handler name for plain APIViews), e.g.
+#
+#     activity_routes = {
+#         'create': ActivityRoute('organ_listed', 'User created a new organ listing'),
+#         'messages': ActivityRoute('message_sent', 'User sent a message', methods=('POST',)),
+#     }
+ActivityRoute = namedtuple('ActivityRoute', ['activity_type', 'description', 'methods'], defaults=[None])
+
+# (view function, method) -> ActivityRoute or None, filled on first use
+_route_table = {}
+
+# Metadata keeps at most MAX_METADATA_FIELDS scalar values of up to
+# MAX_METADATA_VALUE characters; credentials are never stored
+MAX_METADATA_FIELDS = 20
+MAX_METADATA_VALUE = 200
+SENSITIVE_FIELD = re.compile(r'pass|token|secret|auth|credential|otp|ssn|document', re.IGNORECASE)
+REDACTED = '[redacted]'
+
+
+def lookup_route(view, method):
+    cls = getattr(view, 'cls', None)
+    routes = getattr(cls, 'activity_routes', None)
+    if not routes:
+        return None
+    actions = getattr(view, 'actions', None)
+    handler = actions.get(method.lower()) if actions else method.lower()
+    route = routes.get(handler)
+    if route is None or (route.methods and method not in route.methods):
+        return None
+    return route
+
+
+def resolve_activity(resolver_match, method):
+    """Return the ActivityRoute recorded for a resolved request, if any"""
+    if resolver_match is None:
+        return None
+    key = (resolver_match.func, method)
+    try:
+        return _route_table[key]
+    except KeyError:
+        route = _route_table[key] = lookup_route(resolver_match.func, method)
+        return route
+
+
+def redact_metadata(metadata):
+    """Trim request metadata to a bounded, flat dict without credentials"""
+    if not isinstance(metadata, dict):
+        return {}
+    cleaned = {}
+    for key, value in list(metadata.items())[:MAX_METADATA_FIELDS]:
+        key = str(key)[:MAX_METADATA_VALUE]
+        if SENSITIVE_FIELD.search(key):
+            cleaned[key] = REDACTED
+        elif value is None or isinstance(value, (bool, int, float)):
+            cleaned[key] = value
+        elif isinstance(value, str):
+            cleaned[key] = value[:MAX_METADATA_VALUE]
+        else:
+            # Nested structures only record their type
+            cleaned[key] = f'[{type(value).__name__}]'
+    return cleaned
+
+
+def record_activity(user, activity_type, description, ip_address=None, device_info=None,
+                    location=None, metadata=None):
+    """Queue an activity history row for the background writer"""
+    return activity_writer.enqueue(ActivityHistory(
+        user=user,
+        activity_type=activity_type,
+        description=description,
+        ip_address=ip_address,
+        device_info=device_info,
+        location=location,
+        metadata=redact_metadata(metadata)
+    ))
+
+
+async def arecord_activity(scope, activity_type, description, metadata=None):
+    """
+    record_activity for WebSocket consumers; client address and user agent
+    come from the ASGI scope.
+    """
+    headers = dict(scope.get('headers') or [])
+    client = scope.get('client')
+    ip_address = client[0] if client else None
+    kwargs = dict(
+        ip_address=ip_address,
+        device_info=headers.get(b'user-agent', b'').decode('latin-1')[:255] or None,
+        location=ip_address,
+        metadata={'path': scope.get('path'), 'transport': 'websocket', **(metadata or {})}
+    )
+    if activity_writer.enabled:
+        # Only a queue put, safe to call from the event loop
+        return record_activity(scope['user'], activity_type, description, **kwargs)
+    return await database_sync_to_async(record_activity)(scope['user'], activity_type, description, **kwargs)
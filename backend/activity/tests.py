@@ -1,3 +1,198 @@
+from datetime import date, timedelta
+from io import StringIO
+
+from asgiref.sync import iscoroutinefunction
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .middleware import ActivityLoggingMiddleware
+from .models import ActivityDailyRollup, ActivityDailyStats, ActivityHistory
+from .routes import redact_metadata
+from .writer import ActivityWriter, activity_writer
+
+User = get_user_model()
+
+
+def create_user(email):
+    return User.objects.create_user(
+        email=email,
+        first_name='Test',
+        last_name='User',
+        gender='male',
+        date_of_birth=date(1990, 1, 1),
+        blood_type='A+',
+        password='testpass123',
+        user_type='donor'
+    )
+
+
+class ActivityWriterTests(TestCase):
+    def setUp(self):
+        self.user = create_user('donor@test.com')
+
+    def activity(self, i):
+        return ActivityHistory(user=self.user, activity_type='search_performed', description=f'Search {i}')
+
+    def test_full_queue_drops_and_shutdown_drains_in_one_insert(self):
+        writer = ActivityWriter({'ENABLED': True, 'QUEUE_SIZE': 2, 'MAX_BATCH': 10, 'FLUSH_INTERVAL_MS': 50})
+        # Keep the background thread out of the test transaction
+        writer.ensure_thread = lambda: None
+
+        results = [writer.enqueue(self.activity(i)) for i in range(3)]
+
+        self.assertEqual(results, [True, True, False])
+        self.assertEqual(ActivityHistory.objects.count(), 0)
+        with CaptureQueriesContext(connection) as captured:
+            writer.shutdown()
+        inserts = [q for q in captured if q['sql'].startswith('INSERT INTO "activity_activityhistory"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(ActivityHistory.objects.count(), 2)
+        self.assertEqual(writer.stats(), {'queued': 0, 'written': 2, 'dropped': 1, 'failed': 0})
+
+    def test_middleware_records_matched_requests_only(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        client.get('/api/chat/messages/search/', {'q': 'kidney'})
+        client.get('/api/notifications/')
+        # Failed requests and unrouted paths are not recorded
+        client.get('/api/chat/messages/search/')
+        client.post('/api/no-such-endpoint/')
+
+        activities = list(ActivityHistory.objects.values_list('activity_type', 'metadata__path'))
+        self.assertEqual(activities, [('search_performed', '/api/chat/messages/search/')])
+
+    def test_routes_are_declared_per_action_and_method(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        client.patch('/api/accounts/user/', {'first_name': 'Renamed'}, format='json')
+        client.get('/api/accounts/user/')
+
+        self.assertEqual(
+            list(ActivityHistory.objects.values_list('activity_type', flat=True)),
+            ['profile_edited']
+        )
+
+    async def test_async_stack_records_without_sync_middleware(self):
+        async def view(request):
+            return HttpResponse()
+
+        self.assertTrue(iscoroutinefunction(ActivityLoggingMiddleware(view)))
+
+        token = AccessToken.for_user(self.user)
+        response = await self.async_client.get(
+            '/api/chat/messages/search/', {'q': 'kidney'}, headers={'Authorization': f'Bearer {token}'}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [a async for a in ActivityHistory.objects.values_list('activity_type', flat=True)],
+            ['search_performed']
+        )
+
+
+class ActivityRetentionTests(TestCase):
+    def setUp(self):
+        self.user = create_user('donor@test.com')
+
+    def create_activity(self, activity_type, days_ago):
+        activity = ActivityHistory.objects.create(user=self.user, activity_type=activity_type, description='x')
+        ActivityHistory.objects.filter(id=activity.id).update(created_at=timezone.now() - timedelta(days=days_ago))
+        return activity
+
+    def test_old_rows_are_rolled_up_into_daily_counts(self):
+        for _ in range(3):
+            self.create_activity('search_performed', 40)
+        self.create_activity('login', 40)
+        recent = self.create_activity('search_performed', 1)
+        ActivityDailyRollup.objects.create(
+            user=self.user, activity_type='search_performed',
+            date=timezone.localdate(timezone.now() - timedelta(days=40)), count=2
+        )
+
+        call_command('rollup_activity', '--days', '30', '--batch-size', '2', stdout=StringIO())
+
+        self.assertEqual(list(ActivityHistory.objects.values_list('id', flat=True)), [recent.id])
+        self.assertEqual(
+            dict(ActivityDailyRollup.objects.values_list('activity_type', 'count')),
+            {'search_performed': 5, 'login': 1}
+        )
+
+    def test_metadata_is_trimmed_and_redacted(self):
+        metadata = redact_metadata({
+            'first_name': 'Renamed', 'password': 'hunter2', 'refresh_token': 'abc',
+            'hospitals': ['A', 'B'], 'bio': 'x' * 500, 'age': 30
+        })
+
+        self.assertEqual(metadata, {
+            'first_name': 'Renamed', 'password': '[redacted]', 'refresh_token': '[redacted]',
+            'hospitals': '[list]', 'bio': 'x' * 200, 'age': 30
+        })
+        self.assertEqual(len(redact_metadata({f'field{i}': i for i in range(50)})), 20)
+        self.assertEqual(redact_metadata(['not', 'a', 'dict']), {})
+
+
+class ActivityStatsTests(TestCase):
+    url = '/api/activity/stats/'
+
+    def setUp(self):
+        self.user = create_user('donor@test.com')
+        self.admin = create_user('admin@test.com')
+        self.admin.is_staff = True
+        self.admin.save()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_writer_maintains_daily_counts(self):
+        for activity_type in ('login', 'login', 'search_performed'):
+            activity_writer.enqueue(ActivityHistory(user=self.user, activity_type=activity_type, description='x'))
+
+        today = timezone.localdate()
+        self.assertEqual(
+            set(ActivityDailyStats.objects.values_list('date', 'activity_type', 'count')),
+            {(today, 'login', 2), (today, 'search_performed', 1)}
+        )
+
+    def test_series_are_bucketed_and_cacheable(self):
+        today = timezone.localdate()
+        ActivityDailyStats.objects.create(date=today, activity_type='login', count=3)
+        ActivityDailyStats.objects.create(date=today - timedelta(days=1), activity_type='login', count=2)
+        ActivityDailyStats.objects.create(date=today, activity_type='organ_listed', count=1)
+        ActivityDailyStats.objects.create(date=today - timedelta(days=10), activity_type='login', count=7)
+
+        response = self.client.get(self.url, {'days': 3, 'types': 'login'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['buckets'], [today - timedelta(days=i) for i in (2, 1, 0)])
+        self.assertEqual(response.data['series'], {'login': [0, 2, 3]})
+        self.assertEqual(response.data['totals'], {'login': 5})
+        self.assertIn('max-age=300', response['Cache-Control'])
+
+        response = self.client.get(self.url, {'days': 14, 'bucket': 'month'})
+        self.assertEqual(sum(response.data['series']['login']), 12)
+
+    def test_admin_only(self):
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_logins_through_both_token_urls_are_counted(self):
+        login = APIClient()
+        for url in ('/api/token/', '/api/accounts/login/'):
+            response = login.post(url, {'email': 'donor@test.com', 'password': 'testpass123'}, format='json')
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('access', response.data)
+        response = login.post('/api/token/', {'email': 'donor@test.com', 'password': 'wrong'}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+        response = self.client.get(self.url, {'days': 1, 'types': 'login'})
 
-# Create your tests here.
+        self.assertEqual(response.data['totals'], {'login': 2})
+        self.assertEqual(ActivityHistory.objects.filter(user=self.user, activity_type='login').count(), 2)
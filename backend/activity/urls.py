@@ -1,10 +1,11 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ActivityHistoryViewSet
+from .views import ActivityHistoryViewSet, ActivityStatsView
 
 router = DefaultRouter()
 router.register(r'activities', ActivityHistoryViewSet, basename='activity-history')
 
 urlpatterns = [
+    path('stats/', ActivityStatsView.as_view(), name='activity-stats'),
     path('', include(router.urls)),
 ] 
\ No newline at end of file
@@ -1,18 +1,25 @@
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from .models import ActivityHistory
+from rest_framework.views import APIView
+from .models import ActivityDailyStats, ActivityHistory
 from .serializers import ActivityHistorySerializer
+from .writer import activity_writer
+from backend.notifications.mixins import BulkMarkReadMixin
 import logging
 
 logger = logging.getLogger(__name__)
 
-class ActivityHistoryViewSet(viewsets.ModelViewSet):
+class ActivityHistoryViewSet(BulkMarkReadMixin, viewsets.ModelViewSet):
     serializer_class = ActivityHistorySerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return ActivityHistory.objects.filter(user=self.request.user)
+        return ActivityHistory.objects.filter(user=self.request.user).select_related('user')
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -20,6 +27,9 @@ class ActivityHistoryViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def my_activities(self, request):
         activities = self.get_queryset()
+        page = self.paginate_queryset(activities)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
         serializer = self.get_serializer(activities, many=True)
         return Response(serializer.data)
 
@@ -31,10 +41,15 @@ class ActivityHistoryViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def mark_read(self, request, pk=None):
         activity = self.get_object()
-        activity.is_read = True
-        activity.save()
+        self.bulk_mark_read(self.get_queryset(), {'ids': [activity.id]})
         return Response({'status': 'success'}, status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=['post'])
+    def mark_many_read(self, request):
+        scope = self.get_bulk_read_scope(request)
+        updated = self.bulk_mark_read(self.get_queryset(), scope)
+        return Response({'status': 'success', 'updated': updated}, status=status.HTTP_200_OK)
+
     @action(detail=False, methods=['get'])
     def unread_count(self, request):
         count = self.get_queryset().filter(is_read=False).count()
@@ -56,3 +71,67 @@ class ActivityHistoryViewSet(viewsets.ModelViewSet):
         except Exception as e:
             logger.error(f"Error creating test activity: {str(e)}")
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+class ActivityStatsView(APIView):
+    """
+    Site-wide activity counts by type for admins, bucketed by day, week or
+    month. Served from the ActivityDailyStats aggregates, never from the raw
+    ActivityHistory table.
+
+    ?days= (default 30) selects the window ending today, ?bucket= day, week
+    or month, and ?types= a comma-separated list of activity types.
+    """
+    permission_classes = [permissions.IsAdminUser]
+    default_days = 30
+    max_days = 366
+    buckets = {
+        'day': lambda date: date,
+        'week': lambda date: date - timedelta(days=date.weekday()),
+        'month': lambda date: date.replace(day=1),
+    }
+
+    def get(self, request):
+        try:
+            days = int(request.query_params.get('days', self.default_days))
+        except ValueError:
+            return Response({'error': 'days must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        days = max(1, min(days, self.max_days))
+        bucket = request.query_params.get('bucket', 'day')
+        if bucket not in self.buckets:
+            return Response(
+                {'error': f"bucket must be one of {', '.join(self.buckets)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        to_bucket = self.buckets[bucket]
+
+        end = timezone.localdate()
+        start = end - timedelta(days=days - 1)
+        rows = ActivityDailyStats.objects.filter(date__range=(start, end))
+        types = request.query_params.get('types')
+        if types:
+            rows = rows.filter(activity_type__in=types.split(','))
+
+        bucket_starts = []
+        day = start
+        while day <= end:
+            if to_bucket(day) not in bucket_starts:
+                bucket_starts.append(to_bucket(day))
+            day += timedelta(days=1)
+        positions = {bucket_start: i for i, bucket_start in enumerate(bucket_starts)}
+
+        series = {}
+        for date, activity_type, count in rows.values_list('date', 'activity_type', 'count'):
+            counts = series.setdefault(activity_type, [0] * len(bucket_starts))
+            counts[positions[to_bucket(date)]] += count
+
+        response = Response({
+            'start': start,
+            'end': end,
+            'bucket': bucket,
+            'buckets': bucket_starts,
+            'series': series,
+            'totals': {activity_type: sum(counts) for activity_type, counts in series.items()},
+            'writer': activity_writer.stats(),
+        })
+        patch_cache_control(response, private=True, max_age=settings.ACTIVITY_STATS_MAX_AGE)
+        return response
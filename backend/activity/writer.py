@@ -0,0 +1,150 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .models import ActivityDailyStats, ActivityHistory
+
+logger = logging.getLogger(__name__)
+
+
+class ActivityWriter:
+    """
+    Background writer for activity history rows.
+
+    The request thread only puts an unsaved ActivityHistory on a bounded
+    queue. A daemon thread writes the queue with bulk_create once
+    MAX_BATCH rows are pending or FLUSH_INTERVAL_MS after the first one.
+    When the queue is full new events are dropped and counted rather than
+    slowing requests down. Pending rows are written at interpreter exit.
+    Every batch also bumps the ActivityDailyStats counters.
+    """
+
+    def __init__(self, config=None):
+        self._config = config
+        self.queue = queue.Queue(maxsize=self.config['QUEUE_SIZE'])
+        self.thread = None
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        atexit.register(self.shutdown)
+
+    @property
+    def config(self):
+        return self._config or settings.ACTIVITY_WRITER
+
+    @property
+    def enabled(self):
+        return self.config['ENABLED']
+
+    def enqueue(self, activity):
+        if not self.enabled:
+            self.write_batch([activity])
+            return True
+        self.ensure_thread()
+        try:
+            self.queue.put_nowait(activity)
+            return True
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+                dropped = self.dropped
+            if dropped == 1 or dropped % 100 == 0:
+                logger.warning(f"Activity queue full, {dropped} events dropped so far")
+            return False
+
+    def ensure_thread(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name='activity-writer', daemon=True)
+                self.thread.start()
+
+    def run(self):
+        max_batch = self.config['MAX_BATCH']
+        interval = self.config['FLUSH_INTERVAL_MS'] / 1000
+        while not self.stopping.is_set():
+            try:
+                batch = [self.queue.get(timeout=interval)]
+            except queue.Empty:
+                continue
+            deadline = time.monotonic() + interval
+            while len(batch) < max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self.write_batch(batch)
+            close_old_connections()
+
+    def write_batch(self, batch):
+        try:
+            ActivityHistory.objects.bulk_create(batch)
+            saved = batch
+        except Exception as e:
+            logger.error(f"Bulk insert of {len(batch)} activities failed, saving individually: {str(e)}")
+            saved = []
+            for activity in batch:
+                try:
+                    activity.save()
+                    saved.append(activity)
+                except Exception as e:
+                    logger.error(f"Dropping activity {activity.activity_type}: {str(e)}")
+
+        # Keep the per-day aggregates behind the stats endpoint current
+        try:
+            ActivityDailyStats.increment(Counter(
+                (timezone.localdate(activity.created_at), activity.activity_type) for activity in saved
+            ))
+        except Exception as e:
+            logger.error(f"Error updating activity stats: {str(e)}")
+
+        with self.lock:
+            self.written += len(saved)
+            self.failed += len(batch) - len(saved)
+
+    def drain(self):
+        """Write everything still queued from the calling thread"""
+        batch = []
+        while True:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+            if len(batch) >= self.config['MAX_BATCH']:
+                self.write_batch(batch)
+                batch = []
+        if batch:
+            self.write_batch(batch)
+
+    def shutdown(self, timeout=5):
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+        if not self.queue.empty():
+            logger.info(f"Writing {self.queue.qsize()} queued activities on shutdown")
+            self.drain()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'queued': self.queue.qsize(),
+                'written': self.written,
+                'dropped': self.dropped,
+                'failed': self.failed,
+            }
+
+
+activity_writer = ActivityWriter()
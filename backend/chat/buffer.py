@@ -0,0 +1,108 @@
+import asyncio
+import atexit
+import logging
+from collections import OrderedDict
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+
+from .models import Message
+from backend.notifications.utils import notify_new_message
+
+logger = logging.getLogger(__name__)
+
+
+def write_messages(messages):
+    """
+    Persist a batch of unsaved messages and raise their notifications.
+
+    The batch is written with a single bulk_create. If that fails the
+    messages are saved one by one so a single bad row does not drop the
+    rest of the batch.
+    """
+    try:
+        Message.objects.bulk_create(messages)
+        saved = messages
+    except Exception as e:
+        logger.error(f"Bulk insert of {len(messages)} chat messages failed, saving individually: {str(e)}")
+        saved = []
+        for message in messages:
+            try:
+                message.save()
+                saved.append(message)
+            except Exception as e:
+                logger.error(f"Dropping chat message {message.uid}: {str(e)}")
+
+    # One activity bump per room and one notification update per room and
+    # sender instead of one of each per message
+    senders = OrderedDict()
+    rooms = {}
+    for message in saved:
+        key = (message.chat_room_id, message.sender_id)
+        senders[key] = (message, senders[key][1] + 1 if key in senders else 1)
+        rooms[message.chat_room_id] = message
+    for message in rooms.values():
+        message.chat_room.touch_last_activity(message.timestamp)
+    for message, count in senders.values():
+        notify_new_message(message, chat_room=message.chat_room, count=count)
+    return len(saved)
+
+
+class MessageWriteBuffer:
+    """
+    In-process write-behind buffer for chat messages.
+
+    Consumers add unsaved Message instances after broadcasting them. The
+    buffer is written out with bulk_create once MAX_BATCH messages are
+    pending or FLUSH_INTERVAL_MS after the first pending message, whichever
+    comes first.
+    """
+
+    def __init__(self):
+        self.pending = []
+        self.timer = None
+        atexit.register(self.flush_sync)
+
+    @property
+    def max_batch(self):
+        return settings.CHAT_WRITE_BEHIND['MAX_BATCH']
+
+    @property
+    def flush_interval(self):
+        return settings.CHAT_WRITE_BEHIND['FLUSH_INTERVAL_MS'] / 1000
+
+    async def add(self, message):
+        self.pending.append(message)
+        if len(self.pending) >= self.max_batch:
+            await self.flush()
+        elif not self.timer_scheduled():
+            self.timer = asyncio.create_task(self.flush_later())
+
+    def timer_scheduled(self):
+        return (
+            self.timer is not None
+            and not self.timer.done()
+            and self.timer.get_loop() is asyncio.get_running_loop()
+        )
+
+    async def flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        self.timer = None
+        await self.flush()
+
+    async def flush(self):
+        """Write everything that is pending"""
+        # Swap the list before awaiting so messages added meanwhile go to the next batch
+        batch, self.pending = self.pending, []
+        if batch:
+            await database_sync_to_async(write_messages)(batch)
+
+    def flush_sync(self):
+        """Write pending messages from synchronous code, e.g. at interpreter shutdown"""
+        batch, self.pending = self.pending, []
+        if batch:
+            logger.info(f"Flushing {len(batch)} buffered chat messages on shutdown")
+            write_messages(batch)
+
+
+message_buffer = MessageWriteBuffer()
@@ -1,9 +1,17 @@
 import json
+import time
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth import get_user_model
-from rest_framework_simplejwt.tokens import AccessToken
+from django.core.exceptions import PermissionDenied
+from django.db.models import Q
+from django.conf import settings
 from .models import ChatRoom, Message
+from .buffer import message_buffer
+from .presence import mark_online, mark_offline, refresh_presence, get_online_users
+from backend.notifications.utils import notify_new_message
+from backend.realtime.throttling import ThrottledConsumerMixin
+from backend.activity.routes import arecord_activity
 from datetime import datetime
 import logging
 
@@ -15,100 +23,120 @@ class ChatMessageHandler:
     
     @staticmethod
     @database_sync_to_async
-    def save_message(sender_id: int, content: str, room_id: int) -> Message:
-        """Save a message to the database"""
+    def save_message(sender: User, content: str, room: ChatRoom) -> Message:
+        """
+        Save a message to the database.
+
+        The sender and room are the instances cached on the connection, so
+        this is a single INSERT using their ids plus the notification update.
+        """
         try:
-            sender = User.objects.get(id=sender_id)
-            room = ChatRoom.objects.get(id=room_id)
             message = Message.objects.create(
                 chat_room=room,
                 sender=sender,
                 content=content,
                 is_read=False
             )
-            logger.info(f"Message saved successfully with ID: {message.id}")
+            logger.debug("Message saved successfully with ID: %s", message.id)
+            room.touch_last_activity(message.timestamp)
+            notify_new_message(message, chat_room=room)
             return message
-        except User.DoesNotExist:
-            logger.error(f"User with ID {sender_id} not found")
-            raise
-        except ChatRoom.DoesNotExist:
-            logger.error(f"Chat room with ID {room_id} not found")
-            raise
         except Exception as e:
             logger.error(f"Error saving message: {str(e)}")
             raise
 
     @staticmethod
-    @database_sync_to_async
-    def get_room_details(room_id: int) -> dict:
-        """Get chat room details including organ information"""
-        try:
-            room = ChatRoom.objects.select_related('organ').get(id=room_id)
-            return {
-                'organ_name': room.organ.organ_name if room.organ else None,
-                'organ_id': room.organ.id if room.organ else None
-            }
-        except ChatRoom.DoesNotExist:
-            logger.error(f"Chat room with ID {room_id} not found")
-            return {'organ_name': None, 'organ_id': None}
-        except Exception as e:
-            logger.error(f"Error getting room details: {str(e)}")
-            return {'organ_name': None, 'organ_id': None}
+    def get_organ_details(room: ChatRoom) -> dict:
+        """Get the organ information of a chat room loaded with select_related"""
+        organ = room.organ if room.organ_id else None
+        return {
+            'name': organ.organ_name if organ else None,
+            'id': organ.id if organ else None
+        }
 
     @staticmethod
-    async def format_message_response(message: str, sender: dict, chat_room_id: str, 
-                              timestamp: str, is_read: bool) -> dict:
+    def format_message_response(message: str, sender: dict, chat_room_id: str,
+                                timestamp: str, is_read: bool, organ: dict, uid: str = None) -> dict:
         """Format message response for WebSocket"""
-        # Get room details including organ information
-        room_details = await ChatMessageHandler.get_room_details(int(chat_room_id))
-        
         return {
             'type': 'chat_message',
+            'uid': uid,
             'message': message,
             'sender': sender,
             'chatRoomId': chat_room_id,
             'timestamp': timestamp,
             'is_read': is_read,
-            'organ': {
-                'name': room_details['organ_name'],
-                'id': room_details['organ_id']
-            }
+            'organ': organ
         }
 
 class ChatAuthHandler:
     """Handles chat authentication and authorization"""
     
     @staticmethod
-    async def authenticate_user(scope) -> tuple[User, str]:
-        """Authenticate user from WebSocket connection"""
-        try:
-            query_string = scope['query_string'].decode()
-            token = query_string.split('=')[1]
-            access_token = AccessToken(token)
-            user_id = access_token['user_id']
-            user = await ChatAuthHandler.get_user(user_id)
-            return user, token
-        except Exception as e:
-            logger.error(f"Authentication error: {str(e)}")
-            raise
+    async def authenticate_user(scope) -> User:
+        """Return the user JWTAuthMiddleware put in the scope"""
+        user = scope.get('user')
+        if user is None or not user.is_authenticated:
+            logger.error("Authentication error: missing or invalid token")
+            raise PermissionDenied('Authentication required')
+        return user
 
     @staticmethod
     @database_sync_to_async
-    def get_user(user_id: int) -> User:
-        """Get user from database"""
-        return User.objects.get(id=user_id)
+    def get_user_rooms(user: User) -> dict:
+        """Get all chat rooms the user takes part in, keyed by id, in one query"""
+        rooms = ChatRoom.objects.select_related('organ', 'donor', 'recipient').filter(
+            Q(donor=user) | Q(recipient=user)
+        )
+        return {room.id: room for room in rooms}
 
     @staticmethod
     @database_sync_to_async
-    def has_access_to_room(room_id: int, user: User) -> bool:
-        """Check if user has access to chat room"""
-        try:
-            room = ChatRoom.objects.get(id=room_id)
-            return room.donor == user or room.recipient == user
-        except ChatRoom.DoesNotExist:
-            return False
+    def get_accessible_room(room_id: int, user: User):
+        """Get the chat room with its organ and participants if the user takes part in it"""
+        return ChatRoom.objects.select_related('organ', 'donor', 'recipient').filter(
+            Q(donor=user) | Q(recipient=user),
+            id=room_id
+        ).first()
+
+class ChatPublisherMixin:
+    """Persists messages from the connected user and broadcasts them to the room group"""
+
+    async def publish_message(self, room: ChatRoom, content: str, temp_id: str = None) -> dict:
+        write_behind = settings.CHAT_WRITE_BEHIND['ENABLED']
+        if write_behind:
+            # Broadcast right away; the buffer writes the row in a later batch
+            saved_message = Message(
+                chat_room=room,
+                sender=self.user,
+                content=content,
+                is_read=False
+            )
+        else:
+            saved_message = await self.message_handler.save_message(
+                self.user, content, room
+            )
+
+        response_data = self.message_handler.format_message_response(
+            message=content,
+            sender={'id': self.user.id, 'fullname': self.user.fullname},
+            chat_room_id=str(room.id),
+            timestamp=saved_message.timestamp.isoformat(),
+            is_read=saved_message.is_read,
+            organ=self.message_handler.get_organ_details(room),
+            uid=str(saved_message.uid)
+        )
+        # Echo tempId if present
+        if temp_id:
+            response_data['tempId'] = temp_id
+
+        await self.channel_layer.group_send(f'chat_{room.id}', response_data)
+        if write_behind:
+            await message_buffer.add(saved_message)
+        await arecord_activity(self.scope, 'message_sent', 'User sent a message', {'chatRoomId': room.id})
+        return response_data
 
-class ChatConsumer(AsyncWebsocketConsumer):
+class ChatConsumer(ThrottledConsumerMixin, ChatPublisherMixin, AsyncWebsocketConsumer):
     """WebSocket consumer for chat functionality"""
     
     def __init__(self, *args, **kwargs):
@@ -116,6 +144,9 @@ class ChatConsumer(AsyncWebsocketConsumer):
         self.room_id = None
         self.room_group_name = None
         self.user = None
+        self.room = None
+        self.is_present = False
+        self.last_typing_sent = 0.0
         self.message_handler = ChatMessageHandler()
         self.auth_handler = ChatAuthHandler()
 
@@ -126,10 +157,11 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
         try:
             # Authenticate user
-            self.user, _ = await self.auth_handler.authenticate_user(self.scope)
+            self.user = await self.auth_handler.authenticate_user(self.scope)
             
-            # Verify room access
-            if not await self.auth_handler.has_access_to_room(self.room_id, self.user):
+            # Verify room access and keep the room for the lifetime of the connection
+            self.room = await self.auth_handler.get_accessible_room(self.room_id, self.user)
+            if self.room is None:
                 logger.warning(f"User {self.user.id} denied access to room {self.room_id}")
                 await self.close(code=4001)
                 return
@@ -141,6 +173,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
             )
             await self.accept()
             logger.info(f"WebSocket connection accepted for user {self.user.id} in room {self.room_id}")
+            await self.join_presence()
 
         except Exception as e:
             logger.error(f"Connection error: {str(e)}")
@@ -148,24 +181,37 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
     async def disconnect(self, close_code):
         """Handle WebSocket disconnection"""
+        if self.is_present:
+            await self.leave_presence()
         await self.channel_layer.group_discard(
             self.room_group_name,
             self.channel_name
         )
+        if settings.CHAT_WRITE_BEHIND['ENABLED']:
+            await message_buffer.flush()
         logger.info(f"WebSocket disconnected with code {close_code}")
 
     async def receive(self, text_data):
         """Handle incoming WebSocket messages"""
         try:
             data = json.loads(text_data)
-            logger.info(f"Received WebSocket message: {data}")
+            message_type = data.get('type', 'chat_message')
+
+            # Ephemeral events never touch the database
+            if message_type == 'typing':
+                await self.handle_typing(bool(data.get('is_typing', True)))
+                return
+            if message_type == 'ping':
+                await refresh_presence(self.room_id, self.user.id)
+                return
+
+            logger.debug("Received WebSocket message in room %s from user %s", self.room_id, self.user.id)
 
             # Extract required fields with fallbacks
             message = data.get('message')
             sender_id = data.get('sender_id')
             chat_room_id = data.get('chatRoomId')
             temp_id = data.get('tempId')
-            message_type = data.get('type', 'chat_message')
 
             # Validate required fields
             if not message:
@@ -192,26 +238,8 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
             try:
                 # Save and broadcast message
-                saved_message = await self.message_handler.save_message(
-                    sender_id, message, self.room_id
-                )
-                
-                response_data = await self.message_handler.format_message_response(
-                    message=message,
-                    sender={'id': self.user.id, 'fullname': self.user.fullname},
-                    chat_room_id=self.room_id,
-                    timestamp=saved_message.timestamp.isoformat(),
-                    is_read=saved_message.is_read
-                )
-                # Echo tempId if present
-                if temp_id:
-                    response_data['tempId'] = temp_id
-
-                await self.channel_layer.group_send(
-                    self.room_group_name,
-                    response_data
-                )
-                logger.info(f"Message processed and broadcast successfully: {response_data}")
+                response_data = await self.publish_message(self.room, message, temp_id)
+                logger.debug("Message %s broadcast to room %s", response_data.get('uid'), self.room_id)
 
             except Exception as e:
                 logger.error(f"Error processing message: {str(e)}")
@@ -232,6 +260,59 @@ class ChatConsumer(AsyncWebsocketConsumer):
         except Exception as e:
             logger.error(f"Error sending chat message: {str(e)}")
 
+    async def messages_read(self, event):
+        """Handle read receipt events"""
+        await self.send(text_data=json.dumps(event))
+
+    async def join_presence(self):
+        """Mark the user online, announce it and tell this client who else is here"""
+        await mark_online(self.room_id, self.user.id)
+        self.is_present = True
+        participants = [self.room.donor_id, self.room.recipient_id]
+        online = await get_online_users(self.room_id, participants)
+        await self.send(text_data=json.dumps({
+            'type': 'presence_state',
+            'chatRoomId': self.room_id,
+            'online': online
+        }))
+        await self.channel_layer.group_send(
+            self.room_group_name,
+            {'type': 'presence', 'chatRoomId': self.room_id, 'user_id': self.user.id, 'online': True}
+        )
+
+    async def leave_presence(self):
+        self.is_present = False
+        # Only announce offline once the user's last connection to the room is gone
+        if await mark_offline(self.room_id, self.user.id):
+            await self.channel_layer.group_send(
+                self.room_group_name,
+                {'type': 'presence', 'chatRoomId': self.room_id, 'user_id': self.user.id, 'online': False}
+            )
+
+    async def handle_typing(self, is_typing):
+        """Broadcast typing state, at most once per CHAT_PRESENCE['TYPING_THROTTLE'] seconds while typing"""
+        now = time.monotonic()
+        if is_typing:
+            if now - self.last_typing_sent < settings.CHAT_PRESENCE['TYPING_THROTTLE']:
+                return
+            self.last_typing_sent = now
+        else:
+            self.last_typing_sent = 0.0
+        await self.channel_layer.group_send(
+            self.room_group_name,
+            {'type': 'typing', 'chatRoomId': self.room_id, 'user_id': self.user.id, 'is_typing': is_typing}
+        )
+
+    async def typing(self, event):
+        """Handle typing events; the typist does not get their own event back"""
+        if event['user_id'] != self.user.id:
+            await self.send(text_data=json.dumps(event))
+
+    async def presence(self, event):
+        """Handle presence change events of other participants"""
+        if event['user_id'] != self.user.id:
+            await self.send(text_data=json.dumps(event))
+
     @database_sync_to_async
     def get_latest_message_timestamp(self):
         try:
@@ -248,37 +329,57 @@ class ChatConsumer(AsyncWebsocketConsumer):
         except Message.DoesNotExist:
             return False
 
-class GlobalChatConsumer(AsyncWebsocketConsumer):
-    """WebSocket consumer for global chat messages"""
+class GlobalChatConsumer(ThrottledConsumerMixin, ChatPublisherMixin, AsyncWebsocketConsumer):
+    """
+    Multiplexed WebSocket consumer carrying all chat rooms of a user.
+
+    Each connection joins only the chat_<room_id> groups of the rooms the
+    user takes part in, so messages reach the participants of a room rather
+    than every connected user.
+    """
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.user = None
+        self.rooms = {}
+        self.message_handler = ChatMessageHandler()
         self.auth_handler = ChatAuthHandler()
 
     async def connect(self):
         """Handle WebSocket connection"""
         try:
             # Authenticate user
-            self.user, _ = await self.auth_handler.authenticate_user(self.scope)
-            # Join global chat group
-            await self.channel_layer.group_add('global_chat', self.channel_name)
+            self.user = await self.auth_handler.authenticate_user(self.scope)
+            self.rooms = await self.auth_handler.get_user_rooms(self.user)
+            for room_id in self.rooms:
+                await self.channel_layer.group_add(f'chat_{room_id}', self.channel_name)
             await self.accept()
-            logger.info(f"Global chat WebSocket connection accepted for user {self.user.id}")
+            await self.send(text_data=json.dumps({
+                'type': 'subscriptions',
+                'chatRoomIds': list(self.rooms)
+            }))
+            logger.info(f"Global chat WebSocket connection accepted for user {self.user.id} in {len(self.rooms)} rooms")
         except Exception as e:
             logger.error(f"Global chat connection error: {str(e)}")
             await self.close(code=4000)
 
     async def disconnect(self, close_code):
         """Handle WebSocket disconnection"""
-        await self.channel_layer.group_discard('global_chat', self.channel_name)
+        for room_id in self.rooms:
+            await self.channel_layer.group_discard(f'chat_{room_id}', self.channel_name)
+        if settings.CHAT_WRITE_BEHIND['ENABLED']:
+            await message_buffer.flush()
         logger.info(f"Global chat WebSocket disconnected with code {close_code}")
 
     async def receive(self, text_data):
         """Handle incoming WebSocket messages"""
         try:
             data = json.loads(text_data)
-            logger.info(f"Received global WebSocket message: {data}")
+            logger.debug("Received global WebSocket message of type %s from user %s", data.get('type'), self.user.id)
+
+            if data.get('type') == 'subscribe':
+                await self.subscribe(data.get('chatRoomId'))
+                return
 
             # Extract required fields
             message = data.get('message')
@@ -297,22 +398,54 @@ class GlobalChatConsumer(AsyncWebsocketConsumer):
                 await self.close(code=4002)
                 return
 
-            # Broadcast message to all clients
-            await self.channel_layer.group_send(
-                'global_chat',
-                {
-                    'type': 'chat_message',
-                    'message': message,
-                    'sender': {'id': sender_id, 'fullname': self.user.fullname},
-                    'chatRoomId': chat_room_id,
-                    'timestamp': datetime.now().isoformat(),
-                    'is_read': False
-                }
-            )
+            room = self.rooms.get(int(chat_room_id))
+            if room is None:
+                logger.warning(f"User {self.user.id} sent to room {chat_room_id} outside their subscriptions")
+                await self.send_error(chat_room_id, 'Not a participant of this chat room')
+                return
+
+            await self.publish_message(room, message, data.get('tempId'))
         except Exception as e:
             logger.error(f"Error processing global chat message: {str(e)}")
             await self.close(code=4000)
 
+    async def subscribe(self, chat_room_id):
+        """Join a room created after this connection was opened"""
+        try:
+            room_id = int(chat_room_id)
+        except (TypeError, ValueError):
+            await self.send_error(chat_room_id, 'Invalid chat room')
+            return
+        if room_id not in self.rooms:
+            room = await self.auth_handler.get_accessible_room(room_id, self.user)
+            if room is None:
+                await self.send_error(chat_room_id, 'Not a participant of this chat room')
+                return
+            self.rooms[room_id] = room
+            await self.channel_layer.group_add(f'chat_{room_id}', self.channel_name)
+        await self.send(text_data=json.dumps({'type': 'subscribed', 'chatRoomId': room_id}))
+
+    async def send_error(self, chat_room_id, message):
+        await self.send(text_data=json.dumps({
+            'type': 'error',
+            'chatRoomId': chat_room_id,
+            'message': message
+        }))
+
     async def chat_message(self, event):
         """Send chat message to WebSocket"""
-        await self.send(text_data=json.dumps(event)) 
\ No newline at end of file
+        await self.send(text_data=json.dumps(event))
+
+    async def messages_read(self, event):
+        """Send read receipts to WebSocket"""
+        await self.send(text_data=json.dumps(event))
+
+    async def typing(self, event):
+        """Forward typing events of other participants"""
+        if event['user_id'] != self.user.id:
+            await self.send(text_data=json.dumps(event))
+
+    async def presence(self, event):
+        """Forward presence changes of other participants"""
+        if event['user_id'] != self.user.id:
+            await self.send(text_data=json.dumps(event))
@@ -1,5 +1,10 @@
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 User = get_user_model()
 
@@ -16,7 +21,8 @@ class ChatRoom(models.Model):
     organ = models.ForeignKey('donations.Organ', on_delete=models.CASCADE, related_name='chats')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     created_at = models.DateTimeField(auto_now_add=True)
-    last_activity = models.DateTimeField(auto_now=True)
+    # Bumped by touch_last_activity when messages arrive, not on every save()
+    last_activity = models.DateTimeField(default=timezone.now, db_index=True)
 
     class Meta:
         unique_together = ['donor', 'recipient', 'organ']
@@ -25,15 +31,38 @@ class ChatRoom(models.Model):
     def __str__(self):
         return f"Chat for {self.organ.organ_name} between {self.donor.fullname} and {self.recipient.fullname}"
 
+    def touch_last_activity(self, when=None):
+        """
+        Move last_activity forward to when, at most once per
+        CHAT_ACTIVITY_DEBOUNCE seconds.
+
+        Recent activity already known on this instance skips the database
+        entirely; otherwise a single conditional UPDATE is issued, so
+        concurrent writers for a hot room do not all take the row lock.
+        """
+        when = when or timezone.now()
+        cutoff = when - timedelta(seconds=settings.CHAT_ACTIVITY_DEBOUNCE)
+        if self.last_activity and self.last_activity >= cutoff:
+            return False
+        updated = ChatRoom.objects.filter(id=self.id, last_activity__lt=cutoff).update(last_activity=when)
+        self.last_activity = when
+        return bool(updated)
+
 class Message(models.Model):
     chat_room = models.ForeignKey(ChatRoom, on_delete=models.CASCADE, related_name='messages')
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sent_messages')
     content = models.TextField()
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Assigned on the server before the row is written so write-behind messages
+    # can be broadcast with their final identity and time
+    uid = models.UUIDField(default=uuid.uuid4, unique=True, null=True, editable=False)
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
     is_read = models.BooleanField(default=False)
 
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            models.Index(fields=['chat_room', 'timestamp', 'id']),
+        ]
 
     def __str__(self):
         return f"Message from {self.sender.fullname} in {self.chat_room}"
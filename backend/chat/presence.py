@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.core.cache import cache
+
+
+def presence_key(room_id, user_id):
+    return f'chat_presence_{room_id}_{user_id}'
+
+
+async def mark_online(room_id, user_id):
+    """
+    Register one more open connection of the user in the room.
+
+    The value is a connection count so closing a second tab does not mark
+    the user offline. It expires after CHAT_PRESENCE['TTL'] seconds unless
+    refreshed, which cleans up after workers that died without disconnecting.
+    """
+    key = presence_key(room_id, user_id)
+    ttl = settings.CHAT_PRESENCE['TTL']
+    await cache.aadd(key, 0, ttl)
+    try:
+        count = await cache.aincr(key)
+    except ValueError:
+        # Expired between add and incr
+        await cache.aset(key, 1, ttl)
+        return 1
+    await cache.atouch(key, ttl)
+    return count
+
+
+async def mark_offline(room_id, user_id):
+    """Drop one open connection of the user; returns True once none are left"""
+    key = presence_key(room_id, user_id)
+    try:
+        count = await cache.adecr(key)
+    except ValueError:
+        return True
+    if count <= 0:
+        await cache.adelete(key)
+        return True
+    return False
+
+
+async def refresh_presence(room_id, user_id):
+    """Extend the presence TTL of a user who is still connected"""
+    if not await cache.atouch(presence_key(room_id, user_id), settings.CHAT_PRESENCE['TTL']):
+        await mark_online(room_id, user_id)
+
+
+async def get_online_users(room_id, user_ids):
+    """Return the subset of user_ids currently connected to the room"""
+    keys = {presence_key(room_id, user_id): user_id for user_id in user_ids}
+    found = await cache.aget_many(list(keys))
+    return [keys[key] for key, count in found.items() if count and count > 0]
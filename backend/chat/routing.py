@@ -2,6 +2,7 @@ from django.urls import re_path
 from . import consumers
 
 websocket_urlpatterns = [
-    re_path(r'ws/chat/(?P<room_id>\w+)/$', consumers.ChatConsumer.as_asgi()),
+    # The global socket must come first, "global" also matches the room pattern
     re_path(r'ws/chat/global/$', consumers.GlobalChatConsumer.as_asgi()),
+    re_path(r'ws/chat/(?P<room_id>\w+)/$', consumers.ChatConsumer.as_asgi()),
 ] 
\ No newline at end of file
@@ -0,0 +1,153 @@
+import html
+import re
+
+from django.db import connection
+
+from .models import Message
+
+# Text search configuration of the Postgres GIN index (see migration 0005)
+SEARCH_CONFIG = 'english'
+# Terms are wrapped in these control characters by the database and turned
+# into <mark> tags only after the snippet has been HTML-escaped
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_STOP = '\x03'
+SNIPPET_WORDS = 12
+MAX_TERMS = 10
+
+
+def search_terms(query):
+    return re.findall(r'\w+', query.lower())[:MAX_TERMS]
+
+
+def fts_table():
+    return f'{Message._meta.db_table}_fts'
+
+
+def render_snippet(snippet):
+    return (
+        html.escape(snippet)
+        .replace(HIGHLIGHT_START, '<mark>')
+        .replace(HIGHLIGHT_STOP, '</mark>')
+    )
+
+
+def sqlite_index_ready():
+    """
+    The FTS5 table is kept in sync by triggers on the message table. SQLite
+    rebuilds a table when Django alters one of its columns, which drops the
+    triggers, so check for them before trusting the index.
+    """
+    table = fts_table()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE name IN (%s, %s, %s, %s)",
+            [table, f'{table}_ai', f'{table}_ad', f'{table}_au']
+        )
+        return cursor.fetchone()[0] == 4
+
+
+def search_postgres(room_ids, query, limit, offset):
+    from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank, SearchVector
+
+    vector = SearchVector('content', config=SEARCH_CONFIG)
+    search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+    hits = Message.objects.annotate(
+        document=vector
+    ).filter(
+        chat_room_id__in=room_ids, document=search_query
+    ).annotate(
+        rank=SearchRank(vector, search_query),
+        snippet=SearchHeadline(
+            'content', search_query, config=SEARCH_CONFIG,
+            start_sel=HIGHLIGHT_START, stop_sel=HIGHLIGHT_STOP,
+            max_words=SNIPPET_WORDS, min_words=SNIPPET_WORDS // 2
+        )
+    ).order_by('-rank', '-timestamp', '-id').values_list('id', 'rank', 'snippet')
+    return list(hits[offset:offset + limit])
+
+
+def search_sqlite(room_ids, terms, limit, offset):
+    table = fts_table()
+    # Quote every term so user input cannot use FTS5 query syntax; the
+    # trailing * turns each term into a prefix match
+    match = ' AND '.join(f'"{term}"*' for term in terms)
+    room_placeholders = ', '.join(['%s'] * len(room_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT m.id, -bm25({table}), snippet({table}, 0, %s, %s, %s, %s)
+            FROM {table}
+            JOIN {Message._meta.db_table} m ON m.id = {table}.rowid
+            WHERE {table} MATCH %s AND m.chat_room_id IN ({room_placeholders})
+            ORDER BY bm25({table}), m.timestamp DESC, m.id DESC
+            LIMIT %s OFFSET %s
+            """,
+            [HIGHLIGHT_START, HIGHLIGHT_STOP, '…', SNIPPET_WORDS, match, *room_ids, limit, offset]
+        )
+        return cursor.fetchall()
+
+
+def make_snippet(content, terms):
+    """Cut a window of SNIPPET_WORDS words around the first matching term"""
+    words = content.split()
+    first = next(
+        (i for i, word in enumerate(words) if any(term in word.lower() for term in terms)),
+        0
+    )
+    start = max(0, first - SNIPPET_WORDS // 3)
+    window = ' '.join(words[start:start + SNIPPET_WORDS])
+    pattern = re.compile('|'.join(re.escape(term) for term in terms), re.IGNORECASE)
+    snippet = pattern.sub(lambda match: f'{HIGHLIGHT_START}{match.group(0)}{HIGHLIGHT_STOP}', window)
+    if start > 0:
+        snippet = '…' + snippet
+    if start + SNIPPET_WORDS < len(words):
+        snippet += '…'
+    return snippet
+
+
+def search_fallback(room_ids, terms, limit, offset):
+    """Unindexed substring search for databases without a full-text backend here"""
+    queryset = Message.objects.filter(chat_room_id__in=room_ids)
+    for term in terms:
+        queryset = queryset.filter(content__icontains=term)
+    hits = queryset.order_by('-timestamp', '-id').values_list('id', 'content')[offset:offset + limit]
+    return [
+        (message_id, sum(content.lower().count(term) for term in terms), make_snippet(content, terms))
+        for message_id, content in hits
+    ]
+
+
+def search_messages(room_ids, query, limit, offset=0):
+    """
+    Full-text search over the messages of the given chat rooms.
+
+    Returns one page of Message instances, best match first, each with a
+    rank and an HTML-safe snippet whose matches are wrapped in <mark>, and
+    whether more results follow. Postgres uses the GIN tsvector index and
+    SQLite the FTS5 table created in migration 0005; other databases fall
+    back to an unindexed, newest-first substring match.
+    """
+    terms = search_terms(query)
+    room_ids = list(room_ids)
+    if not terms or not room_ids:
+        return [], False
+
+    if connection.vendor == 'postgresql':
+        hits = search_postgres(room_ids, query, limit + 1, offset)
+    elif connection.vendor == 'sqlite' and sqlite_index_ready():
+        hits = search_sqlite(room_ids, terms, limit + 1, offset)
+    else:
+        hits = search_fallback(room_ids, terms, limit + 1, offset)
+
+    has_more = len(hits) > limit
+    hits = hits[:limit]
+    messages = Message.objects.select_related('sender').in_bulk([message_id for message_id, _, _ in hits])
+    results = []
+    for message_id, rank, snippet in hits:
+        message = messages.get(message_id)
+        if message is None:
+            continue
+        message.rank = float(rank or 0)
+        message.snippet = render_snippet(snippet or '')
+        results.append(message)
+    return results, has_more
@@ -1,17 +1,43 @@
 from rest_framework import serializers
+from django.contrib.auth import get_user_model
 from .models import ChatRoom, Message
 from backend.accounts.serializers import UserProfileSerializer
 from backend.donations.serializers import OrganSerializer
 
+User = get_user_model()
+
 class MessageSerializer(serializers.ModelSerializer):
     sender = UserProfileSerializer(read_only=True)
     timestamp = serializers.DateTimeField(read_only=True)
 
     class Meta:
         model = Message
-        fields = ['id', 'sender', 'content', 'is_read', 'timestamp']
+        fields = ['id', 'uid', 'sender', 'content', 'is_read', 'timestamp']
         read_only_fields = ['sender', 'timestamp']
 
+class MessageSenderSerializer(serializers.ModelSerializer):
+    """Compact sender representation used in paginated message history"""
+    fullname = serializers.ReadOnlyField()
+
+    class Meta:
+        model = User
+        fields = ['id', 'fullname', 'user_type']
+
+class MessageHistorySerializer(serializers.ModelSerializer):
+    sender = MessageSenderSerializer(read_only=True)
+
+    class Meta:
+        model = Message
+        fields = ['id', 'uid', 'sender', 'content', 'is_read', 'timestamp']
+
+class MessageSearchResultSerializer(MessageHistorySerializer):
+    chat_room = serializers.PrimaryKeyRelatedField(read_only=True)
+    rank = serializers.FloatField(read_only=True)
+    snippet = serializers.CharField(read_only=True)
+
+    class Meta(MessageHistorySerializer.Meta):
+        fields = MessageHistorySerializer.Meta.fields + ['chat_room', 'rank', 'snippet']
+
 class ChatRoomSerializer(serializers.ModelSerializer):
     donor = UserProfileSerializer(read_only=True)
     recipient = UserProfileSerializer(read_only=True)
@@ -0,0 +1,391 @@
+from datetime import date, timedelta
+
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from backend.activity.models import ActivityHistory
+from backend.donations.models import Organ
+from backend.notifications.models import Notification
+from backend.realtime.middleware import JWTAuthMiddlewareStack
+from .models import ChatRoom, Message
+from .routing import websocket_urlpatterns
+
+User = get_user_model()
+
+
+def create_user(email, user_type='donor'):
+    return User.objects.create_user(
+        email=email,
+        first_name='Test',
+        last_name='User',
+        gender='male',
+        date_of_birth=date(1990, 1, 1),
+        blood_type='A+',
+        password='testpass123',
+        user_type=user_type
+    )
+
+
+class ChatTestCase(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.donor = create_user('donor@test.com')
+        self.recipient = create_user('recipient@test.com', user_type='recipient')
+        organ = Organ.objects.create(donor=self.donor, organ_name='kidney', location='Nicosia')
+        self.chat_room = ChatRoom.objects.create(donor=self.donor, recipient=self.recipient, organ=organ)
+
+    def connect(self, user, room_id=None):
+        token = AccessToken.for_user(user)
+        return WebsocketCommunicator(
+            JWTAuthMiddlewareStack(URLRouter(websocket_urlpatterns)),
+            f'/ws/chat/{room_id or self.chat_room.id}/?token={token}'
+        )
+
+    def connect_global(self, user):
+        token = AccessToken.for_user(user)
+        return WebsocketCommunicator(JWTAuthMiddlewareStack(URLRouter(websocket_urlpatterns)), f'/ws/chat/global/?token={token}')
+
+
+class ChatConsumerTests(ChatTestCase):
+    def test_messages_are_saved_without_refetching_room_or_sender(self):
+        query_count = database_sync_to_async(lambda: len(connection.queries))
+
+        async def run():
+            communicator = self.connect(self.recipient)
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            await communicator.receive_json_from()  # presence_state
+
+            responses, marks = [], [await query_count()]
+            for content in ('Hello', 'Again'):
+                await communicator.send_json_to({'message': content, 'sender_id': self.recipient.id})
+                responses.append(await communicator.receive_json_from())
+                marks.append(await query_count())
+            await communicator.disconnect()
+            return responses, marks
+
+        with CaptureQueriesContext(connection) as captured:
+            responses, marks = async_to_sync(run)()
+
+        self.assertEqual([r['message'] for r in responses], ['Hello', 'Again'])
+        self.assertEqual(responses[0]['organ'], {'name': 'kidney', 'id': self.chat_room.organ_id})
+        self.assertEqual(responses[0]['sender']['id'], self.recipient.id)
+        self.assertEqual(Message.objects.filter(chat_room=self.chat_room).count(), 2)
+        self.assertEqual(ActivityHistory.objects.filter(user=self.recipient, activity_type='message_sent').count(), 2)
+
+        per_message = captured.captured_queries[marks[0] - captured.initial_queries:]
+        self.assertFalse(any('FROM "chat_chatroom"' in q['sql'] for q in per_message))
+        self.assertFalse(any('FROM "accounts_customuser"' in q['sql'] for q in per_message))
+        follow_up = captured.captured_queries[marks[1] - captured.initial_queries:marks[2] - captured.initial_queries]
+        # Follow-up messages only insert the row and update the coalesced
+        # notification, besides the activity history row
+        chat_queries = [q for q in follow_up if '"chat_' in q['sql'] or '"notifications_' in q['sql']]
+        self.assertEqual(len(chat_queries), 2)
+
+    def test_outsider_is_rejected(self):
+        outsider = create_user('outsider@test.com', user_type='recipient')
+
+        async def run():
+            communicator = self.connect(outsider)
+            connected, _ = await communicator.connect()
+            await communicator.disconnect()
+            return connected
+
+        self.assertFalse(async_to_sync(run)())
+
+
+@override_settings(CHAT_WRITE_BEHIND={'ENABLED': True, 'MAX_BATCH': 3, 'FLUSH_INTERVAL_MS': 60000})
+class ChatWriteBehindTests(ChatTestCase):
+    def test_messages_are_flushed_in_batches_and_on_disconnect(self):
+        stored = database_sync_to_async(lambda: Message.objects.count())
+
+        async def run():
+            communicator = self.connect(self.recipient)
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            await communicator.receive_json_from()  # presence_state
+
+            broadcasts, counts = [], []
+            for i in range(4):
+                await communicator.send_json_to({'message': f'Message {i}', 'sender_id': self.recipient.id})
+                broadcasts.append(await communicator.receive_json_from())
+                counts.append(await stored())
+            await communicator.disconnect()
+            return broadcasts, counts
+
+        broadcasts, counts = async_to_sync(run)()
+
+        # Nothing is written until the third message fills the batch
+        self.assertEqual(counts, [0, 0, 3, 3])
+        messages = list(Message.objects.order_by('timestamp'))
+        self.assertEqual(len(messages), 4)
+        self.assertEqual([str(m.uid) for m in messages], [b['uid'] for b in broadcasts])
+        self.assertEqual([m.timestamp.isoformat() for m in messages], [b['timestamp'] for b in broadcasts])
+
+        notification = Notification.objects.get(user=self.donor)
+        self.assertEqual(notification.message, 'You have 4 new messages about your kidney')
+
+
+class ChatHistoryTests(ChatTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.donor)
+        self.url = f'/api/chat/rooms/{self.chat_room.id}/messages/'
+        self.messages = [
+            Message.objects.create(chat_room=self.chat_room, sender=self.recipient, content=f'Message {i}')
+            for i in range(7)
+        ]
+
+    def ids(self, response):
+        return [m['id'] for m in response.data['results']]
+
+    def test_latest_page_then_scroll_back(self):
+        response = self.client.get(self.url, {'limit': 3})
+
+        self.assertEqual(self.ids(response), [m.id for m in self.messages[4:]])
+        self.assertTrue(response.data['has_more'])
+        self.assertEqual(
+            response.data['results'][0]['sender'],
+            {'id': self.recipient.id, 'fullname': 'Test User', 'user_type': 'recipient'}
+        )
+
+        response = self.client.get(self.url, {'limit': 3, 'before': self.messages[4].id})
+        self.assertEqual(self.ids(response), [m.id for m in self.messages[1:4]])
+        self.assertTrue(response.data['has_more'])
+
+        response = self.client.get(self.url, {'limit': 3, 'before': self.messages[1].id})
+        self.assertEqual(self.ids(response), [self.messages[0].id])
+        self.assertFalse(response.data['has_more'])
+
+    def test_page_does_not_load_whole_history(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'limit': 3})
+
+        self.assertEqual(response.status_code, 200)
+        message_queries = [q['sql'] for q in queries if 'FROM "chat_message"' in q['sql']]
+        self.assertEqual(len(message_queries), 1)
+        self.assertIn('LIMIT', message_queries[0])
+
+    def test_after_anchor_returns_newer_messages(self):
+        response = self.client.get(self.url, {'limit': 4, 'after': self.messages[2].id})
+
+        self.assertEqual(self.ids(response), [m.id for m in self.messages[3:]])
+        self.assertFalse(response.data['has_more'])
+
+    def test_anchor_from_another_room_is_rejected(self):
+        other_organ = Organ.objects.create(donor=self.donor, organ_name='liver', location='Nicosia')
+        other_room = ChatRoom.objects.create(donor=self.donor, recipient=self.recipient, organ=other_organ)
+        foreign = Message.objects.create(chat_room=other_room, sender=self.donor, content='Elsewhere')
+
+        response = self.client.get(self.url, {'before': foreign.id})
+
+        self.assertEqual(response.status_code, 404)
+
+
+
+class ChatSearchTests(ChatTestCase):
+    url = '/api/chat/messages/search/'
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.donor)
+        self.match = Message.objects.create(
+            chat_room=self.chat_room, sender=self.recipient,
+            content='My latest <b>creatinine</b> result came back at 1.2 mg/dL'
+        )
+        self.best = Message.objects.create(
+            chat_room=self.chat_room, sender=self.donor,
+            content='Creatinine creatinine: please send the creatinine trend'
+        )
+        Message.objects.create(chat_room=self.chat_room, sender=self.donor, content='See you tomorrow')
+        outsider = create_user('outsider@test.com', user_type='recipient')
+        other_room = ChatRoom.objects.create(donor=self.donor, recipient=outsider, organ=self.chat_room.organ)
+        self.other = Message.objects.create(chat_room=other_room, sender=outsider, content='Creatinine is fine')
+        self.client_outsider = APIClient()
+        self.client_outsider.force_authenticate(outsider)
+
+    def test_results_are_ranked_and_highlighted(self):
+        response = self.client.get(self.url, {'q': 'creatinine'})
+
+        self.assertEqual(response.status_code, 200)
+        ids = [m['id'] for m in response.data['results']]
+        self.assertEqual(ids[0], self.best.id)
+        self.assertCountEqual(ids, [self.best.id, self.match.id, self.other.id])
+        snippet = next(m['snippet'] for m in response.data['results'] if m['id'] == self.match.id)
+        self.assertIn('<mark>creatinine</mark>', snippet)
+        # Message content is escaped, only the highlight markup is HTML
+        self.assertIn('&lt;b&gt;', snippet)
+
+    def test_search_is_limited_to_own_rooms_and_paginated(self):
+        response = self.client_outsider.get(self.url, {'q': 'creatinine'})
+        self.assertEqual([m['id'] for m in response.data['results']], [self.other.id])
+
+        first = self.client.get(self.url, {'q': 'creatinine', 'limit': 2})
+        self.assertEqual(len(first.data['results']), 2)
+        self.assertTrue(first.data['has_more'])
+        rest = self.client.get(self.url, {'q': 'creatinine', 'limit': 2, 'offset': 2})
+        self.assertEqual(len(rest.data['results']), 1)
+        self.assertFalse(rest.data['has_more'])
+
+    def test_edits_are_indexed_and_query_is_required(self):
+        self.match.content = 'Potassium levels are normal'
+        self.match.save()
+
+        response = self.client.get(self.url, {'q': 'potassium'})
+        self.assertEqual([m['id'] for m in response.data['results']], [self.match.id])
+        self.assertEqual(self.client.get(self.url, {'q': '  '}).status_code, 400)
+
+class ChatPresenceTests(ChatTestCase):
+    def test_presence_and_throttled_typing(self):
+        async def run():
+            donor = self.connect(self.donor)
+            await donor.connect()
+            donor_state = await donor.receive_json_from()
+
+            recipient = self.connect(self.recipient)
+            await recipient.connect()
+            recipient_state = await recipient.receive_json_from()
+            joined = await donor.receive_json_from()
+
+            await recipient.send_json_to({'type': 'typing', 'is_typing': True})
+            await recipient.send_json_to({'type': 'typing', 'is_typing': True})
+            await recipient.send_json_to({'type': 'typing', 'is_typing': False})
+            typing = [await donor.receive_json_from(), await donor.receive_json_from()]
+            self.assertTrue(await donor.receive_nothing())
+            self.assertTrue(await recipient.receive_nothing())
+
+            await recipient.disconnect()
+            left = await donor.receive_json_from()
+            await donor.disconnect()
+            return donor_state, recipient_state, joined, typing, left
+
+        donor_state, recipient_state, joined, typing, left = async_to_sync(run)()
+
+        self.assertEqual(donor_state['online'], [self.donor.id])
+        self.assertCountEqual(recipient_state['online'], [self.donor.id, self.recipient.id])
+        self.assertEqual(joined['user_id'], self.recipient.id)
+        self.assertTrue(joined['online'])
+        # The second "typing" inside the throttle window is dropped
+        self.assertEqual([event['is_typing'] for event in typing], [True, False])
+        self.assertEqual(left['user_id'], self.recipient.id)
+        self.assertFalse(left['online'])
+        self.assertEqual(Message.objects.count(), 0)
+
+
+@override_settings(CHAT_ACTIVITY_DEBOUNCE=60)
+class ChatRoomActivityTests(ChatTestCase):
+    def test_last_activity_is_debounced(self):
+        start = self.chat_room.last_activity
+        room = ChatRoom.objects.get(id=self.chat_room.id)
+
+        with self.assertNumQueries(0):
+            self.assertFalse(room.touch_last_activity(start + timedelta(seconds=30)))
+
+        later = start + timedelta(seconds=90)
+        with self.assertNumQueries(1):
+            self.assertTrue(room.touch_last_activity(later))
+
+        # Another worker holding a stale instance does not write again
+        stale = ChatRoom.objects.get(id=self.chat_room.id)
+        stale.last_activity = start
+        self.assertFalse(stale.touch_last_activity(later + timedelta(seconds=10)))
+        self.assertEqual(ChatRoom.objects.get(id=self.chat_room.id).last_activity, later)
+
+    def test_status_change_does_not_bump_activity(self):
+        start = self.chat_room.last_activity
+        self.chat_room.status = 'active'
+        self.chat_room.save()
+
+        self.assertEqual(ChatRoom.objects.get(id=self.chat_room.id).last_activity, start)
+
+
+class GlobalChatConsumerTests(ChatTestCase):
+    def test_messages_reach_only_room_participants(self):
+        outsider = create_user('outsider@test.com', user_type='recipient')
+        other_organ = Organ.objects.create(donor=self.donor, organ_name='liver', location='Nicosia')
+        other_room = ChatRoom.objects.create(donor=self.donor, recipient=outsider, organ=other_organ)
+
+        async def run():
+            donor = self.connect_global(self.donor)
+            self.assertTrue((await donor.connect())[0])
+            donor_rooms = await donor.receive_json_from()
+
+            stranger = self.connect_global(outsider)
+            self.assertTrue((await stranger.connect())[0])
+            stranger_rooms = await stranger.receive_json_from()
+
+            recipient = self.connect_global(self.recipient)
+            self.assertTrue((await recipient.connect())[0])
+            await recipient.receive_json_from()
+            await recipient.send_json_to({
+                'message': 'Hello',
+                'sender_id': self.recipient.id,
+                'chatRoomId': self.chat_room.id
+            })
+            received = await donor.receive_json_from()
+            echoed = await recipient.receive_json_from()
+            stranger_got_nothing = await stranger.receive_nothing()
+
+            await recipient.send_json_to({
+                'message': 'Sneaky',
+                'sender_id': self.recipient.id,
+                'chatRoomId': other_room.id
+            })
+            rejected = await recipient.receive_json_from()
+
+            for communicator in (donor, stranger, recipient):
+                await communicator.disconnect()
+            return donor_rooms, stranger_rooms, received, echoed, stranger_got_nothing, rejected
+
+        donor_rooms, stranger_rooms, received, echoed, stranger_got_nothing, rejected = async_to_sync(run)()
+
+        self.assertCountEqual(donor_rooms['chatRoomIds'], [self.chat_room.id, other_room.id])
+        self.assertEqual(stranger_rooms['chatRoomIds'], [other_room.id])
+        self.assertEqual(received['message'], 'Hello')
+        self.assertEqual(received['chatRoomId'], str(self.chat_room.id))
+        self.assertEqual(echoed['uid'], received['uid'])
+        self.assertTrue(stranger_got_nothing)
+        self.assertEqual(rejected['type'], 'error')
+        self.assertEqual(Message.objects.filter(chat_room=self.chat_room).count(), 1)
+        self.assertFalse(Message.objects.filter(chat_room=other_room).exists())
+
+    def test_subscribe_to_room_created_after_connect(self):
+        async def run():
+            donor = self.connect_global(self.donor)
+            await donor.connect()
+            await donor.receive_json_from()
+
+            new_room = await database_sync_to_async(self.create_room)()
+            await donor.send_json_to({'type': 'subscribe', 'chatRoomId': new_room.id})
+            subscribed = await donor.receive_json_from()
+
+            room_socket = self.connect(self.recipient, room_id=new_room.id)
+            await room_socket.connect()
+            await room_socket.receive_json_from()  # presence_state
+            await donor.receive_json_from()  # recipient came online
+            await room_socket.send_json_to({'message': 'New room', 'sender_id': self.recipient.id})
+            received = await donor.receive_json_from()
+
+            await room_socket.disconnect()
+            await donor.disconnect()
+            return new_room, subscribed, received
+
+        new_room, subscribed, received = async_to_sync(run)()
+
+        self.assertEqual(subscribed, {'type': 'subscribed', 'chatRoomId': new_room.id})
+        self.assertEqual(received['message'], 'New room')
+
+    def create_room(self):
+        organ = Organ.objects.create(donor=self.donor, organ_name='heart', location='Nicosia')
+        return ChatRoom.objects.create(donor=self.donor, recipient=self.recipient, organ=organ)
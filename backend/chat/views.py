@@ -4,21 +4,44 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.exceptions import PermissionDenied
 from .models import ChatRoom, Message
-from .serializers import ChatRoomSerializer, MessageSerializer
+from django.db.models import Prefetch, Q
+from .serializers import ChatRoomSerializer, MessageSerializer, MessageHistorySerializer, MessageSearchResultSerializer
+from .search import search_messages
 from backend.donations.models import Organ
 from .permissions import IsChatParticipant
 from .mixins import ChatParticipantMixin
+from backend.notifications.mixins import BulkMarkReadMixin
+from backend.activity.routes import ActivityRoute
+from backend.notifications.utils import notify_new_message
+from channels.layers import get_channel_layer
+from asgiref.sync import async_to_sync
 
 # Create your views here.
 
-class ChatRoomViewSet(ChatParticipantMixin, viewsets.ModelViewSet):
+class ChatRoomViewSet(BulkMarkReadMixin, ChatParticipantMixin, viewsets.ModelViewSet):
     serializer_class = ChatRoomSerializer
     permission_classes = [permissions.IsAuthenticated, IsChatParticipant]
+    activity_routes = {
+        'send_message': ActivityRoute('message_sent', 'User sent a message'),
+        'messages': ActivityRoute('message_sent', 'User sent a message', methods=('POST',)),
+    }
+    history_page_size = 50
+    history_max_page_size = 200
 
     def get_queryset(self):
-        return ChatRoom.objects.filter(
+        # Everything UserProfileSerializer reads is loaded up front
+        queryset = ChatRoom.objects.filter(
             self.get_chat_queryset(self.request.user)
+        ).select_related(
+            'organ', 'donor__recipient_profile', 'recipient__recipient_profile'
         ).order_by('-last_activity')
+        # Only list and retrieve serialize the nested messages; the other
+        # detail actions page or update them without the full history
+        if self.action in ('list', 'retrieve'):
+            queryset = queryset.prefetch_related(
+                Prefetch('messages', queryset=Message.objects.select_related('sender__recipient_profile'))
+            )
+        return queryset
 
     def perform_create(self, serializer):
         organ_id = self.request.data.get('organ')
@@ -39,27 +62,136 @@ class ChatRoomViewSet(ChatParticipantMixin, viewsets.ModelViewSet):
         chat_room = self.get_object()
         serializer = MessageSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save(
+            message = serializer.save(
                 chat_room=chat_room,
                 sender=request.user
             )
+            chat_room.touch_last_activity(message.timestamp)
+            notify_new_message(message, chat_room=chat_room)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     @action(detail=True, methods=['post'])
     def mark_read(self, request, pk=None):
         chat_room = self.get_object()
-        messages = chat_room.messages.filter(is_read=False).exclude(sender=request.user)
-        messages.update(is_read=True)
-        return Response({'status': 'messages marked as read'})
+        messages = chat_room.messages.exclude(sender=request.user)
+        # Without ids or up_to_id the whole room is marked as read
+        if 'ids' in request.data or 'up_to_id' in request.data:
+            scope = self.get_bulk_read_scope(request)
+        else:
+            scope = {'all': True}
+        updated = self.bulk_mark_read(messages, scope)
+        if updated:
+            channel_layer = get_channel_layer()
+            async_to_sync(channel_layer.group_send)(
+                f'chat_{chat_room.id}',
+                {
+                    'type': 'messages_read',
+                    'reader_id': request.user.id,
+                    'chatRoomId': chat_room.id,
+                    **scope
+                }
+            )
+        return Response({'status': 'messages marked as read', 'updated': updated})
+
+    @action(detail=True, methods=['get', 'post'])
+    def messages(self, request, pk=None):
+        """
+        Return one page of the room's messages in chronological order.
+        POST is an alias for send_message.
+
+        Without anchors the newest page is returned. ?before=<message id>
+        returns the page of older messages and ?after=<message id> the page
+        of newer ones. Pages are cut on (timestamp, id), which the
+        chat_room/timestamp/id index covers.
+        """
+        if request.method == 'POST':
+            return self.send_message(request, pk)
+
+        chat_room = self.get_object()
+        try:
+            limit = int(request.query_params.get('limit', self.history_page_size))
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, self.history_max_page_size))
+
+        before = request.query_params.get('before')
+        after = request.query_params.get('after')
+        if before and after:
+            return Response({'error': 'Use either before or after, not both'}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = chat_room.messages.select_related('sender')
+        anchor_id = before or after
+        if anchor_id:
+            anchor = None
+            if anchor_id.isdigit():
+                anchor = chat_room.messages.filter(id=anchor_id).values('timestamp', 'id').first()
+            if anchor is None:
+                return Response({'error': 'Anchor message not found in this chat'}, status=status.HTTP_404_NOT_FOUND)
+            if before:
+                queryset = queryset.filter(
+                    Q(timestamp__lt=anchor['timestamp']) | Q(timestamp=anchor['timestamp'], id__lt=anchor['id'])
+                )
+            else:
+                queryset = queryset.filter(
+                    Q(timestamp__gt=anchor['timestamp']) | Q(timestamp=anchor['timestamp'], id__gt=anchor['id'])
+                )
+
+        if after:
+            page = list(queryset.order_by('timestamp', 'id')[:limit + 1])
+            has_more = len(page) > limit
+            page = page[:limit]
+        else:
+            page = list(queryset.order_by('-timestamp', '-id')[:limit + 1])
+            has_more = len(page) > limit
+            page = page[:limit][::-1]
+
+        return Response({
+            'results': MessageHistorySerializer(page, many=True).data,
+            'has_more': has_more
+        })
 
 class MessageViewSet(ChatParticipantMixin, viewsets.ModelViewSet):
     serializer_class = MessageSerializer
     permission_classes = [permissions.IsAuthenticated, IsChatParticipant]
+    activity_routes = {
+        'create': ActivityRoute('message_sent', 'User sent a message'),
+        'search': ActivityRoute('search_performed', 'User performed a search'),
+    }
+    search_page_size = 20
+    search_max_page_size = 100
 
     def get_queryset(self):
         return Message.objects.filter(
             chat_room__in=ChatRoom.objects.filter(
                 self.get_chat_queryset(self.request.user)
             )
-        ).order_by('timestamp')
+        ).select_related('sender__recipient_profile').order_by('timestamp', 'id')
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        Full-text search across the messages of the caller's chat rooms.
+
+        ?q= is required; ?limit= and ?offset= page through the results,
+        which are ordered by relevance and carry a highlighted snippet.
+        """
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'q is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(request.query_params.get('limit', self.search_page_size))
+            offset = int(request.query_params.get('offset', 0))
+        except ValueError:
+            return Response({'error': 'limit and offset must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, self.search_max_page_size))
+        offset = max(0, offset)
+
+        room_ids = ChatRoom.objects.filter(
+            self.get_chat_queryset(request.user)
+        ).values_list('id', flat=True)
+        results, has_more = search_messages(room_ids, query, limit, offset)
+        return Response({
+            'results': MessageSearchResultSerializer(results, many=True).data,
+            'has_more': has_more
+        })
@@ -1,12 +1,15 @@
 import json
+import logging
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth.models import AnonymousUser
-from rest_framework_simplejwt.tokens import AccessToken
 from .models import Organ, DonationRequest
 from .serializers import DonationRequestSerializer
+from backend.realtime.throttling import ThrottledConsumerMixin
 
-class OrganRequestConsumer(AsyncWebsocketConsumer):
+logger = logging.getLogger(__name__)
+
+class OrganRequestConsumer(ThrottledConsumerMixin, AsyncWebsocketConsumer):
     async def connect(self):
         self.user_id = self.scope['user'].id
         self.organ_id = self.scope['url_route']['kwargs']['organ_id']
@@ -177,110 +180,73 @@ class OrganRequestConsumer(AsyncWebsocketConsumer):
     async def connection_request(self, event):
         await self.send(text_data=json.dumps(event))
 
-class DonationConsumer(AsyncWebsocketConsumer):
+class DonationConsumer(ThrottledConsumerMixin, AsyncWebsocketConsumer):
     async def connect(self):
         try:
-            print("WebSocket connection attempt received")
-            
-            # Get the token from the query string
-            query_string = self.scope.get('query_string', b'').decode('utf-8')
-            print(f"Query string: {query_string}")
-            
-            if not query_string:
-                print("No query string found")
-                await self.close(code=4001)
-                return
+            logger.debug("Donation WebSocket connection attempt received")
 
-            # Parse the query string to get the token
-            try:
-                params = dict(param.split('=') for param in query_string.split('&'))
-                token = params.get('token')
-                print(f"Extracted token: {token[:10]}..." if token else "No token found in params")
-            except Exception as e:
-                print(f"Error parsing query string: {e}")
-                await self.close(code=4001)
-                return
-            
-            if not token:
-                print("Token not found in query parameters")
+            # JWTAuthMiddleware has already validated the token
+            user = self.scope.get('user')
+            if user is None or not user.is_authenticated:
+                logger.warning("Donation WebSocket rejected: missing or invalid token")
                 await self.close(code=4001)
                 return
 
-            # Validate token
-            try:
-                print("Attempting to validate token...")
-                access_token = AccessToken(token)
-                user_id = access_token['user_id']
-                print(f"Token validated successfully for user_id: {user_id}")
-                
-                self.user_id = user_id
-                self.room_group_name = f'donations_{user_id}'
-                
-                # Accept the connection
-                await self.accept()
-                print("WebSocket connection accepted")
-                
-                # Join user's notification group
-                await self.channel_layer.group_add(
-                    self.room_group_name,
-                    self.channel_name
-                )
-                print(f"Joined notification group: {self.room_group_name}")
-                
-                # Send authentication success message
-                await self.send(text_data=json.dumps({
-                    'type': 'auth_success',
-                    'message': 'Authentication successful'
-                }))
-                print("Sent authentication success message")
-                
-            except Exception as e:
-                print(f"Token validation error: {e}")
-                await self.close(code=4001)
+            self.user_id = user.id
+            self.room_group_name = f'donations_{user.id}'
+            
+            # Accept the connection
+            await self.accept()
+            logger.info("Donation WebSocket connection accepted for user %s", user.id)
+            
+            # Join user's notification group
+            await self.channel_layer.group_add(
+                self.room_group_name,
+                self.channel_name
+            )
+            logger.debug("Joined notification group: %s", self.room_group_name)
+            
+            # Send authentication success message
+            await self.send(text_data=json.dumps({
+                'type': 'auth_success',
+                'message': 'Authentication successful'
+            }))
+            logger.debug("Sent authentication success message")
                 
         except Exception as e:
-            print(f"Connection error: {e}")
+            logger.error("Donation WebSocket connection error: %s", e)
             await self.close(code=4001)
 
     async def disconnect(self, close_code):
-        print(f"WebSocket disconnecting with code: {close_code}")
+        logger.info("Donation WebSocket disconnecting with code: %s", close_code)
         if hasattr(self, 'room_group_name'):
             await self.channel_layer.group_discard(
                 self.room_group_name,
                 self.channel_name
             )
-            print(f"Left notification group: {self.room_group_name}")
+            logger.debug("Left notification group: %s", self.room_group_name)
 
     async def receive(self, text_data):
         try:
-            print(f"Received message: {text_data}")
+            logger.debug("Received donation WebSocket message of %s bytes", len(text_data))
             text_data_json = json.loads(text_data)
             message_type = text_data_json.get('type')
             
-            if message_type == 'notification':
-                # Handle notification message
-                notification = text_data_json.get('notification')
-                if notification:
-                    print(f"Sending notification to group: {self.room_group_name}")
-                    await self.channel_layer.group_send(
-                        self.room_group_name,
-                        {
-                            'type': 'notification_message',
-                            'notification': notification
-                        }
-                    )
+            # Notifications are only published by the server; clients
+            # must not be able to inject them into their group
+            logger.warning("Ignoring client message of type: %s", message_type)
         except json.JSONDecodeError as e:
-            print(f"Error decoding message: {e}")
+            logger.error("Error decoding message: %s", e)
         except Exception as e:
-            print(f"Error processing message: {e}")
+            logger.error("Error processing message: %s", e)
 
     async def notification_message(self, event):
         try:
             notification = event['notification']
-            print(f"Sending notification to client: {notification}")
+            logger.debug("Sending notification %s to client", notification.get('id'))
             await self.send(text_data=json.dumps({
                 'type': 'notification',
                 'notification': notification
             }))
         except Exception as e:
-            print(f"Error sending notification: {e}") 
\ No newline at end of file
+            logger.error("Error sending notification: %s", e) 
\ No newline at end of file
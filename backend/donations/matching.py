@@ -57,8 +57,11 @@ class MatchCalculator:
         return MATCHING_CONSTANTS['LOCATION_WEIGHTS']['FAR_COUNTRY']
 
 @transaction.atomic
-def find_matches(recipient_request) -> List[MatchResult]:
-    """Find potential matches for a recipient request and store them in the database"""
+def find_matches(recipient_request, notify: bool = True) -> List[MatchResult]:
+    """
+    Find potential matches for a recipient request and store them in the database.
+    With notify=False no match notifications are sent (used for bulk imports).
+    """
     matches = []
     
     # Get models using apps.get_model to avoid circular imports
@@ -69,7 +72,7 @@ def find_matches(recipient_request) -> List[MatchResult]:
     compatible_organs = Organ.objects.filter(
         is_available=True,
         organ_name=recipient_request.organ_type
-    )
+    ).select_related('donor')
     
     # Get existing matches
     existing_matches = OrganMatch.objects.filter(recipient_request=recipient_request)
@@ -135,7 +138,7 @@ def find_matches(recipient_request) -> List[MatchResult]:
         )
         
         # Send notification for high-potential matches
-        if total_score >= 70:
+        if notify and total_score >= 70:
             notify_potential_match(organ_match)
         
         matches.append(MatchResult(organ, total_score, match_details))
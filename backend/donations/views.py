@@ -5,7 +5,6 @@ from rest_framework.permissions import IsAuthenticated, DjangoModelPermissions
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import Q, Case, When, F, Value, IntegerField
 from datetime import datetime, timedelta
-from django.utils import timezone
 from django.db import transaction
 from django.core.mail import send_mail
 from django.conf import settings
@@ -20,10 +19,11 @@ from backend.donations.permissions import IsDonorOrReadOnly
 from backend.donations.mixins import CacheMixin, TransactionMixin, ErrorHandlerMixin
 from backend.donations.constants import BLOOD_TYPE_COMPATIBILITY, UrgencyLevel, CACHE_TTL, MATCHING_CONSTANTS
 from backend.notifications.models import Notification
-from backend.notifications.utils import create_notification
+from backend.notifications.utils import create_notification, notify_new_message
 from .matching import find_matches, MatchCalculator
-from backend.accounts.models import CustomUser as User
+from backend.accounts.models import CustomUser as User, age_expression
 from backend.accounts.serializers import UserSerializer
+from backend.activity.routes import ActivityRoute
 
 logger = logging.getLogger(__name__)
 
@@ -32,6 +32,16 @@ class OrganViewSet(viewsets.ModelViewSet, CacheMixin, TransactionMixin, ErrorHan
     permission_classes = [IsDonorOrReadOnly]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['organ_name', 'blood_type', 'is_available', 'location']
+    activity_routes = {
+        'create': ActivityRoute('organ_listed', 'User created a new organ listing'),
+        'update': ActivityRoute('organ_edited', 'User edited an organ listing'),
+        'partial_update': ActivityRoute('organ_edited', 'User edited an organ listing'),
+        'destroy': ActivityRoute('organ_deleted', 'User deleted an organ listing'),
+        'mark_unavailable': ActivityRoute('organ_marked_unavailable', 'User marked an organ as unavailable'),
+        'request_organ': ActivityRoute('request_sent', 'User sent a donation request'),
+        'send_message': ActivityRoute('message_sent', 'User sent a message'),
+        'search': ActivityRoute('search_performed', 'User performed a search'),
+    }
 
     def get_queryset(self):
         cached_response = self.get_cached_response()
@@ -90,7 +100,6 @@ class OrganViewSet(viewsets.ModelViewSet, CacheMixin, TransactionMixin, ErrorHan
                 
                 # Create notification for the donor
                 try:
-                    logger.info(f"Attempting to create notification for donor {organ.donor.id}")
                     notif = Notification.objects.create(
                         user=organ.donor,
                         type='connection',
@@ -98,13 +107,9 @@ class OrganViewSet(viewsets.ModelViewSet, CacheMixin, TransactionMixin, ErrorHan
                         sender=request.user,
                         data={'request_id': donation_request.id}
                     )
-                    logger.info(f"Notification created successfully: {notif.id}")
-                    
-                    # Log the notification data
-                    logger.info(f"Notification data - ID: {notif.id}, User: {notif.user.id}, Type: {notif.type}, Message: {notif.message}, Sender: {notif.sender.id}, Data: {notif.data}")
+                    logger.debug("Created notification %s for donor %s", notif.id, organ.donor_id)
                 except Exception as e:
-                    logger.error(f"Failed to create notification: {e}")
-                    logger.error(f"Error details: {str(e)}")
+                    logger.error("Failed to create notification: %s", e)
                 
                 serializer = DonationRequestSerializer(donation_request)
                 return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -148,7 +153,7 @@ class OrganViewSet(viewsets.ModelViewSet, CacheMixin, TransactionMixin, ErrorHan
             available_organs = Organ.objects.filter(
                 is_available=True,
                 organ_name=recipient_request.organ_type
-            )
+            ).select_related('donor')
             
             # Calculate match scores for each organ
             matches = []
@@ -289,8 +294,8 @@ class OrganViewSet(viewsets.ModelViewSet, CacheMixin, TransactionMixin, ErrorHan
                 content=request.data.get('content', '')
             )
             
-            chat_room.last_activity = timezone.now()
-            chat_room.save()
+            chat_room.touch_last_activity(message.timestamp)
+            notify_new_message(message, chat_room=chat_room)
             
             return Response({
                 'status': 'message_sent',
@@ -328,25 +333,23 @@ class OrganViewSet(viewsets.ModelViewSet, CacheMixin, TransactionMixin, ErrorHan
         Advanced search for organs with multiple filters
         """
         try:
-            logger.info(f"Search request received with params: {request.query_params}")
-            queryset = Organ.objects.filter(is_available=True)
+            logger.debug("Organ search with filters: %s", sorted(request.query_params.keys()))
+            # donor_age is computed by the database so it can be filtered and sorted on
+            queryset = Organ.objects.filter(is_available=True).annotate(donor_age=age_expression('donor__'))
             
             # Blood type filter
             blood_type = request.query_params.get('blood_type')
             if blood_type:
-                logger.info(f"Filtering by blood type: {blood_type}")
                 queryset = queryset.filter(blood_type=blood_type)
             
             # Organ type filter
             organ_type = request.query_params.get('organ_type')
             if organ_type:
-                logger.info(f"Filtering by organ type: {organ_type}")
                 queryset = queryset.filter(organ_name__iexact=organ_type)
             
             # Location filter
             location = request.query_params.get('location')
             if location:
-                logger.info(f"Filtering by location: {location}")
                 queryset = queryset.filter(location__icontains=location)
             
             # Age range filter
@@ -355,8 +358,7 @@ class OrganViewSet(viewsets.ModelViewSet, CacheMixin, TransactionMixin, ErrorHan
             if min_age:
                 try:
                     min_age = int(min_age)
-                    logger.info(f"Filtering by min age: {min_age}")
-                    queryset = queryset.filter(donor__age__gte=min_age)
+                    queryset = queryset.filter(donor_age__gte=min_age)
                 except ValueError:
                     return Response(
                         {'error': 'Invalid minimum age value'},
@@ -365,8 +367,7 @@ class OrganViewSet(viewsets.ModelViewSet, CacheMixin, TransactionMixin, ErrorHan
             if max_age:
                 try:
                     max_age = int(max_age)
-                    logger.info(f"Filtering by max age: {max_age}")
-                    queryset = queryset.filter(donor__age__lte=max_age)
+                    queryset = queryset.filter(donor_age__lte=max_age)
                 except ValueError:
                     return Response(
                         {'error': 'Invalid maximum age value'},
@@ -376,7 +377,6 @@ class OrganViewSet(viewsets.ModelViewSet, CacheMixin, TransactionMixin, ErrorHan
             # Urgency level filter
             urgency_level = request.query_params.get('urgency_level')
             if urgency_level:
-                logger.info(f"Filtering by urgency level: {urgency_level}")
                 # Check if the donor exists and has the specified urgency level
                 queryset = queryset.filter(
                     Q(donor__isnull=False) & 
@@ -390,7 +390,7 @@ class OrganViewSet(viewsets.ModelViewSet, CacheMixin, TransactionMixin, ErrorHan
             elif sort_by == 'urgency':
                 queryset = queryset.order_by('-donor__urgency_level')
             elif sort_by == 'age':
-                queryset = queryset.order_by('donor__age')
+                queryset = queryset.order_by('donor_age')
             
             # For recipients, calculate match scores using the new matching system
             if request.user.user_type == 'recipient':
@@ -451,6 +451,12 @@ class OrganViewSet(viewsets.ModelViewSet, CacheMixin, TransactionMixin, ErrorHan
 class DonationRequestViewSet(viewsets.ModelViewSet, TransactionMixin, ErrorHandlerMixin):
     permission_classes = [IsAuthenticated]
     serializer_class = DonationRequestSerializer
+    activity_routes = {
+        'create': ActivityRoute('request_sent', 'User sent a donation request'),
+        'accept': ActivityRoute('request_accepted', 'User accepted a donation request'),
+        'reject': ActivityRoute('request_rejected', 'User rejected a donation request'),
+        'destroy': ActivityRoute('request_cancelled', 'User cancelled a donation request'),
+    }
 
     def get_queryset(self):
         user = self.request.user
@@ -0,0 +1,90 @@
+"""
+Logging helpers referenced from settings.LOGGING.
+
+Records are handed to a queue on the calling thread and formatted and
+written by a QueueListener thread, so request and consumer code never
+waits on console or file I/O.
+"""
+import atexit
+import json
+import logging
+import random
+from logging.config import ConvertingList
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+from queue import Queue
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+RESERVED_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line, including fields passed through `extra`"""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'module': record.module,
+            'line': record.lineno,
+        }
+        for key, value in record.__dict__.items():
+            if key not in RESERVED_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Lets through only a `rate` fraction of records below WARNING. Attached
+    to hot-path loggers so their info logs stay representative without
+    being written for every request or message.
+    """
+
+    def __init__(self, rate=1.0):
+        super().__init__()
+        self.rate = float(rate)
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or random.random() < self.rate
+
+
+class LazyRotatingFileHandler(RotatingFileHandler):
+    """
+    RotatingFileHandler that creates the log directory when the file is
+    first opened instead of when settings are imported. Use with delay=True.
+    """
+
+    def _open(self):
+        Path(self.baseFilename).parent.mkdir(parents=True, exist_ok=True)
+        return super()._open()
+
+
+class QueueListenerHandler(QueueHandler):
+    """
+    QueueHandler that starts its own QueueListener for the given handlers.
+
+    In LOGGING the handlers are referenced as 'cfg://handlers.<name>', which
+    dictConfig resolves to the configured handler instances.
+    """
+
+    def __init__(self, handlers, respect_handler_level=True):
+        super().__init__(Queue(-1))
+        if isinstance(handlers, ConvertingList):
+            # Indexing a ConvertingList resolves the cfg:// references
+            handlers = [handlers[i] for i in range(len(handlers))]
+        self.listener = QueueListener(self.queue, *handlers, respect_handler_level=respect_handler_level)
+        self.listener.start()
+        atexit.register(self.listener.stop)
+
+    def prepare(self, record):
+        # Merge the args on the caller so later changes to mutable arguments
+        # do not leak into the record; the formatting itself (JSON,
+        # tracebacks) happens on the listener thread
+        record.msg = record.getMessage()
+        record.args = None
+        return record
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Notification, NotificationPreferences, Announcement
+from .models import Notification, NotificationPreferences, Announcement, NotificationArchive
 
 @admin.register(Announcement)
 class AnnouncementAdmin(admin.ModelAdmin):
@@ -33,6 +33,13 @@ class NotificationAdmin(admin.ModelAdmin):
     search_fields = ('user__email', 'message')
     readonly_fields = ('created_at',)
 
+@admin.register(NotificationArchive)
+class NotificationArchiveAdmin(admin.ModelAdmin):
+    list_display = ('user', 'type', 'message', 'created_at', 'archived_at')
+    list_filter = ('type', 'created_at')
+    search_fields = ('user__email', 'message')
+    readonly_fields = ('original_id', 'created_at', 'archived_at')
+
 @admin.register(NotificationPreferences)
 class NotificationPreferencesAdmin(admin.ModelAdmin):
     list_display = ('user', 'email_notifications', 'push_notifications', 'in_app_notifications')
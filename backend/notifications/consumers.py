@@ -2,48 +2,112 @@ import json
 import logging
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from django.conf import settings
 from .models import Notification
-from rest_framework_simplejwt.tokens import AccessToken
+from .utils import build_notification_payload
+from backend.realtime.throttling import ThrottledConsumerMixin
 from django.contrib.auth import get_user_model
 from urllib.parse import parse_qs
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
 
-class NotificationConsumer(AsyncWebsocketConsumer):
+class NotificationReplayMixin:
+    """
+    Replays notifications a reconnecting client missed; needs self.user
+    """
+
+    @database_sync_to_async
+    def get_missed_notifications(self, after_id, limit):
+        notifications = Notification.objects.filter(
+            user_id=self.user.id,
+            id__gt=after_id
+        ).select_related('sender').order_by('id')[:limit]
+        return [build_notification_payload(notification) for notification in notifications]
+
+    @database_sync_to_async
+    def get_updated_notifications(self, cursor_id, limit):
+        """
+        Notifications at or below the cursor that were rewritten in place
+        (merged message notifications) after the cursor one was created. The
+        client may have seen some of these updates already; resending a
+        notification with a known id only refreshes it.
+        """
+        mine = Notification.objects.filter(user_id=self.user.id, id__lte=cursor_id)
+        seen_at = mine.order_by('-id').values_list('created_at', flat=True).first()
+        if seen_at is None:
+            return []
+        notifications = mine.filter(updated_at__gt=seen_at).select_related('sender').order_by('id')[:limit]
+        return [build_notification_payload(notification) for notification in notifications]
+
+    async def replay_missed_notifications(self, since):
+        """
+        Stream notifications the client missed in bounded batches: first those
+        at or below its cursor that changed afterwards, then those newer than
+        the cursor.
+
+        The final batch is flagged with complete=True. If more than
+        NOTIFICATION_REPLAY['MAX_NOTIFICATIONS'] were missed the replay stops
+        with truncated=True and the client should refetch over REST instead.
+        """
+        try:
+            cursor = int(since)
+        except (TypeError, ValueError):
+            logger.warning(f"Ignoring invalid notification cursor: {since}")
+            return
+
+        batch_size = settings.NOTIFICATION_REPLAY['BATCH_SIZE']
+        remaining = settings.NOTIFICATION_REPLAY['MAX_NOTIFICATIONS']
+
+        updated = await self.get_updated_notifications(cursor, remaining)
+        remaining -= len(updated)
+        for start in range(0, len(updated), batch_size):
+            await self.send_replay_batch({
+                'type': 'notification_replay',
+                'notifications': updated[start:start + batch_size],
+                'last_id': cursor,
+                'complete': False,
+                'truncated': False
+            })
+
+        while True:
+            batch = await self.get_missed_notifications(cursor, min(batch_size, remaining))
+            if batch:
+                cursor = batch[-1]['id']
+                remaining -= len(batch)
+            complete = len(batch) < batch_size or remaining <= 0
+            await self.send_replay_batch({
+                'type': 'notification_replay',
+                'notifications': batch,
+                'last_id': cursor,
+                'complete': complete,
+                'truncated': complete and remaining <= 0
+            })
+            if complete:
+                break
+
+    async def send_replay_batch(self, batch):
+        await self.send(text_data=json.dumps(batch))
+
+class NotificationConsumer(ThrottledConsumerMixin, NotificationReplayMixin, AsyncWebsocketConsumer):
     async def connect(self):
         # Accept the connection first
         await self.accept()
         
-        # Get the token from the query parameters
-        query_string = self.scope.get('query_string', b'').decode('utf-8')
-        query_params = parse_qs(query_string)
-        token = query_params.get('token', [None])[0]
-        
-        if not token:
-            logger.error("No token provided in WebSocket connection")
+        # JWTAuthMiddleware has already validated the token
+        query_params = parse_qs(self.scope.get('query_string', b'').decode('utf-8'))
+        self.user = self.scope.get('user')
+
+        if self.user is None or not self.user.is_authenticated:
+            logger.error("Missing or invalid token in WebSocket connection")
             await self.send(text_data=json.dumps({
                 'type': 'auth_error',
-                'message': 'No token provided'
+                'message': 'Invalid or missing token'
             }))
             await self.close()
             return
 
         try:
-            # Verify the token
-            access_token = AccessToken(token)
-            user_id = access_token['user_id']
-            self.user = await self.get_user(user_id)
-            
-            if not self.user:
-                logger.error(f"Invalid user ID in token: {user_id}")
-                await self.send(text_data=json.dumps({
-                    'type': 'auth_error',
-                    'message': 'Invalid user'
-                }))
-                await self.close()
-                return
-
             # Add user to their notification group
             self.room_group_name = f'notifications_{self.user.id}'
             logger.info(f"Adding user {self.user.id} to notification group {self.room_group_name}")
@@ -59,6 +123,11 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             }))
             logger.info(f"WebSocket connection established for user {self.user.id}")
 
+            # Replay notifications created while the client was offline
+            since = query_params.get('since', [None])[0]
+            if since is not None:
+                await self.replay_missed_notifications(since)
+
         except Exception as e:
             logger.error(f"Error in WebSocket connection: {str(e)}")
             await self.send(text_data=json.dumps({
@@ -67,14 +136,6 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             }))
             await self.close()
 
-    @database_sync_to_async
-    def get_user(self, user_id):
-        try:
-            return User.objects.get(id=user_id)
-        except User.DoesNotExist:
-            logger.error(f"User not found: {user_id}")
-            return None
-
     async def disconnect(self, close_code):
         if hasattr(self, 'room_group_name'):
             logger.info(f"Disconnecting user {self.user.id} from notification group {self.room_group_name}")
@@ -87,23 +148,15 @@ class NotificationConsumer(AsyncWebsocketConsumer):
         try:
             text_data_json = json.loads(text_data)
             message_type = text_data_json.get('type')
-            logger.info(f"Received message of type: {message_type}")
+            logger.debug("Received message of type: %s", message_type)
             
             if message_type == 'auth':
                 # Authentication is already handled in connect
                 pass
-            elif message_type == 'notification':
-                # Handle notification message
-                notification = text_data_json.get('notification')
-                if notification:
-                    logger.info(f"Sending notification to group {self.room_group_name}: {notification}")
-                    await self.channel_layer.group_send(
-                        self.room_group_name,
-                        {
-                            'type': 'notification_message',
-                            'notification': notification
-                        }
-                    )
+            else:
+                # Notifications are only published by the server; clients
+                # must not be able to inject them into their group
+                logger.warning(f"Ignoring client message of type {message_type}")
 
         except json.JSONDecodeError as e:
             logger.error(f"Error decoding JSON message: {str(e)}")
@@ -112,8 +165,12 @@ class NotificationConsumer(AsyncWebsocketConsumer):
 
     async def notification_message(self, event):
         notification = event['notification']
-        logger.info(f"Sending notification to client: {notification}")
+        logger.debug("Sending notification %s to client", notification.get('id'))
         await self.send(text_data=json.dumps({
             'type': 'notification',
             'notification': notification
-        })) 
\ No newline at end of file
+        })) 
+
+    async def notifications_read(self, event):
+        # Read receipt from another session; forward the ids/range as is
+        await self.send(text_data=json.dumps(event))
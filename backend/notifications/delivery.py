@@ -0,0 +1,98 @@
+from collections import OrderedDict
+import logging
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Notification, NotificationPreferences
+
+logger = logging.getLogger(__name__)
+
+
+def wants_email(user):
+    """
+    Check whether a user should receive notification emails
+    """
+    if not user.email:
+        return False
+    try:
+        preferences = user.notification_preferences
+    except NotificationPreferences.DoesNotExist:
+        # Preferences are created lazily; the model default is to send emails
+        return True
+    return preferences.email_notifications
+
+
+def build_digest(user, notifications):
+    """
+    Build a single digest email for all pending notifications of a user
+    """
+    count = len(notifications)
+    subject = settings.NOTIFICATION_EMAIL['SUBJECT'].format(count=count)
+    lines = [f"Hello {user.first_name},", '', f"You have {count} new notification{'s' if count != 1 else ''}:", '']
+    lines += [f"- {notification.message}" for notification in notifications]
+    return EmailMessage(
+        subject=subject,
+        body='\n'.join(lines),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[user.email]
+    )
+
+
+def deliver_pending_notifications(batch_size=None, connection=None):
+    """
+    Send pending notifications as per-user email digests.
+
+    Takes up to batch_size notifications that have not been handled yet,
+    groups the unread ones by user, and sends one digest per user who has
+    email notifications enabled. Every notification in the batch is then
+    marked as handled with one UPDATE, including read ones and those of users
+    who opted out, so they are not reconsidered.
+
+    The rows are locked with SKIP LOCKED until they are marked, so concurrent
+    workers never pick up the same notifications. If sending fails the
+    transaction is rolled back and the rows stay pending for the next pass.
+
+    A connection passed in is opened on first use and left open for the
+    caller's next batch; without one a connection is only created when
+    there is something to send.
+
+    Returns a tuple of (emails sent, notifications handled).
+    """
+    batch_size = batch_size or settings.NOTIFICATION_EMAIL['BATCH_SIZE']
+    with transaction.atomic():
+        pending = list(
+            Notification.objects.filter(emailed_at__isnull=True)
+            .select_for_update(skip_locked=True, of=('self',))
+            .select_related('user', 'user__notification_preferences')
+            .order_by('id')[:batch_size]
+        )
+        if not pending:
+            return 0, 0
+
+        by_user = OrderedDict()
+        for notification in pending:
+            # Already seen in the app, nothing to email
+            if notification.is_read:
+                continue
+            by_user.setdefault(notification.user_id, []).append(notification)
+
+        messages = []
+        for notifications in by_user.values():
+            user = notifications[0].user
+            if wants_email(user):
+                messages.append(build_digest(user, notifications))
+
+        sent = 0
+        if messages:
+            if connection is None:
+                connection = get_connection()
+            else:
+                connection.open()
+            sent = connection.send_messages(messages) or 0
+
+        Notification.objects.filter(id__in=[n.id for n in pending]).update(emailed_at=timezone.now())
+    logger.info(f"Delivered {sent} notification digests covering {len(pending)} notifications")
+    return sent, len(pending)
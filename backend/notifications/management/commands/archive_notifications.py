@@ -0,0 +1,82 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from backend.notifications.models import Notification, NotificationArchive
+
+
+class Command(BaseCommand):
+    help = 'Moves read notifications older than N days into the notification archive table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.NOTIFICATION_RETENTION['ARCHIVE_AFTER_DAYS'],
+            help='Archive read notifications older than this many days'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.NOTIFICATION_RETENTION['BATCH_SIZE'],
+            help='Number of notifications moved per transaction'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many notifications would be archived'
+        )
+
+    def handle(self, *args, **options):
+        days = options['days']
+        batch_size = options['batch_size']
+        if days < 0:
+            raise CommandError('--days must not be negative')
+        if batch_size <= 0:
+            raise CommandError('--batch-size must be positive')
+
+        cutoff = timezone.now() - timedelta(days=days)
+        candidates = Notification.objects.filter(is_read=True, created_at__lt=cutoff)
+
+        if options['dry_run']:
+            self.stdout.write(f'{candidates.count()} notifications would be archived')
+            return
+
+        total = 0
+        last_id = 0
+        while True:
+            # Walk the primary key so every batch is a bounded range scan
+            batch = list(
+                candidates.filter(id__gt=last_id)
+                .order_by('id')
+                .values('id', 'user_id', 'type', 'message', 'sender_id', 'created_at')[:batch_size]
+            )
+            if not batch:
+                break
+
+            ids = [row['id'] for row in batch]
+            with transaction.atomic():
+                NotificationArchive.objects.bulk_create(
+                    [
+                        NotificationArchive(
+                            original_id=row['id'],
+                            user_id=row['user_id'],
+                            type=row['type'],
+                            message=row['message'],
+                            sender_id=row['sender_id'],
+                            created_at=row['created_at'],
+                        )
+                        for row in batch
+                    ],
+                    ignore_conflicts=True
+                )
+                Notification.objects.filter(id__in=ids).delete()
+
+            total += len(batch)
+            last_id = ids[-1]
+            self.stdout.write(f'Archived {total} notifications...')
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully archived {total} notifications'))
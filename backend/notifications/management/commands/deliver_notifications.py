@@ -0,0 +1,67 @@
+import logging
+import smtplib
+import time
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand, CommandError
+
+from backend.notifications.delivery import deliver_pending_notifications
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Sends pending notifications as batched per-user email digests'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.NOTIFICATION_EMAIL['BATCH_SIZE'],
+            help='Maximum number of notifications handled per pass'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running and poll for new notifications'
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=settings.NOTIFICATION_EMAIL['INTERVAL'],
+            help='Seconds to wait between passes when running with --loop'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size must be positive')
+
+        while True:
+            self.drain(options['batch_size'])
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def drain(self, batch_size):
+        emails, handled = 0, 0
+        # Not opened until a batch has something to send; the SMTP session is
+        # then reused for the rest of the pass
+        connection = get_connection()
+        try:
+            while True:
+                sent, count = deliver_pending_notifications(batch_size, connection=connection)
+                emails += sent
+                handled += count
+                if count < batch_size:
+                    break
+        except (smtplib.SMTPException, OSError) as e:
+            # The failed batch was rolled back and is retried on the next pass
+            logger.error(f"Sending notification digests failed: {str(e)}")
+            self.stderr.write(f'Sending notification digests failed: {e}')
+        finally:
+            connection.close()
+        if handled:
+            self.stdout.write(self.style.SUCCESS(
+                f'Sent {emails} digest emails for {handled} notifications'
+            ))
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.7 on 2026-10-19 07:55
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def mark_existing_notifications_emailed(apps, schema_editor):
+    # Existing notifications predate email delivery and must not be sent as a backlog
+    Notification = apps.get_model('notifications', 'Notification')
+    Notification.objects.filter(emailed_at__isnull=True).update(emailed_at=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0003_notification_user_id_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='emailed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(mark_existing_notifications_emailed, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['emailed_at'], name='notificatio_emailed_9898f3_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+from rest_framework.exceptions import ValidationError
+
+
+class BulkMarkReadMixin:
+    """
+    Mixin for marking many rows as read with a single UPDATE.
+
+    The request body carries either ``ids`` (a list of primary keys) or
+    ``up_to_id`` (everything with an id at or below it).
+    """
+    max_bulk_read_ids = 500
+
+    def get_bulk_read_scope(self, request):
+        ids = request.data.get('ids')
+        up_to_id = request.data.get('up_to_id')
+
+        if ids is not None:
+            if not isinstance(ids, list) or not ids:
+                raise ValidationError({'error': 'ids must be a non-empty list'})
+            if len(ids) > self.max_bulk_read_ids:
+                raise ValidationError({'error': f'At most {self.max_bulk_read_ids} ids can be marked at once'})
+            try:
+                return {'ids': sorted({int(pk) for pk in ids})}
+            except (TypeError, ValueError):
+                raise ValidationError({'error': 'ids must be integers'})
+
+        if up_to_id is not None:
+            try:
+                return {'up_to_id': int(up_to_id)}
+            except (TypeError, ValueError):
+                raise ValidationError({'error': 'up_to_id must be an integer'})
+
+        raise ValidationError({'error': 'Provide either ids or up_to_id'})
+
+    def bulk_mark_read(self, queryset, scope):
+        """
+        Mark the unread rows of queryset covered by scope as read
+        """
+        if 'ids' in scope:
+            queryset = queryset.filter(id__in=scope['ids'])
+        elif 'up_to_id' in scope:
+            queryset = queryset.filter(id__lte=scope['up_to_id'])
+        return queryset.filter(is_read=False).update(is_read=True)
@@ -70,14 +70,46 @@ class Notification(models.Model):
     sender = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='sent_notifications')
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Set when a notification is rewritten in place (merged message
+    # notifications) so reconnect replay can resend it; null if never
+    updated_at = models.DateTimeField(null=True, blank=True)
     data = models.JSONField(default=dict, blank=True)  # For additional data like chat room ID, etc.
+    emailed_at = models.DateTimeField(null=True, blank=True)  # Set once handled by the email delivery worker
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'is_read', 'created_at']),
+            models.Index(fields=['user', 'id']),
+            models.Index(fields=['user', 'updated_at']),
+            models.Index(fields=['emailed_at']),
+        ]
 
     def __str__(self):
         return f"{self.get_type_display()} for {self.user.username}"
 
+class NotificationArchive(models.Model):
+    """
+    Compact copy of a read notification moved out of the live table by the
+    archive_notifications management command.
+    """
+    original_id = models.BigIntegerField(unique=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_notifications')
+    type = models.CharField(max_length=20, choices=Notification.NOTIFICATION_TYPES)
+    message = models.TextField()
+    sender = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"Archived {self.get_type_display()} for {self.user.username}"
+
 class Announcement(models.Model):
     title = models.CharField(max_length=200)
     message = models.TextField()
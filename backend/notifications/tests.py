@@ -1,3 +1,341 @@
-from django.test import TestCase
+import smtplib
+from datetime import date, timedelta
+from io import StringIO
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from backend.chat.models import ChatRoom, Message
+from backend.donations.models import Organ
+from backend.realtime.middleware import JWTAuthMiddlewareStack
+from .consumers import NotificationConsumer
+from .models import Notification, NotificationArchive, NotificationPreferences
+from .utils import notify_new_message
+
+User = get_user_model()
+
+
+class UnreachableEmailBackend(BaseEmailBackend):
+    """Mail backend whose server is always down"""
+
+    def open(self):
+        raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+
+    def send_messages(self, email_messages):
+        self.open()
+
+
+def create_user(email, user_type='donor'):
+    return User.objects.create_user(
+        email=email,
+        first_name='Test',
+        last_name='User',
+        gender='male',
+        date_of_birth=date(1990, 1, 1),
+        blood_type='A+',
+        password='testpass123',
+        user_type=user_type
+    )
+
+
+class ArchiveNotificationsCommandTests(TestCase):
+    def setUp(self):
+        self.user = create_user('donor@test.com')
+
+    def create_notification(self, is_read, age_days):
+        notification = Notification.objects.create(
+            user=self.user,
+            type='news',
+            message='Test notification',
+            is_read=is_read
+        )
+        Notification.objects.filter(pk=notification.pk).update(
+            created_at=timezone.now() - timedelta(days=age_days)
+        )
+        return notification
+
+    def test_archives_only_old_read_notifications(self):
+        old_read = [self.create_notification(True, 120) for _ in range(5)]
+        old_unread = self.create_notification(False, 120)
+        recent_read = self.create_notification(True, 1)
+
+        call_command('archive_notifications', days=90, batch_size=2, stdout=StringIO())
+
+        self.assertEqual(
+            set(NotificationArchive.objects.values_list('original_id', flat=True)),
+            {n.id for n in old_read}
+        )
+        self.assertEqual(
+            set(Notification.objects.values_list('id', flat=True)),
+            {old_unread.id, recent_read.id}
+        )
+
+    def test_dry_run_does_not_move_rows(self):
+        self.create_notification(True, 120)
+
+        call_command('archive_notifications', days=90, dry_run=True, stdout=StringIO())
+
+        self.assertEqual(Notification.objects.count(), 1)
+        self.assertFalse(NotificationArchive.objects.exists())
+
+
+class MessageNotificationCoalescingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.donor = create_user('donor@test.com')
+        self.recipient = create_user('recipient@test.com', user_type='recipient')
+        organ = Organ.objects.create(donor=self.donor, organ_name='kidney', location='Nicosia')
+        self.chat_room = ChatRoom.objects.create(
+            donor=self.donor,
+            recipient=self.recipient,
+            organ=organ
+        )
+
+    def send(self, sender, content='Hello'):
+        message = Message.objects.create(chat_room=self.chat_room, sender=sender, content=content)
+        return notify_new_message(message, chat_room=self.chat_room)
+
+    def test_burst_is_merged_into_one_notification(self):
+        for _ in range(5):
+            self.send(self.recipient)
+
+        notification = Notification.objects.get(user=self.donor)
+        self.assertEqual(notification.message, 'You have 5 new messages about your kidney')
+        self.assertIsNotNone(notification.updated_at)
+        self.assertEqual(notification.data['message_count'], 5)
+        self.assertEqual(notification.data['related_object_id'], self.chat_room.id)
+
+    def test_read_notification_starts_a_new_one(self):
+        first_id = self.send(self.recipient)
+        Notification.objects.filter(id=first_id).update(is_read=True)
+
+        second_id = self.send(self.recipient)
+
+        self.assertNotEqual(first_id, second_id)
+        self.assertEqual(Notification.objects.filter(user=self.donor).count(), 2)
+
+    def test_busy_coalescing_lock_starts_a_new_notification(self):
+        first_id = self.send(self.recipient)
+        key = f'message_notification_{self.donor.id}_{self.chat_room.id}'
+        self.assertIsNone(cache.get(f'{key}_lock'))
+
+        # Another process is mid-merge and does not let go in time
+        cache.add(f'{key}_lock', True, 10)
+        second_id = self.send(self.recipient)
+
+        self.assertNotEqual(first_id, second_id)
+        self.assertEqual(Notification.objects.get(id=first_id).message, 'You have received a new message about your kidney')
+        self.assertEqual(cache.get(key)['count'], 1)
+
+    def test_merge_into_emailed_notification_queues_it_again(self):
+        notification_id = self.send(self.recipient)
+        Notification.objects.filter(id=notification_id).update(emailed_at=timezone.now())
+
+        self.send(self.recipient)
+
+        self.assertIsNone(Notification.objects.get(id=notification_id).emailed_at)
+
+    def test_each_direction_is_coalesced_separately(self):
+        self.send(self.recipient)
+        self.send(self.donor)
+        self.send(self.recipient)
+
+        self.assertEqual(Notification.objects.filter(user=self.donor).count(), 1)
+        self.assertEqual(Notification.objects.filter(user=self.recipient).count(), 1)
+
+
+@override_settings(NOTIFICATION_REPLAY={'BATCH_SIZE': 2, 'MAX_NOTIFICATIONS': 10})
+class NotificationReplayTests(TransactionTestCase):
+    def setUp(self):
+        self.user = create_user('donor@test.com')
+        self.notifications = [
+            Notification.objects.create(user=self.user, type='news', message=f'Update {i}')
+            for i in range(5)
+        ]
+
+    def replay(self, since):
+        async def run():
+            token = AccessToken.for_user(self.user)
+            communicator = WebsocketCommunicator(
+                JWTAuthMiddlewareStack(NotificationConsumer.as_asgi()),
+                f'/ws/notifications/?token={token}&since={since}'
+            )
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            auth = await communicator.receive_json_from()
+            self.assertEqual(auth['type'], 'auth_success')
+            batches = []
+            while True:
+                batch = await communicator.receive_json_from()
+                batches.append(batch)
+                if batch['complete']:
+                    break
+            await communicator.disconnect()
+            return batches
+        return async_to_sync(run)()
+
+    def test_replays_only_missed_notifications_in_batches(self):
+        batches = self.replay(self.notifications[1].id)
+
+        self.assertEqual([len(batch['notifications']) for batch in batches], [2, 1])
+        replayed = [n['id'] for batch in batches for n in batch['notifications']]
+        self.assertEqual(replayed, [n.id for n in self.notifications[2:]])
+        self.assertEqual(batches[-1]['last_id'], self.notifications[-1].id)
+        self.assertFalse(batches[-1]['truncated'])
+
+    def test_notifications_updated_after_the_cursor_are_replayed(self):
+        # A merged message notification is rewritten in place after the
+        # client last saw notifications up to the newest one
+        merged = self.notifications[1]
+        Notification.objects.filter(id=merged.id).update(
+            message='You have 3 new messages', updated_at=timezone.now() + timedelta(seconds=1)
+        )
+        new = Notification.objects.create(user=self.user, type='news', message='Later')
+
+        batches = self.replay(self.notifications[-1].id)
+
+        replayed = [(n['id'], n['message']) for batch in batches for n in batch['notifications']]
+        self.assertEqual(replayed, [(merged.id, 'You have 3 new messages'), (new.id, 'Later')])
+        self.assertEqual(batches[-1]['last_id'], new.id)
+
+    def test_up_to_date_client_gets_empty_replay(self):
+        batches = self.replay(self.notifications[-1].id)
+
+        self.assertEqual(len(batches), 1)
+        self.assertEqual(batches[0]['notifications'], [])
+
+    def test_clients_cannot_inject_notifications(self):
+        async def run():
+            token = AccessToken.for_user(self.user)
+            communicator = WebsocketCommunicator(
+                JWTAuthMiddlewareStack(NotificationConsumer.as_asgi()),
+                f'/ws/notifications/?token={token}'
+            )
+            await communicator.connect()
+            await communicator.receive_json_from()
+            await communicator.send_json_to({'type': 'notification', 'notification': {'message': 'Fake'}})
+            nothing = await communicator.receive_nothing()
+            await communicator.disconnect()
+            return nothing
+
+        self.assertTrue(async_to_sync(run)())
+
+
+class DeliverNotificationsCommandTests(TestCase):
+    def setUp(self):
+        self.donor = create_user('donor@test.com')
+        self.recipient = create_user('recipient@test.com', user_type='recipient')
+
+    def test_sends_one_digest_per_user_per_batch(self):
+        for i in range(3):
+            Notification.objects.create(user=self.donor, type='news', message=f'Donor {i}')
+        Notification.objects.create(user=self.recipient, type='news', message='Recipient')
+
+        call_command('deliver_notifications', batch_size=2, stdout=StringIO())
+
+        # Batch one holds two donor notifications, batch two one of each user
+        self.assertEqual(
+            [(message.to, message.body.count('\n- ')) for message in mail.outbox],
+            [(['donor@test.com'], 2), (['donor@test.com'], 1), (['recipient@test.com'], 1)]
+        )
+        self.assertFalse(Notification.objects.filter(emailed_at__isnull=True).exists())
+
+        call_command('deliver_notifications', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_read_notifications_are_marked_without_email(self):
+        Notification.objects.create(user=self.donor, type='news', message='Seen', is_read=True)
+        Notification.objects.create(user=self.recipient, type='news', message='Seen too', is_read=True)
+        Notification.objects.create(user=self.recipient, type='news', message='Unseen')
+
+        call_command('deliver_notifications', stdout=StringIO())
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['recipient@test.com'])
+        self.assertIn('Unseen', mail.outbox[0].body)
+        self.assertNotIn('Seen too', mail.outbox[0].body)
+        self.assertFalse(Notification.objects.filter(emailed_at__isnull=True).exists())
+
+    def test_opted_out_user_is_marked_without_email(self):
+        NotificationPreferences.objects.create(user=self.donor, email_notifications=False)
+        Notification.objects.create(user=self.donor, type='news', message='Muted')
+        Notification.objects.create(user=self.recipient, type='news', message='Sent')
+
+        call_command('deliver_notifications', stdout=StringIO())
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['recipient@test.com'])
+        self.assertIn('Sent', mail.outbox[0].body)
+        self.assertFalse(Notification.objects.filter(emailed_at__isnull=True).exists())
+
+    @override_settings(EMAIL_BACKEND='backend.notifications.tests.UnreachableEmailBackend')
+    def test_smtp_failure_leaves_notifications_pending(self):
+        Notification.objects.create(user=self.donor, type='news', message='Retry me')
+        stderr = StringIO()
+
+        call_command('deliver_notifications', stdout=StringIO(), stderr=stderr)
+
+        self.assertIn('Sending notification digests failed', stderr.getvalue())
+        self.assertTrue(Notification.objects.filter(emailed_at__isnull=True).exists())
+
+    @override_settings(EMAIL_BACKEND='backend.notifications.tests.UnreachableEmailBackend')
+    def test_no_connection_without_anything_to_send(self):
+        Notification.objects.create(user=self.donor, type='news', message='Seen', is_read=True)
+        stderr = StringIO()
+
+        call_command('deliver_notifications', stdout=StringIO(), stderr=stderr)
+
+        self.assertEqual(stderr.getvalue(), '')
+        self.assertFalse(Notification.objects.filter(emailed_at__isnull=True).exists())
+
+
+class BulkMarkReadTests(TestCase):
+    def setUp(self):
+        self.user = create_user('donor@test.com')
+        self.other = create_user('recipient@test.com', user_type='recipient')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.notifications = [
+            Notification.objects.create(user=self.user, type='news', message=f'Notification {i}')
+            for i in range(4)
+        ]
+        self.foreign = Notification.objects.create(user=self.other, type='news', message='Not mine')
+        self.url = '/api/notifications/notifications/mark_many_read/'
+
+    def unread_ids(self):
+        return set(Notification.objects.filter(is_read=False).values_list('id', flat=True))
+
+    def test_marks_listed_ids_with_one_update(self):
+        ids = [self.notifications[0].id, self.notifications[2].id, self.foreign.id]
+        with self.assertNumQueries(1):
+            response = self.client.post(self.url, {'ids': ids}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual(
+            self.unread_ids(),
+            {self.notifications[1].id, self.notifications[3].id, self.foreign.id}
+        )
+
+    def test_marks_range_up_to_id(self):
+        response = self.client.post(self.url, {'up_to_id': self.notifications[1].id}, format='json')
+
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual(
+            self.unread_ids(),
+            {self.notifications[2].id, self.notifications[3].id, self.foreign.id}
+        )
+
+    def test_rejects_missing_or_invalid_scope(self):
+        self.assertEqual(self.client.post(self.url, {}, format='json').status_code, 400)
+        self.assertEqual(self.client.post(self.url, {'ids': ['x']}, format='json').status_code, 400)
+        self.assertEqual(len(self.unread_ids()), 5)
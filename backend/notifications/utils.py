@@ -1,8 +1,15 @@
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
 from .models import Notification, NotificationPreferences
 from django.contrib.auth import get_user_model
+import logging
+import time
+from contextlib import contextmanager
 
+logger = logging.getLogger(__name__)
 User = get_user_model()
 
 def create_notification(recipient, notification_type, title, message, related_object_id=None, urgency_level='LOW', sender=None):
@@ -36,29 +43,55 @@ def create_notification(recipient, notification_type, title, message, related_ob
     )
 
     # Send WebSocket notification
+    send_notification_payload(recipient.id, build_notification_payload(notification))
+    
+    # Email is sent in per-user digests by the deliver_notifications worker
+    # TODO: Implement push notifications if preferences.push_notifications is True
+    return notification
+
+def build_notification_payload(notification):
+    """
+    Build the WebSocket representation of a notification
+    """
+    return {
+        'id': notification.id,
+        'type': notification.type,
+        'message': notification.message,
+        'is_read': notification.is_read,
+        'created_at': notification.created_at.isoformat(),
+        'sender': {
+            'id': notification.sender.id,
+            'fullname': notification.sender.fullname,
+            'user_type': notification.sender.user_type
+        } if notification.sender else None,
+        'data': notification.data
+    }
+
+def send_notification_payload(user_id, payload):
+    """
+    Push a notification payload to the user's notification group
+    """
     channel_layer = get_channel_layer()
     async_to_sync(channel_layer.group_send)(
-        f'notifications_{recipient.id}',
+        f'notifications_{user_id}',
         {
             'type': 'notification_message',
-            'notification': {
-                'id': notification.id,
-                'type': notification.type,
-                'message': notification.message,
-                'is_read': notification.is_read,
-                'created_at': notification.created_at.isoformat(),
-                'sender': {
-                    'id': notification.sender.id,
-                    'fullname': notification.sender.fullname,
-                    'user_type': notification.sender.user_type
-                } if notification.sender else None,
-                'data': notification.data
-            }
+            'notification': payload
+        }
+    )
+
+def send_read_receipt(user_id, scope):
+    """
+    Tell the user's other open sessions which notifications were marked as read
+    """
+    channel_layer = get_channel_layer()
+    async_to_sync(channel_layer.group_send)(
+        f'notifications_{user_id}',
+        {
+            'type': 'notifications_read',
+            **scope
         }
     )
-    
-    # TODO: Implement email notifications if preferences.email_notifications is True
-    # TODO: Implement push notifications if preferences.push_notifications is True
 
 def get_navigation_path(notification_type, related_object_id):
     """
@@ -79,47 +112,114 @@ def get_navigation_path(notification_type, related_object_id):
     }
     return paths.get(notification_type, '/notifications')
 
-def notify_new_message(message):
+def get_message_notification_text(organ_name, count):
     """
-    Create a notification when a new message is received
+    Get the notification text for one or more messages in a chat room
+    """
+    if count == 1:
+        if organ_name:
+            return f'You have received a new message about your {organ_name}'
+        return 'You have received a new message about your organ request'
+    if organ_name:
+        return f'You have {count} new messages about your {organ_name}'
+    return f'You have {count} new messages about your organ request'
+
+@contextmanager
+def cache_lock(key, timeout=10, wait=1):
+    """
+    Serialize a read-modify-write of a cache entry across processes.
+
+    The lock is taken with cache.add, which only one caller can win, and
+    expires after timeout seconds if its holder dies. Yields False when it
+    could not be taken within wait seconds.
+    """
+    lock_key = f'{key}_lock'
+    deadline = time.monotonic() + wait
+    acquired = cache.add(lock_key, True, timeout)
+    while not acquired and time.monotonic() < deadline:
+        time.sleep(0.05)
+        acquired = cache.add(lock_key, True, timeout)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            cache.delete(lock_key)
+
+def notify_new_message(message, chat_room=None, count=1):
+    """
+    Create a notification when a new message is received.
+
+    Messages for the same room and recipient that arrive within
+    NOTIFICATION_COALESCE_WINDOW seconds of each other are merged into one
+    unread notification, which is updated in place instead of creating a new
+    row and push for every message. count lets callers that persist messages
+    in batches report several messages from the same sender at once.
+    The merge holds cache_lock so concurrent senders cannot lose counts.
     """
     try:
-        # Get the chat room and organ information
-        chat_room = message.chat_room
-        if not chat_room:
-            # Fallback message if chat room is not available
-            notification_message = 'You have received a new message'
+        chat_room = chat_room or message.chat_room
+        if message.sender_id == chat_room.donor_id:
+            recipient_id = chat_room.recipient_id
         else:
-            # Get organ information
-            organ = chat_room.organ
-            if organ:
-                # Create organ-specific message
-                notification_message = f'You have received a new message about your {organ.organ_name}'
-            else:
-                # Fallback message if organ is not available
-                notification_message = 'You have received a new message about your organ request'
-        
-        create_notification(
-            recipient=message.recipient,
-            notification_type='message',
-            title='New Message',
-            message=notification_message,
-            related_object_id=message.id,
-            urgency_level='HIGH',
-            sender=message.sender  # Pass the sender object for frontend processing
-        )
+            recipient_id = chat_room.donor_id
+
+        cache_key = f'message_notification_{recipient_id}_{chat_room.id}'
+        window = settings.NOTIFICATION_COALESCE_WINDOW
+        with cache_lock(cache_key) as locked:
+            # Without the lock the message gets its own notification rather
+            # than risk losing a concurrent merge
+            pending = cache.get(cache_key) if locked else None
+
+            if pending:
+                total = pending['count'] + count
+                data = dict(pending['data'], message_count=total)
+                notification_message = get_message_notification_text(pending['organ_name'], total)
+
+                # Only merge into the notification while it is still unread
+                # updated_at lets reconnect replay resend the merged notification;
+                # clearing emailed_at puts the new messages in the next digest
+                updated = Notification.objects.filter(id=pending['id'], is_read=False).update(
+                    message=notification_message,
+                    data=data,
+                    updated_at=timezone.now(),
+                    emailed_at=None
+                )
+                if updated:
+                    pending.update(count=total, data=data)
+                    cache.set(cache_key, pending, window)
+                    send_notification_payload(recipient_id, dict(
+                        pending['payload'],
+                        message=notification_message,
+                        data=data
+                    ))
+                    return pending['id']
+
+            organ_name = chat_room.organ.organ_name if chat_room.organ_id else None
+            recipient = chat_room.recipient if recipient_id == chat_room.recipient_id else chat_room.donor
+            notification = create_notification(
+                recipient=recipient,
+                notification_type='message',
+                title='New Message',
+                message=get_message_notification_text(organ_name, count),
+                related_object_id=chat_room.id,
+                urgency_level='HIGH',
+                sender=message.sender  # Pass the sender object for frontend processing
+            )
+            if notification is None:
+                return None
+
+            if locked:
+                cache.set(cache_key, {
+                    'id': notification.id,
+                    'count': count,
+                    'organ_name': organ_name,
+                    'data': notification.data,
+                    'payload': build_notification_payload(notification)
+                }, window)
+            return notification.id
     except Exception as e:
-        # Log the error and create a generic notification
-        print(f"Error creating notification: {str(e)}")
-        create_notification(
-            recipient=message.recipient,
-            notification_type='message',
-            title='New Message',
-            message='You have received a new message',
-            related_object_id=message.id,
-            urgency_level='HIGH',
-            sender=message.sender
-        )
+        logger.error(f"Error creating message notification: {str(e)}")
+        return None
 
 def notify_donation_request_created(request):
     """
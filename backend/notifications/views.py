@@ -4,11 +4,13 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from .models import Notification, NotificationPreferences, Announcement
 from .serializers import NotificationSerializer, NotificationPreferenceSerializer, AnnouncementSerializer
+from .mixins import BulkMarkReadMixin
+from .utils import send_read_receipt
 from django.db.models import Q
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 
-class NotificationViewSet(viewsets.ModelViewSet):
+class NotificationViewSet(BulkMarkReadMixin, viewsets.ModelViewSet):
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
 
@@ -18,13 +20,23 @@ class NotificationViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def mark_as_read(self, request, pk=None):
         notification = self.get_object()
-        notification.is_read = True
-        notification.save()
+        if self.bulk_mark_read(self.get_queryset(), {'ids': [notification.id]}):
+            send_read_receipt(request.user.id, {'ids': [notification.id]})
         return Response({'status': 'notification marked as read'})
 
+    @action(detail=False, methods=['post'])
+    def mark_many_read(self, request):
+        scope = self.get_bulk_read_scope(request)
+        updated = self.bulk_mark_read(self.get_queryset(), scope)
+        if updated:
+            send_read_receipt(request.user.id, scope)
+        return Response({'status': 'notifications marked as read', 'updated': updated})
+
     @action(detail=False, methods=['post'])
     def mark_all_read(self, request):
-        self.get_queryset().filter(is_read=False).update(is_read=True)
+        updated = self.get_queryset().filter(is_read=False).update(is_read=True)
+        if updated:
+            send_read_receipt(request.user.id, {'all': True})
         return Response({'status': 'all notifications marked as read'})
 
     @action(detail=True, methods=['post'])
@@ -90,7 +102,7 @@ class AnnouncementViewSet(viewsets.ReadOnlyModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
-        queryset = Announcement.objects.filter(is_active=True)
+        queryset = Announcement.objects.filter(is_active=True).select_related('created_by__recipient_profile')
         
         # Filter based on user type
         if user.user_type == 'donor':
@@ -0,0 +1,202 @@
+import json
+import logging
+
+from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
+
+from backend.chat.buffer import message_buffer
+from backend.chat.consumers import ChatAuthHandler, ChatMessageHandler, ChatPublisherMixin
+from backend.notifications.consumers import NotificationReplayMixin
+from .throttling import ThrottledConsumerMixin
+
+logger = logging.getLogger(__name__)
+
+
+class RealtimeConsumer(ThrottledConsumerMixin, NotificationReplayMixin, ChatPublisherMixin, AsyncWebsocketConsumer):
+    """
+    Single multiplexed WebSocket per client for notifications, donations and chat.
+
+    The client authenticates once with ?token= (see JWTAuthMiddleware) and
+    then manages topics:
+
+        {"action": "subscribe", "topic": "notifications", "since": 42}
+        {"action": "subscribe", "topic": "donations"}
+        {"action": "subscribe", "topic": "chat"}        (every room of the user)
+        {"action": "subscribe", "topic": "chat:17"}     (a single room)
+        {"action": "unsubscribe", "topic": "chat:17"}
+        {"action": "send", "topic": "chat:17", "message": "...", "tempId": "..."}
+
+    Topics map onto the existing channel layer groups, so events published
+    for the per-feature sockets reach this consumer unchanged. Every frame
+    sent to the client carries the topic it belongs to.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.user = None
+        self.groups_joined = set()
+        self.rooms = {}
+        self.message_handler = ChatMessageHandler()
+        self.auth_handler = ChatAuthHandler()
+
+    async def connect(self):
+        # JWTAuthMiddleware validates the token once and caches the user
+        self.user = self.scope.get('user')
+        if self.user is None or not self.user.is_authenticated:
+            logger.error("Realtime authentication failed: missing or invalid token")
+            await self.close(code=4001)
+            return
+
+        await self.accept()
+        await self.send(text_data=json.dumps({'type': 'auth_success'}))
+        logger.info(f"Realtime WebSocket connection accepted for user {self.user.id}")
+
+    async def disconnect(self, close_code):
+        for group in self.groups_joined:
+            await self.channel_layer.group_discard(group, self.channel_name)
+        self.groups_joined.clear()
+        if settings.CHAT_WRITE_BEHIND['ENABLED']:
+            await message_buffer.flush()
+        logger.info(f"Realtime WebSocket disconnected with code {close_code}")
+
+    async def join(self, group):
+        if group not in self.groups_joined:
+            await self.channel_layer.group_add(group, self.channel_name)
+            self.groups_joined.add(group)
+
+    async def leave(self, group):
+        if group in self.groups_joined:
+            await self.channel_layer.group_discard(group, self.channel_name)
+            self.groups_joined.discard(group)
+
+    async def send_frame(self, topic, payload):
+        await self.send(text_data=json.dumps({'topic': topic, **payload}))
+
+    async def send_error(self, topic, message):
+        await self.send_frame(topic, {'type': 'error', 'message': message})
+
+    async def receive(self, text_data):
+        try:
+            data = json.loads(text_data)
+        except json.JSONDecodeError as e:
+            logger.error(f"Error decoding realtime message: {str(e)}")
+            return
+
+        action = data.get('action')
+        topic = data.get('topic') or ''
+        try:
+            if action == 'subscribe':
+                await self.subscribe(topic, data)
+            elif action == 'unsubscribe':
+                await self.unsubscribe(topic)
+            elif action == 'send':
+                await self.send_chat_message(topic, data)
+            else:
+                await self.send_error(topic, f'Unknown action: {action}')
+        except Exception as e:
+            logger.error(f"Error handling realtime action {action} on {topic}: {str(e)}")
+            await self.send_error(topic, 'Internal error')
+
+    async def subscribe(self, topic, data):
+        if topic == 'notifications':
+            await self.join(f'notifications_{self.user.id}')
+        elif topic == 'donations':
+            await self.join(f'donations_{self.user.id}')
+        elif topic == 'chat':
+            self.rooms.update(await self.auth_handler.get_user_rooms(self.user))
+            for room_id in self.rooms:
+                await self.join(f'chat_{room_id}')
+        elif topic.startswith('chat:'):
+            room = await self.get_room(topic)
+            if room is None:
+                await self.send_error(topic, 'Not a participant of this chat room')
+                return
+            await self.join(f'chat_{room.id}')
+        else:
+            await self.send_error(topic, 'Unknown topic')
+            return
+
+        confirmation = {'type': 'subscribed'}
+        if topic == 'chat':
+            confirmation['chatRoomIds'] = list(self.rooms)
+        await self.send_frame(topic, confirmation)
+        if topic == 'notifications' and data.get('since') is not None:
+            await self.replay_missed_notifications(data['since'])
+
+    async def unsubscribe(self, topic):
+        if topic == 'notifications':
+            await self.leave(f'notifications_{self.user.id}')
+        elif topic == 'donations':
+            await self.leave(f'donations_{self.user.id}')
+        elif topic == 'chat':
+            for room_id in self.rooms:
+                await self.leave(f'chat_{room_id}')
+        elif topic.startswith('chat:'):
+            await self.leave(f'chat_{topic[len("chat:"):]}')
+        await self.send_frame(topic, {'type': 'unsubscribed'})
+
+    async def get_room(self, topic):
+        """Resolve a chat:<id> topic to a room the user takes part in"""
+        try:
+            room_id = int(topic[len('chat:'):])
+        except ValueError:
+            return None
+        if room_id not in self.rooms:
+            room = await self.auth_handler.get_accessible_room(room_id, self.user)
+            if room is None:
+                return None
+            self.rooms[room_id] = room
+        return self.rooms[room_id]
+
+    async def send_chat_message(self, topic, data):
+        message = data.get('message')
+        if not topic.startswith('chat:') or not message:
+            await self.send_error(topic, 'Messages need a chat:<id> topic and a message')
+            return
+        room = await self.get_room(topic)
+        if room is None or f'chat_{room.id}' not in self.groups_joined:
+            await self.send_error(topic, 'Subscribe to the chat room before sending')
+            return
+        await self.publish_message(room, message, data.get('tempId'))
+
+    async def send_replay_batch(self, batch):
+        await self.send_frame('notifications', batch)
+
+    # Events of the notifications_<user> group
+
+    async def notification_message(self, event):
+        await self.send_frame('notifications', {
+            'type': 'notification',
+            'notification': event['notification']
+        })
+
+    async def notifications_read(self, event):
+        await self.send_frame('notifications', event)
+
+    async def request_notification(self, event):
+        await self.send_frame('notifications', event)
+
+    async def request_accepted(self, event):
+        await self.send_frame('notifications', event)
+
+    async def request_rejected(self, event):
+        await self.send_frame('notifications', event)
+
+    async def connection_request(self, event):
+        await self.send_frame('notifications', event)
+
+    # Events of the chat_<room> groups
+
+    async def chat_message(self, event):
+        await self.send_frame(f"chat:{event['chatRoomId']}", event)
+
+    async def messages_read(self, event):
+        await self.send_frame(f"chat:{event['chatRoomId']}", event)
+
+    async def typing(self, event):
+        if event['user_id'] != self.user.id:
+            await self.send_frame(f"chat:{event['chatRoomId']}", event)
+
+    async def presence(self, event):
+        if event['user_id'] != self.user.id:
+            await self.send_frame(f"chat:{event['chatRoomId']}", event)
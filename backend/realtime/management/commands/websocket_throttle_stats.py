@@ -0,0 +1,22 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from backend.realtime.throttling import THROTTLE_EVENTS, counter_key, get_throttle_counters
+
+
+class Command(BaseCommand):
+    help = 'Shows how often WebSocket clients were rate limited or dropped for being too slow'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Reset the counters after printing them'
+        )
+
+    def handle(self, *args, **options):
+        for event, count in get_throttle_counters().items():
+            self.stdout.write(f'{event}: {count}')
+        if options['reset']:
+            cache.delete_many([counter_key(event) for event in THROTTLE_EVENTS])
+            self.stdout.write(self.style.SUCCESS('Counters reset'))
@@ -0,0 +1,74 @@
+import logging
+from urllib.parse import parse_qs
+
+from channels.middleware import BaseMiddleware
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+logger = logging.getLogger(__name__)
+User = get_user_model()
+
+
+# Only what consumers read on every connection is cached; the password hash
+# and personal details never leave the database
+CACHED_USER_FIELDS = ('id', 'is_active', 'user_type', 'first_name', 'last_name')
+
+
+def user_cache_key(user_id):
+    return f'ws_user_{user_id}'
+
+
+async def get_cached_user(user_id):
+    """
+    Load an active user, serving repeated lookups from the cache for
+    WEBSOCKET_AUTH['USER_CACHE_TTL'] seconds.
+
+    The cache holds CACHED_USER_FIELDS only. The user is rebuilt with the
+    other fields deferred, so reading one of them loads it from the database.
+    """
+    key = user_cache_key(user_id)
+    values = await cache.aget(key)
+    if values is None:
+        values = await User.objects.filter(id=user_id, is_active=True).values(*CACHED_USER_FIELDS).afirst()
+        if values is None:
+            return None
+        await cache.aset(key, values, settings.WEBSOCKET_AUTH['USER_CACHE_TTL'])
+    # from_db expects the loaded values in concrete field order
+    field_names = [field.attname for field in User._meta.concrete_fields if field.attname in values]
+    return User.from_db(User.objects.db, field_names, [values[name] for name in field_names])
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """
+    Populates scope['user'] from the ?token= access token of a WebSocket.
+
+    The token is validated once per connection. Missing or invalid tokens
+    leave an AnonymousUser in the scope and consumers decide whether to
+    close the connection.
+    """
+
+    async def __call__(self, scope, receive, send):
+        scope = dict(scope)
+        scope['user'] = await self.get_user(scope)
+        return await super().__call__(scope, receive, send)
+
+    async def get_user(self, scope):
+        query_params = parse_qs(scope.get('query_string', b'').decode('utf-8'))
+        token = query_params.get('token', [None])[0]
+        if not token:
+            return AnonymousUser()
+        try:
+            user_id = AccessToken(token)[api_settings.USER_ID_CLAIM]
+        except (TokenError, KeyError) as e:
+            logger.warning(f"Rejected WebSocket token: {str(e)}")
+            return AnonymousUser()
+        return await get_cached_user(user_id) or AnonymousUser()
+
+
+def JWTAuthMiddlewareStack(inner):
+    return JWTAuthMiddleware(inner)
@@ -0,0 +1,15 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .middleware import user_cache_key
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_websocket_user(sender, instance, **kwargs):
+    # Deactivated or edited users must not linger in the WebSocket auth cache
+    cache.delete(user_cache_key(instance.id))
@@ -0,0 +1,247 @@
+import asyncio
+from datetime import date
+from io import StringIO
+
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.generic.websocket import AsyncWebsocketConsumer
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from backend.chat.models import ChatRoom, Message
+from backend.donations.models import Organ
+from backend.notifications.models import Notification
+from backend.notifications.utils import send_notification_payload, build_notification_payload
+from .middleware import CACHED_USER_FIELDS, JWTAuthMiddlewareStack, user_cache_key
+from .routing import websocket_urlpatterns
+from .throttling import ThrottledConsumerMixin, get_throttle_counters
+
+User = get_user_model()
+
+
+def create_user(email, user_type='donor'):
+    return User.objects.create_user(
+        email=email,
+        first_name='Test',
+        last_name='User',
+        gender='male',
+        date_of_birth=date(1990, 1, 1),
+        blood_type='A+',
+        password='testpass123',
+        user_type=user_type
+    )
+
+
+class RealtimeConsumerTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.donor = create_user('donor@test.com')
+        self.recipient = create_user('recipient@test.com', user_type='recipient')
+        organ = Organ.objects.create(donor=self.donor, organ_name='kidney', location='Nicosia')
+        self.chat_room = ChatRoom.objects.create(donor=self.donor, recipient=self.recipient, organ=organ)
+
+    def connect(self, user, token=None):
+        token = token or AccessToken.for_user(user)
+        return WebsocketCommunicator(JWTAuthMiddlewareStack(URLRouter(websocket_urlpatterns)), f'/ws/realtime/?token={token}')
+
+    def test_topics_share_one_connection(self):
+        missed = Notification.objects.create(user=self.donor, type='news', message='While offline')
+        live = Notification.objects.create(user=self.donor, type='news', message='Live')
+
+        async def run():
+            donor = self.connect(self.donor)
+            self.assertTrue((await donor.connect())[0])
+            frames = [await donor.receive_json_from()]
+
+            await donor.send_json_to({'action': 'subscribe', 'topic': 'notifications', 'since': 0})
+            frames.append(await donor.receive_json_from())
+            frames.append(await donor.receive_json_from())
+            await donor.send_json_to({'action': 'subscribe', 'topic': 'chat'})
+            frames.append(await donor.receive_json_from())
+
+            recipient = self.connect(self.recipient)
+            await recipient.connect()
+            await recipient.receive_json_from()
+            await recipient.send_json_to({'action': 'send', 'topic': f'chat:{self.chat_room.id}', 'message': 'Hi'})
+            frames.append(await recipient.receive_json_from())
+            await recipient.send_json_to({'action': 'subscribe', 'topic': f'chat:{self.chat_room.id}'})
+            frames.append(await recipient.receive_json_from())
+            await recipient.send_json_to({'action': 'send', 'topic': f'chat:{self.chat_room.id}', 'message': 'Hi'})
+            # The new-message notification arrives on the same socket ahead of the message
+            frame = await donor.receive_json_from()
+            while frame['topic'] == 'notifications':
+                frame = await donor.receive_json_from()
+            frames.append(frame)
+
+            await database_sync_to_async(send_notification_payload)(self.donor.id, payload)
+            frames.append(await donor.receive_json_from())
+
+            await recipient.disconnect()
+            await donor.disconnect()
+            return frames
+
+        payload = build_notification_payload(live)
+        auth, subscribed, replay, chat, refused, joined, message, notification = async_to_sync(run)()
+
+        self.assertEqual(auth['type'], 'auth_success')
+        self.assertEqual(subscribed, {'topic': 'notifications', 'type': 'subscribed'})
+        self.assertEqual(replay['topic'], 'notifications')
+        self.assertEqual([n['id'] for n in replay['notifications']], [missed.id, live.id])
+        self.assertEqual(chat['chatRoomIds'], [self.chat_room.id])
+        self.assertEqual(refused['type'], 'error')
+        self.assertEqual(joined['topic'], f'chat:{self.chat_room.id}')
+        self.assertEqual(message['topic'], f'chat:{self.chat_room.id}')
+        self.assertEqual(message['message'], 'Hi')
+        self.assertEqual(notification['topic'], 'notifications')
+        self.assertEqual(notification['notification']['id'], live.id)
+        self.assertEqual(Message.objects.filter(chat_room=self.chat_room).count(), 1)
+
+    def test_invalid_token_is_rejected(self):
+        async def run():
+            communicator = self.connect(self.donor, token='invalid')
+            connected, _ = await communicator.connect()
+            return connected
+
+        self.assertFalse(async_to_sync(run)())
+
+
+class JWTAuthMiddlewareTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = create_user('donor@test.com')
+
+    def resolve_user(self, token):
+        async def inner(scope, receive, send):
+            self.scope_user = scope['user']
+
+        middleware = JWTAuthMiddlewareStack(inner)
+        scope = {'type': 'websocket', 'query_string': f'token={token}'.encode()}
+        async_to_sync(middleware)(scope, None, None)
+        return self.scope_user
+
+    def test_user_is_cached_between_connections(self):
+        token = AccessToken.for_user(self.user)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.resolve_user(token), self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.resolve_user(token), self.user)
+
+    def test_cache_holds_no_credentials(self):
+        token = AccessToken.for_user(self.user)
+        self.resolve_user(token)
+
+        self.assertEqual(set(cache.get(user_cache_key(self.user.id))), set(CACHED_USER_FIELDS))
+        with self.assertNumQueries(0):
+            user = self.resolve_user(token)
+            self.assertEqual(user.fullname, 'Test User')
+            self.assertTrue(user.is_authenticated)
+        # Fields left out of the cache are loaded on access
+        with self.assertNumQueries(1):
+            self.assertEqual(user.email, 'donor@test.com')
+
+    def test_invalid_token_gives_anonymous_user(self):
+        self.assertFalse(self.resolve_user('invalid').is_authenticated)
+        self.assertFalse(self.resolve_user('').is_authenticated)
+
+    def test_saving_user_invalidates_cache(self):
+        token = AccessToken.for_user(self.user)
+        self.resolve_user(token)
+        self.assertIsNotNone(cache.get(user_cache_key(self.user.id)))
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(cache.get(user_cache_key(self.user.id)))
+        self.assertFalse(self.resolve_user(token).is_authenticated)
+
+
+THROTTLE = {'RATE': 0.001, 'BURST': 3, 'MAX_VIOLATIONS': 3, 'SEND_QUEUE_SIZE': 2, 'SEND_OVERFLOW': 'drop'}
+
+
+class BlockedConsumer(ThrottledConsumerMixin, AsyncWebsocketConsumer):
+    """Consumer whose client stops reading until `released` is set"""
+
+    channel_name = 'blocked'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.released = asyncio.Event()
+        self.written = []
+        self.base_send = self.write
+
+    async def write(self, message):
+        if message['type'] == 'websocket.send':
+            await self.released.wait()
+        self.written.append(message)
+
+
+@override_settings(WEBSOCKET_THROTTLE=THROTTLE)
+class ThrottlingTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = create_user('donor@test.com')
+
+    def test_flooding_client_is_throttled_then_closed(self):
+        async def run():
+            token = AccessToken.for_user(self.user)
+            communicator = WebsocketCommunicator(
+                JWTAuthMiddlewareStack(URLRouter(websocket_urlpatterns)), f'/ws/realtime/?token={token}'
+            )
+            await communicator.connect()
+            await communicator.receive_json_from()
+            frames = []
+            for _ in range(3):
+                await communicator.send_json_to({'action': 'subscribe', 'topic': 'donations'})
+                frames.append(await communicator.receive_json_from())
+            for _ in range(3):
+                await communicator.send_json_to({'action': 'subscribe', 'topic': 'donations'})
+            frames.append(await communicator.receive_json_from())
+            closed = await communicator.receive_output()
+            # Counters are flushed once the server reports the disconnect
+            await communicator.disconnect()
+            return frames, closed
+
+        frames, closed = async_to_sync(run)()
+
+        self.assertEqual([f['type'] for f in frames], ['subscribed'] * 3 + ['error'])
+        self.assertEqual(closed, {'type': 'websocket.close', 'code': 4029})
+        counters = get_throttle_counters()
+        self.assertEqual(counters['messages_throttled'], 3)
+        self.assertEqual(counters['closed_rate_limited'], 1)
+
+        out = StringIO()
+        call_command('websocket_throttle_stats', '--reset', stdout=out)
+        self.assertIn('messages_throttled: 3', out.getvalue())
+        self.assertEqual(get_throttle_counters()['messages_throttled'], 0)
+
+    def test_slow_client_loses_oldest_frames(self):
+        async def run():
+            consumer = BlockedConsumer()
+            for i in range(5):
+                await consumer.send(text_data=str(i))
+            consumer.released.set()
+            await consumer.send_queue.join()
+            consumer.send_writer.cancel()
+            await consumer.flush_throttle_events()
+            return [m['text'] for m in consumer.written]
+
+        # The writer only starts once send() yields, after all five frames
+        self.assertEqual(async_to_sync(run)(), ['3', '4'])
+        self.assertEqual(get_throttle_counters()['frames_dropped'], 3)
+
+    @override_settings(WEBSOCKET_THROTTLE={**THROTTLE, 'SEND_OVERFLOW': 'close'})
+    def test_slow_client_is_closed(self):
+        async def run():
+            consumer = BlockedConsumer()
+            for i in range(3):
+                await consumer.send(text_data=str(i))
+            consumer.send_writer.cancel()
+            await consumer.flush_throttle_events()
+            return consumer.written
+
+        self.assertEqual(async_to_sync(run)(), [{'type': 'websocket.close', 'code': 4013}])
+        self.assertEqual(get_throttle_counters()['closed_too_slow'], 1)
@@ -0,0 +1,166 @@
+import asyncio
+import json
+import logging
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Close codes sent to clients that are cut off
+CLOSE_RATE_LIMITED = 4029
+CLOSE_TOO_SLOW = 4013
+
+THROTTLE_EVENTS = [
+    'messages_throttled',
+    'closed_rate_limited',
+    'frames_dropped',
+    'closed_too_slow',
+]
+
+
+def counter_key(event):
+    return f'ws_throttle_{event}'
+
+
+async def record_event(event, count=1):
+    """Add to a throttling counter shared by every worker through the cache"""
+    key = counter_key(event)
+    await cache.aadd(key, 0, None)
+    try:
+        await cache.aincr(key, count)
+    except ValueError:
+        await cache.aset(key, count, None)
+
+
+def get_throttle_counters():
+    found = cache.get_many([counter_key(event) for event in THROTTLE_EVENTS])
+    return {event: found.get(counter_key(event), 0) for event in THROTTLE_EVENTS}
+
+
+class TokenBucket:
+    """
+    Allows bursts of up to `burst` messages, refilled at `rate` messages
+    per second.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def consume(self, tokens=1):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < tokens:
+            return False
+        self.tokens -= tokens
+        return True
+
+
+class ThrottledConsumerMixin:
+    """
+    Per-connection rate limiting and backpressure for WebSocket consumers.
+
+    Incoming frames go through a token bucket (WEBSOCKET_THROTTLE RATE and
+    BURST). Frames over the limit are dropped before they reach receive();
+    after MAX_VIOLATIONS of them the connection is closed with 4029.
+
+    Outgoing frames are written from a bounded queue of SEND_QUEUE_SIZE
+    frames. When the queue is full SEND_OVERFLOW decides between dropping
+    the oldest queued frame ('drop') and closing the connection with 4013
+    ('close'). This only bounds bursts inside the process: daphne accepts a
+    frame into its transport buffer without waiting for the client, and
+    that buffer is not visible through ASGI, so the queue fills when group
+    events arrive faster than the event loop hands them to daphne, not when
+    the client reads slowly.
+
+    Throttling events are counted per connection and added to the shared
+    counters once, when the connection goes away.
+
+    Must come before AsyncWebsocketConsumer in the bases.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        config = settings.WEBSOCKET_THROTTLE
+        self.receive_bucket = TokenBucket(config['RATE'], config['BURST'])
+        self.throttle_violations = 0
+        self.throttle_events = Counter()
+        self.send_queue = asyncio.Queue(maxsize=config['SEND_QUEUE_SIZE'])
+        self.send_writer = None
+
+    async def websocket_receive(self, message):
+        if self.receive_bucket.consume():
+            return await super().websocket_receive(message)
+
+        self.throttle_violations += 1
+        self.throttle_events['messages_throttled'] += 1
+        if self.throttle_violations == 1:
+            await self.send(text_data=json.dumps({'type': 'error', 'message': 'Rate limit exceeded'}))
+        if self.throttle_violations >= settings.WEBSOCKET_THROTTLE['MAX_VIOLATIONS']:
+            logger.warning(f"Closing WebSocket {self.channel_name}: rate limit exceeded")
+            self.throttle_events['closed_rate_limited'] += 1
+            await self.close(code=CLOSE_RATE_LIMITED)
+
+    async def send(self, text_data=None, bytes_data=None, close=False):
+        if self.send_writer is None:
+            self.send_writer = asyncio.create_task(self.write_send_queue())
+        frame = (text_data, bytes_data)
+        try:
+            self.send_queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            if settings.WEBSOCKET_THROTTLE['SEND_OVERFLOW'] == 'close':
+                logger.warning(f"Closing WebSocket {self.channel_name}: client is not keeping up")
+                self.throttle_events['closed_too_slow'] += 1
+                self.discard_send_queue()
+                await super().close(code=CLOSE_TOO_SLOW)
+                return
+            self.send_queue.get_nowait()
+            self.send_queue.task_done()
+            self.send_queue.put_nowait(frame)
+            self.throttle_events['frames_dropped'] += 1
+        if close:
+            await self.close(None if close is True else close)
+
+    async def write_send_queue(self):
+        while True:
+            text_data, bytes_data = await self.send_queue.get()
+            try:
+                await super().send(text_data=text_data, bytes_data=bytes_data)
+            except Exception as e:
+                logger.error(f"Error writing WebSocket frame: {str(e)}")
+            finally:
+                self.send_queue.task_done()
+
+    def discard_send_queue(self):
+        while not self.send_queue.empty():
+            self.send_queue.get_nowait()
+            self.send_queue.task_done()
+
+    async def close(self, code=None):
+        # Let frames queued before the close (e.g. an error message) go out first
+        if self.send_writer is not None:
+            try:
+                await asyncio.wait_for(self.send_queue.join(), timeout=1)
+            except asyncio.TimeoutError:
+                self.discard_send_queue()
+        await super().close(code=code)
+
+    async def flush_throttle_events(self):
+        events, self.throttle_events = self.throttle_events, Counter()
+        for event, count in events.items():
+            await record_event(event, count)
+
+    async def websocket_disconnect(self, message):
+        try:
+            await super().websocket_disconnect(message)
+        finally:
+            if self.send_writer is not None:
+                self.send_writer.cancel()
+                self.send_writer = None
+            await self.flush_throttle_events()
@@ -47,6 +47,7 @@ INSTALLED_APPS = [
     'backend.notifications.apps.NotificationsConfig',
     'backend.chat.apps.ChatConfig',
     'backend.activity.apps.ActivityConfig',
+    'backend.realtime.apps.RealtimeConfig',
     'django_countries',
     'phonenumber_field',
     'rest_framework',
@@ -236,12 +237,21 @@ SECURE_HSTS_INCLUDE_SUBDOMAINS = True
 SECURE_HSTS_PRELOAD = True
 
 # Cache Settings
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
+# Shared cache in production so chat presence is visible across workers
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'unique-snowflake',
+        }
     }
-}
 
 # Cache timeouts (in seconds)
 CACHE_TTL = {
@@ -255,6 +265,16 @@ SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
 SESSION_CACHE_ALIAS = 'default'
 
 # Logging configuration
+# Logging goes through a QueueHandler; a listener thread formats and writes
+# records so request and consumer code never blocks on log I/O. Files are
+# JSON lines, rotated at LOG_MAX_BYTES. Info logs of hot-path modules are
+# sampled at LOG_SAMPLE_RATE; warnings and errors are always kept. LOG_DIR
+# is created when the first record is written to it.
+LOG_DIR = Path(os.environ.get('LOG_DIR', BASE_DIR / 'logs'))
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', '0.1'))
+LOG_MAX_BYTES = int(os.environ.get('LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -263,6 +283,15 @@ LOGGING = {
             'format': '{levelname} {asctime} {module} {message}',
             'style': '{',
         },
+        'json': {
+            '()': 'backend.log.JSONFormatter',
+        },
+    },
+    'filters': {
+        'sample_hot_path': {
+            '()': 'backend.log.SamplingFilter',
+            'rate': LOG_SAMPLE_RATE,
+        },
     },
     'handlers': {
         'console': {
@@ -270,16 +299,33 @@ LOGGING = {
             'formatter': 'verbose',
         },
         'file': {
-            'class': 'logging.FileHandler',
-            'filename': 'debug.log',
-            'formatter': 'verbose',
+            'class': 'backend.log.LazyRotatingFileHandler',
+            'filename': LOG_DIR / 'backend.log',
+            'maxBytes': LOG_MAX_BYTES,
+            'backupCount': 5,
+            'delay': True,
+            'formatter': 'json',
+        },
+        'queue': {
+            'class': 'backend.log.QueueListenerHandler',
+            'handlers': ['cfg://handlers.console', 'cfg://handlers.file'],
         },
     },
     'loggers': {
-        'backend.activity.middleware': {
-            'handlers': ['console', 'file'],
-            'level': 'DEBUG',
-            'propagate': True,
+        'backend': {
+            'handlers': ['queue'],
+            'level': LOG_LEVEL,
+            'propagate': False,
+        },
+        **{
+            name: {'filters': ['sample_hot_path']}
+            for name in (
+                'backend.activity.middleware',
+                'backend.chat.consumers',
+                'backend.donations.consumers',
+                'backend.donations.views',
+                'backend.notifications.consumers',
+            )
         },
     },
 }
@@ -291,9 +337,99 @@ EMAIL_PORT = int(os.environ.get('EMAIL_PORT', '1025'))
 EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS', 'False').lower() == 'true'
 EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER', '')
 EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', '')
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'webmaster@localhost')
+
+# Notification email digests (sent by the deliver_notifications command)
+NOTIFICATION_EMAIL = {
+    'BATCH_SIZE': 500,
+    'INTERVAL': 60,  # seconds between worker passes
+    'SUBJECT': 'You have {count} new notification(s)',
+}
 
 # Password reset settings
 PASSWORD_RESET_TIMEOUT = 86400  # 24 hours in seconds
 
+# Raw activity history is kept for RAW_DAYS; the rollup_activity command folds
+# older rows into daily per-user counts (ActivityDailyRollup) and deletes them
+ACTIVITY_RETENTION = {
+    'RAW_DAYS': int(os.environ.get('ACTIVITY_RAW_DAYS', '30')),
+    'BATCH_SIZE': 1000,
+}
+
+# Seconds clients may cache /api/activity/stats/ responses
+ACTIVITY_STATS_MAX_AGE = 300
+
+# Notification retention (used by the archive_notifications command)
+NOTIFICATION_RETENTION = {
+    'ARCHIVE_AFTER_DAYS': int(os.environ.get('NOTIFICATION_ARCHIVE_AFTER_DAYS', '90')),
+    'BATCH_SIZE': 1000,
+}
+
+# Chat message notifications for the same room and recipient arriving within
+# this many seconds are merged into a single notification
+NOTIFICATION_COALESCE_WINDOW = 120
+
+# Missed notifications replayed to a reconnecting WebSocket client
+NOTIFICATION_REPLAY = {
+    'BATCH_SIZE': 50,
+    'MAX_NOTIFICATIONS': 500,
+}
+
+# WebSocket JWT authentication (backend.realtime.middleware). Saving or
+# deleting a user clears its cache entry; QuerySet.update() sends no signals,
+# so a user deactivated that way can still open WebSockets until the entry
+# expires unless the code also deletes realtime.middleware.user_cache_key().
+WEBSOCKET_AUTH = {
+    'USER_CACHE_TTL': 60,  # seconds a user loaded for a WebSocket handshake is cached
+}
+
+# Per-connection limits of backend.realtime.throttling.ThrottledConsumerMixin.
+# Clients may send BURST frames at once, refilled at RATE frames per second,
+# and are disconnected after MAX_VIOLATIONS throttled frames. At most
+# SEND_QUEUE_SIZE outgoing frames are buffered per connection; SEND_OVERFLOW
+# is 'drop' (discard the oldest frame) or 'close' (disconnect the client).
+# The queue only bounds bursts inside the process, since daphne buffers
+# frames for slow clients in its transport without telling the consumer.
+WEBSOCKET_THROTTLE = {
+    'RATE': float(os.getenv('WEBSOCKET_THROTTLE_RATE', '5')),
+    'BURST': int(os.getenv('WEBSOCKET_THROTTLE_BURST', '20')),
+    'MAX_VIOLATIONS': 50,
+    'SEND_QUEUE_SIZE': 200,
+    'SEND_OVERFLOW': os.getenv('WEBSOCKET_SEND_OVERFLOW', 'drop'),
+}
+
+# Optional write-behind persistence for chat messages received over WebSockets.
+# Messages are broadcast immediately and written with bulk_create every
+# FLUSH_INTERVAL_MS milliseconds or once MAX_BATCH messages are pending.
+CHAT_WRITE_BEHIND = {
+    'ENABLED': os.environ.get('CHAT_WRITE_BEHIND', 'False').lower() == 'true',
+    'MAX_BATCH': 100,
+    'FLUSH_INTERVAL_MS': 250,
+}
+
+# ChatRoom.last_activity is moved forward at most once per this many seconds
+CHAT_ACTIVITY_DEBOUNCE = 60
+
+# Optional write-behind for activity history rows recorded by
+# ActivityLoggingMiddleware. When enabled they are queued and written by a
+# background thread (backend.activity.writer) in batches of up to MAX_BATCH, at
+# least every FLUSH_INTERVAL_MS, and events beyond QUEUE_SIZE are dropped.
+# Off unless ACTIVITY_WRITE_BEHIND=true, so tests under any runner write
+# synchronously and see their rows; deployments turn it on (see render.yaml).
+ACTIVITY_WRITER = {
+    'ENABLED': os.environ.get('ACTIVITY_WRITE_BEHIND', 'False').lower() == 'true',
+    'QUEUE_SIZE': 10000,
+    'MAX_BATCH': 200,
+    'FLUSH_INTERVAL_MS': 500,
+}
+
+# Ephemeral chat presence and typing indicators, kept in the cache only.
+# Clients ping at least every TTL seconds to stay online; typing events are
+# broadcast at most once per TYPING_THROTTLE seconds per connection.
+CHAT_PRESENCE = {
+    'TTL': 90,
+    'TYPING_THROTTLE': 3,
+}
+
 # WhiteNoise static files storage
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
@@ -4,6 +4,7 @@ import axios from 'axios';
 import { format } from 'date-fns';
 import { websocketService } from '../../services/websocketService';
 import { useAuth } from '../../context/AuthContext';
+import { chatAPI } from '../../services/api';
 
 interface Message {
     id?: number;
@@ -35,6 +36,8 @@ const ChatRoom: React.FC<ChatRoomProps> = ({ chatRoomId }) => {
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState<string | null>(null);
     const [chatRoom, setChatRoom] = useState<ChatRoomData | null>(null);
+    const [hasMore, setHasMore] = useState(false);
+    const [loadingOlder, setLoadingOlder] = useState(false);
     const messagesEndRef = useRef<HTMLDivElement>(null);
     const { user } = useAuth();
 
@@ -81,8 +84,10 @@ const ChatRoom: React.FC<ChatRoomProps> = ({ chatRoomId }) => {
 
     const fetchMessages = async () => {
         try {
-            const response = await axios.get<Message[]>(`/api/chat/rooms/${chatRoomId}/messages/`);
-            setMessages(response.data);
+            // Latest page only; older messages are loaded on demand
+            const response = await chatAPI.getMessages(chatRoomId);
+            setMessages(response.data.results);
+            setHasMore(response.data.has_more);
             setLoading(false);
         } catch (err) {
             setError('Failed to load messages');
@@ -90,13 +95,30 @@ const ChatRoom: React.FC<ChatRoomProps> = ({ chatRoomId }) => {
         }
     };
 
+    const fetchOlderMessages = async () => {
+        const oldest = messages.find(m => m.id !== undefined);
+        if (!oldest || loadingOlder) return;
+        setLoadingOlder(true);
+        try {
+            const response = await chatAPI.getMessages(chatRoomId, { before: oldest.id });
+            setMessages(prev => [...response.data.results, ...prev]);
+            setHasMore(response.data.has_more);
+        } catch (err) {
+            setError('Failed to load earlier messages');
+        } finally {
+            setLoadingOlder(false);
+        }
+    };
+
     const scrollToBottom = () => {
         messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
     };
 
+    // Follow new messages at the bottom, but stay put when older ones are prepended
+    const lastMessage = messages[messages.length - 1];
     useEffect(() => {
         scrollToBottom();
-    }, [messages]);
+    }, [lastMessage?.id, lastMessage?.tempId]);
 
     const handleSendMessage = async (e: React.FormEvent) => {
         e.preventDefault();
@@ -155,6 +177,13 @@ const ChatRoom: React.FC<ChatRoomProps> = ({ chatRoomId }) => {
                 </div>
             </Card.Header>
             <Card.Body className="chat-messages" style={{ height: '60vh', overflowY: 'auto' }}>
+                {hasMore && (
+                    <div className="text-center mb-2">
+                        <Button variant="link" size="sm" onClick={fetchOlderMessages} disabled={loadingOlder}>
+                            {loadingOlder ? <Spinner animation="border" size="sm" /> : 'Load earlier messages'}
+                        </Button>
+                    </div>
+                )}
                 {messages.map((message) => (
                     <div
                         key={message.id || message.timestamp}
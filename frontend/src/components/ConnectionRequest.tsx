@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { useParams } from 'react-router-dom';
 import { useAuth } from '../context/AuthContext';
-import { websocketService } from '../services/websocketService';
+import { realtimeService } from '../services/realtimeService';
 import donationsAPI from '../services/donationsAPI';
 import { toast } from 'react-toastify';
 import { OrganRequest } from '../services/api';
@@ -24,22 +24,24 @@ const ConnectionRequest = () => {
     const [selectedConnectionId, setSelectedConnectionId] = useState<number | null>(null);
 
     useEffect(() => {
-        // Connect to WebSocket
-        const token = localStorage.getItem('access_token');
-        if (token) {
-            websocketService.connect();
-        }
-
-        // Set up WebSocket callbacks
-        websocketService.addMessageHandler('connection_request', handleNewConnectionRequest);
-        websocketService.addMessageHandler('request_accepted', handleRequestAccepted);
-        websocketService.addMessageHandler('request_rejected', handleRequestRejected);
+        // Connection request events are sent on the notifications topic
+        const handleFrame = (frame: any) => {
+            if (frame.type === 'connection_request') {
+                handleNewConnectionRequest(frame);
+            } else if (frame.type === 'request_accepted') {
+                handleRequestAccepted(frame);
+            } else if (frame.type === 'request_rejected') {
+                handleRequestRejected(frame);
+            }
+        };
+        realtimeService.connect();
+        realtimeService.subscribe('notifications', handleFrame);
 
         // Load existing connection requests
         loadConnectionRequests();
 
         return () => {
-            websocketService.disconnect();
+            realtimeService.unsubscribe('notifications', handleFrame);
         };
     }, [organId]);
 
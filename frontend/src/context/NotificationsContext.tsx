@@ -2,7 +2,7 @@ import React, { createContext, useContext, useState, useEffect, useRef, useCallb
 import axios from 'axios';
 import { useNavigate } from 'react-router-dom';
 import { useAuth } from './AuthContext';
-import { websocketService } from '../services/websocketService';
+import { realtimeService } from '../services/realtimeService';
 import api from '../services/api';
 
 interface Notification {
@@ -26,6 +26,13 @@ interface WebSocketNotification {
     notification: Notification;
 }
 
+interface NotificationsReadEvent {
+    type: 'notifications_read';
+    ids?: number[];
+    up_to_id?: number;
+    all?: boolean;
+}
+
 interface NotificationPreferences {
     email_notifications: boolean;
     push_notifications: boolean;
@@ -40,6 +47,7 @@ interface NotificationsContextType {
     preferences: NotificationPreferences;
     markAsRead: (notificationId: number) => Promise<void>;
     markAllAsRead: () => Promise<void>;
+    markManyAsRead: (notificationIds: number[]) => Promise<void>;
     acceptRequest: (notificationId: number) => Promise<void>;
     updatePreferences: (newPreferences: NotificationPreferences) => Promise<void>;
     handleNotificationClick: (notification: Notification) => void;
@@ -122,24 +130,34 @@ export const NotificationsProvider: React.FC<NotificationsProviderProps> = ({ ch
     useEffect(() => {
         if (!user) {
             console.log('No user found, skipping notifications setup');
+            // Drop a socket still authenticated as the previous user
+            realtimeService.disconnect();
             return;
         }
 
-        // Connect to WebSocket
-        websocketService.connect();
-
-        // Add message handler for notifications
-        websocketService.addMessageHandler('notification', (data: WebSocketNotification) => {
+        // Notifications arrive on the "notifications" topic of the shared realtime socket
+        const handleFrame = (frame: any) => {
             try {
-                console.log('Received notification:', data);
-                addNotification(data.notification);
+                if (frame.type === 'notification' && frame.notification) {
+                    console.log('Received notification:', frame);
+                    addNotification((frame as WebSocketNotification).notification);
+                } else if (frame.type === 'notification_replay') {
+                    // Notifications missed while disconnected, oldest first
+                    frame.notifications.forEach((notification: Notification) => addNotification(notification));
+                } else if (frame.type === 'notifications_read') {
+                    // Read receipts from other sessions of the same user
+                    applyReadReceipt(frame as NotificationsReadEvent);
+                }
             } catch (error) {
                 console.error('Error handling notification:', error);
             }
-        });
+        };
+
+        realtimeService.connect();
+        realtimeService.subscribe('notifications', handleFrame);
 
         return () => {
-            websocketService.removeMessageHandler('notification');
+            realtimeService.unsubscribe('notifications', handleFrame);
         };
     }, [user]);
 
@@ -218,6 +236,9 @@ export const NotificationsProvider: React.FC<NotificationsProviderProps> = ({ ch
                     new Date(b.created_at).getTime() - new Date(a.created_at).getTime()
                 );
 
+                // Resume the WebSocket replay cursor from the newest fetched notification
+                notificationsData.forEach(n => realtimeService.trackNotificationId(n.id));
+
                 // Set notifications and calculate unread count
                 setNotifications(notificationsData);
                 setUnreadCount(notificationsData.filter(n => !n.is_read).length);
@@ -260,6 +281,44 @@ export const NotificationsProvider: React.FC<NotificationsProviderProps> = ({ ch
         }
     };
 
+    const applyReadReceipt = useCallback((receipt: Omit<NotificationsReadEvent, 'type'>) => {
+        const covers = (n: Notification) =>
+            receipt.all ||
+            (receipt.ids !== undefined && receipt.ids.includes(n.id)) ||
+            (receipt.up_to_id !== undefined && n.id <= receipt.up_to_id);
+
+        setNotifications(prev => {
+            const updated = prev.map(n => (!n.is_read && covers(n) ? { ...n, is_read: true } : n));
+            setUnreadCount(updated.filter(n => !n.is_read).length);
+            return updated;
+        });
+    }, []);
+
+    const markManyAsRead = async (notificationIds: number[]): Promise<void> => {
+        const ids = notificationIds.filter(id => id && id <= 10000000000);
+        if (ids.length === 0) {
+            return;
+        }
+        try {
+            const token = localStorage.getItem('access_token');
+            if (!token) {
+                throw new Error('No access token found');
+            }
+
+            // One request and one UPDATE for the whole selection
+            await axios.post('/api/notifications/notifications/mark_many_read/', { ids }, {
+                headers: {
+                    'Authorization': `Bearer ${token}`
+                }
+            });
+
+            applyReadReceipt({ ids });
+        } catch (error) {
+            console.error('Error marking notifications as read:', error);
+            throw error;
+        }
+    };
+
     const markAllAsRead = async (): Promise<void> => {
         try {
             const token = localStorage.getItem('access_token');
@@ -345,6 +404,7 @@ export const NotificationsProvider: React.FC<NotificationsProviderProps> = ({ ch
         preferences,
         markAsRead,
         markAllAsRead,
+        markManyAsRead,
         acceptRequest,
         updatePreferences,
         handleNotificationClick,
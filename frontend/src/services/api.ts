@@ -530,11 +530,29 @@ export const notificationsAPI = {
     markAllAsRead: () => api.put('/notifications/mark_all_read/'),
 };
 
+export interface ChatHistoryMessage {
+    id: number;
+    uid: string;
+    sender: { id: number; fullname: string; user_type: string };
+    content: string;
+    is_read: boolean;
+    timestamp: string;
+}
+
+// One page of room history, oldest first; has_more means older messages exist
+export interface ChatHistoryPage {
+    results: ChatHistoryMessage[];
+    has_more: boolean;
+}
+
 export const chatAPI = {
-    getRooms: () => api.get('/chat/rooms/'),
-    getMessages: (roomId: number) => api.get(`/chat/rooms/${roomId}/messages/`),
-    sendMessage: (roomId: number, content: string) =>
-        api.post(`/chat/rooms/${roomId}/messages/`, { content }),
+    getRooms: () => api.get('/api/chat/rooms/'),
+    getMessages: (roomId: number | string, params?: { before?: number; after?: number; limit?: number }) =>
+        api.get<ChatHistoryPage>(`/api/chat/rooms/${roomId}/messages/`, { params }),
+    sendMessage: (roomId: number | string, content: string) =>
+        api.post(`/api/chat/rooms/${roomId}/messages/`, { content }),
+    searchMessages: (q: string, params?: { limit?: number; offset?: number }) =>
+        api.get('/api/chat/messages/search/', { params: { q, ...params } }),
 };
 
 export default api; 
\ No newline at end of file
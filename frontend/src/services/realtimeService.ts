@@ -0,0 +1,133 @@
+// Single multiplexed WebSocket for notifications, donations and chat (ws/realtime/)
+const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
+
+type FrameHandler = (frame: any) => void;
+
+class RealtimeService {
+    private socket: WebSocket | null = null;
+    private topics: Set<string> = new Set();
+    // Handlers keyed by topic; "chat" handlers also receive frames of every "chat:<id>" topic
+    private handlers: Map<string, Set<FrameHandler>> = new Map();
+    private reconnectAttempts = 0;
+    private maxReconnectAttempts = 5;
+    private lastNotificationId: number | null = null;
+
+    connect() {
+        if (this.socket) {
+            return;
+        }
+        const token = localStorage.getItem('access_token');
+        if (!token) {
+            console.error('No access token found');
+            return;
+        }
+
+        const baseUrl = API_URL.replace('http://', 'ws://').replace('https://', 'wss://');
+        this.socket = new WebSocket(`${baseUrl}/ws/realtime/?token=${token}`);
+
+        this.socket.onopen = () => {
+            this.reconnectAttempts = 0;
+            // Restore subscriptions after a reconnect
+            this.topics.forEach(topic => this.sendSubscribe(topic));
+        };
+
+        this.socket.onmessage = (event) => {
+            try {
+                const frame = JSON.parse(event.data);
+                if (frame.topic === 'notifications') {
+                    this.trackNotificationFrame(frame);
+                }
+                this.dispatch(frame);
+            } catch (error) {
+                console.error('Error parsing realtime frame:', error);
+            }
+        };
+
+        this.socket.onclose = (event) => {
+            this.socket = null;
+            if (event.code !== 1000 && event.code !== 4001 && this.reconnectAttempts < this.maxReconnectAttempts) {
+                this.reconnectAttempts++;
+                setTimeout(() => this.connect(), 1000 * Math.pow(2, this.reconnectAttempts));
+            }
+        };
+
+        this.socket.onerror = (error) => {
+            console.error('Realtime WebSocket error:', error);
+        };
+    }
+
+    disconnect() {
+        this.topics.clear();
+        this.handlers.clear();
+        this.lastNotificationId = null;
+        if (this.socket) {
+            this.socket.close(1000);
+            this.socket = null;
+        }
+    }
+
+    subscribe(topic: string, handler: FrameHandler) {
+        if (!this.handlers.has(topic)) {
+            this.handlers.set(topic, new Set());
+        }
+        this.handlers.get(topic)!.add(handler);
+        if (!this.topics.has(topic)) {
+            this.topics.add(topic);
+            this.sendSubscribe(topic);
+        }
+    }
+
+    unsubscribe(topic: string, handler?: FrameHandler) {
+        const topicHandlers = this.handlers.get(topic);
+        if (handler && topicHandlers) {
+            topicHandlers.delete(handler);
+            if (topicHandlers.size > 0) {
+                return;
+            }
+        }
+        this.handlers.delete(topic);
+        this.topics.delete(topic);
+        this.send({ action: 'unsubscribe', topic });
+    }
+
+    sendChatMessage(chatRoomId: number, message: string, tempId?: string) {
+        this.send({ action: 'send', topic: `chat:${chatRoomId}`, message, tempId });
+    }
+
+    private sendSubscribe(topic: string) {
+        const frame: any = { action: 'subscribe', topic };
+        if (topic === 'notifications' && this.lastNotificationId !== null) {
+            frame.since = this.lastNotificationId;
+        }
+        this.send(frame);
+    }
+
+    private send(frame: object) {
+        if (this.socket && this.socket.readyState === WebSocket.OPEN) {
+            this.socket.send(JSON.stringify(frame));
+        }
+    }
+
+    private dispatch(frame: any) {
+        const targets = [frame.topic];
+        if (typeof frame.topic === 'string' && frame.topic.startsWith('chat:')) {
+            targets.push('chat');
+        }
+        targets.forEach(topic => {
+            this.handlers.get(topic)?.forEach(handler => handler(frame));
+        });
+    }
+
+    // Highest notification id seen, sent as `since` so resubscribing only replays missed ones
+    trackNotificationId(id: number) {
+        if (typeof id === 'number' && (this.lastNotificationId === null || id > this.lastNotificationId)) {
+            this.lastNotificationId = id;
+        }
+    }
+
+    private trackNotificationFrame(frame: any) {
+        this.trackNotificationId(frame.type === 'notification_replay' ? frame.last_id : frame.notification?.id);
+    }
+}
+
+export const realtimeService = new RealtimeService();
@@ -18,13 +18,9 @@ interface ChatMessage {
     is_read?: boolean;
 }
 
+// Notifications are delivered by realtimeService on the multiplexed socket
 class WebSocketService {
-    private socket: WebSocket | null = null;
-    private connected: boolean = false;
-    private messageHandlers: Map<string, ((data: any) => void)> = new Map();
-    private reconnectAttempts = 0;
     private maxReconnectAttempts = 3;
-    private reconnectTimeoutId: number | null = null;
     private isConnecting = false;
 
     // Chat-specific
@@ -36,6 +32,8 @@ class WebSocketService {
     private chatReconnectTimeoutId: number | null = null;
     private chatConnectionPromise: Promise<void> | null = null;
     private chatConnectionTimeout: number | null = null;
+    // Keeps chat presence alive on the server (presence expires after 90s without a ping)
+    private chatPingIntervalId: number | null = null;
 
     // Global Chat WebSocket
     private globalChatSocket: WebSocket | null = null;
@@ -43,93 +41,9 @@ class WebSocketService {
     private globalChatConnected: boolean = false;
 
     constructor() {
-        this.connected = false;
         this.chatConnected = false;
     }
 
-    // Notification WebSocket
-    connect() {
-        if (this.socket || this.isConnecting) {
-            return;
-        }
-        this.isConnecting = true;
-        const token = localStorage.getItem('access_token');
-        if (!token) {
-            console.error('No access token found');
-            this.isConnecting = false;
-            return;
-        }
-
-        // Use the API URL from environment variables
-        const baseUrl = API_URL.replace('http://', 'ws://').replace('https://', 'wss://');
-        const wsUrl = `${baseUrl}/ws/notifications/?token=${token}`;
-        console.log('Connecting to notification WebSocket:', wsUrl);
-        
-        this.socket = new WebSocket(wsUrl);
-        this.socket.onopen = () => {
-            console.log('WebSocket connected');
-            this.connected = true;
-            this.isConnecting = false;
-            this.reconnectAttempts = 0;
-        };
-        this.socket.onmessage = (event) => {
-            try {
-                const message = JSON.parse(event.data);
-                const handler = this.messageHandlers.get(message.type);
-                if (handler) {
-                    handler(message);
-                }
-            } catch (error) {
-                console.error('Error parsing WebSocket message:', error);
-            }
-        };
-        this.socket.onclose = () => {
-            console.log('WebSocket disconnected');
-            this.connected = false;
-            this.socket = null;
-            this.isConnecting = false;
-            this.handleReconnect();
-        };
-        this.socket.onerror = (error) => {
-            console.error('WebSocket error:', error);
-            this.connected = false;
-        };
-    }
-
-    private handleReconnect() {
-        if (this.reconnectAttempts < this.maxReconnectAttempts) {
-            this.reconnectTimeoutId = window.setTimeout(() => {
-                this.reconnectAttempts++;
-                this.connect();
-            }, 1000 * Math.pow(2, this.reconnectAttempts));
-        }
-    }
-
-    disconnect() {
-        if (this.socket) {
-            this.socket.close();
-            this.socket = null;
-        }
-        if (this.reconnectTimeoutId) {
-            clearTimeout(this.reconnectTimeoutId);
-            this.reconnectTimeoutId = null;
-        }
-        this.connected = false;
-        this.messageHandlers.clear();
-    }
-
-    addMessageHandler(type: string, handler: (data: any) => void) {
-        this.messageHandlers.set(type, handler);
-    }
-
-    removeMessageHandler(type: string) {
-        this.messageHandlers.delete(type);
-    }
-
-    isConnected(): boolean {
-        return this.connected;
-    }
-
     // --- Chat WebSocket ---
     async connectToChat(chatRoomId: string): Promise<void> {
         // If we're already connected to this room, return
@@ -175,6 +89,7 @@ class WebSocketService {
                         clearTimeout(this.chatConnectionTimeout);
                         this.chatConnectionTimeout = null;
                     }
+                    this.startChatPing();
                     console.log('Chat WebSocket connected');
                     this.chatConnected = true;
                     this.chatReconnectAttempts = 0;
@@ -186,6 +101,15 @@ class WebSocketService {
                         const message = JSON.parse(event.data) as ChatMessage;
                         console.log('Received chat message:', message);
                         
+                        // Typing, presence and read receipts carry no message body
+                        if (message && message.type && message.type !== 'chat_message') {
+                            const eventHandler = this.chatHandlers.get(message.type);
+                            if (eventHandler) {
+                                eventHandler(message);
+                            }
+                            return;
+                        }
+
                         // Validate message structure
                         if (!message || !message.type || !message.message || !message.sender || !message.timestamp) {
                             console.error('Invalid message structure:', message);
@@ -206,6 +130,7 @@ class WebSocketService {
                         clearTimeout(this.chatConnectionTimeout);
                         this.chatConnectionTimeout = null;
                     }
+                    this.stopChatPing();
                     console.log('Chat WebSocket disconnected:', event.code, event.reason);
                     this.chatSocket = null;
                     this.chatConnected = false;
@@ -290,7 +215,31 @@ class WebSocketService {
         }
     }
 
+    sendTyping(isTyping: boolean) {
+        if (!this.isChatConnected()) {
+            return;
+        }
+        this.chatSocket!.send(JSON.stringify({ type: 'typing', is_typing: isTyping }));
+    }
+
+    private startChatPing() {
+        this.stopChatPing();
+        this.chatPingIntervalId = window.setInterval(() => {
+            if (this.isChatConnected()) {
+                this.chatSocket!.send(JSON.stringify({ type: 'ping' }));
+            }
+        }, 30000);
+    }
+
+    private stopChatPing() {
+        if (this.chatPingIntervalId) {
+            clearInterval(this.chatPingIntervalId);
+            this.chatPingIntervalId = null;
+        }
+    }
+
     disconnectChat() {
+        this.stopChatPing();
         if (this.chatSocket) {
             try {
                 this.chatSocket.close();
@@ -375,6 +324,13 @@ class WebSocketService {
     removeGlobalChatMessageHandler(type: string) {
         this.globalChatHandlers.delete(type);
     }
+
+    // The global socket only carries rooms the user was part of when it connected
+    subscribeToGlobalChatRoom(chatRoomId: number) {
+        if (this.globalChatSocket && this.globalChatSocket.readyState === WebSocket.OPEN) {
+            this.globalChatSocket.send(JSON.stringify({ type: 'subscribe', chatRoomId }));
+        }
+    }
 }
 
 export const websocketService = new WebSocketService(); 
\ No newline at end of file